@@ -6,12 +6,38 @@ Offline executable version with all functionality
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import pandas as pd
-import io
 import os
+import time
+import logging
 from pathlib import Path
-import threading
-from openpyxl import load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+import multiprocessing
+import report_pipeline
+import columnar_export
+import period_comparison
+import pipeline_worker
+from datetime import timedelta
+from pipeline_worker import PipelineWorker
+from log_buffer import LogBuffer, LEVELS, MAX_LOG_LINES
+from table_view import ReportView, band_labels
+from report_summary import INBOUND_PERCENTILES
+from performance_store import PerformanceStore
+
+# Agents listed in the Comparison tab (the Excel export has all of them)
+COMPARISON_PREVIEW_ROWS = 500
+
+# How often the event loop collects worker messages and finished jobs
+WORKER_POLL_MS = 50
+
+# How often buffered log lines are written to the Log tab
+LOG_FLUSH_MS = 100
+
+# Data view: only the rows in sight are in the Treeview (height per row in pixels)
+VIEW_ROW_HEIGHT = 20
+ALL_BANDS = 'All'
+
+# Dialer exports the file dialogs offer (workbooks are read like CSVs)
+INPUT_FILETYPES = [("Dialer exports", "*.csv *.xlsx"), ("CSV files", "*.csv"), ("Excel files", "*.xlsx"),
+                   ("All files", "*.*")]
 
 class AgentPerformanceGUI:
     def __init__(self):
@@ -38,11 +64,31 @@ class AgentPerformanceGUI:
         self.root.resizable(True, True)
         
         # Variables
-        self.df = None
         self.metadata_rows = []
         self.processed_df = None
+        self.summary = None
+        self.quality = None
+        self.history_store = None
+        self.comparison = None
+        self.table_view = None
+        self.view_start = 0
+        self.files = []
+        self.has_groups = False
+        
+        # Parsing, processing and exports run in a worker process; frames come back
+        # in shared memory (kept mapped here while shown) and the UI only renders
+        self.worker = PipelineWorker()
+        self.worker.start()
+        self.shared_frames = {}
+        self.retired_frames = []
+        self.jobs = []
+        
+        # Log lines are buffered and written to the Log tab in batches on a timer
+        self.log_buffer = LogBuffer()
         
         self.setup_ui()
+        self.root.after(WORKER_POLL_MS, self.poll_worker)
+        self.root.after(LOG_FLUSH_MS, self.flush_log)
         
     def setup_ui(self):
         """Setup the user interface"""
@@ -90,7 +136,7 @@ class AgentPerformanceGUI:
         file_frame.columnconfigure(1, weight=1)
         
         # File selection
-        ttk.Label(file_frame, text="CSV File:").grid(row=0, column=0, sticky=tk.W, padx=(0, 10))
+        ttk.Label(file_frame, text="Report File:").grid(row=0, column=0, sticky=tk.W, padx=(0, 10))
         
         self.file_var = tk.StringVar()
         file_entry = ttk.Entry(file_frame, textvariable=self.file_var, state="readonly")
@@ -165,6 +211,16 @@ class AgentPerformanceGUI:
         self.notebook.add(self.log_frame, text="Log")
         self.setup_log_view()
         
+        # History tab
+        self.history_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.history_frame, text="History")
+        self.setup_history_view()
+        
+        # Comparison tab
+        self.comparison_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.comparison_frame, text="Comparison")
+        self.setup_comparison_view()
+        
         # Export frame (reduced padding)
         export_frame = ttk.LabelFrame(main_frame, text="Export Options", padding="5")
         export_frame.grid(row=3, column=0, columnspan=3, sticky=(tk.W, tk.E))
@@ -217,6 +273,78 @@ class AgentPerformanceGUI:
         export_excel_btn.bind("<Enter>", on_excel_enter)
         export_excel_btn.bind("<Leave>", on_excel_leave)
         
+        # Colorful Export Excel by Team button
+        export_team_btn = tk.Button(
+            export_frame, 
+            text="📑 Export Excel by Team", 
+            command=lambda: self.export_excel(by_team=True),
+            bg="#2980b9",  # Blue background
+            fg="white",    # White text
+            font=("Arial", 11, "bold"),
+            relief="raised",
+            bd=2,
+            padx=20,
+            pady=10,
+            cursor="hand2"
+        )
+        export_team_btn.grid(row=0, column=2, padx=(0, 15))
+        
+        # Add hover effects
+        def on_team_enter(e):
+            export_team_btn.config(bg="#21618c")
+        def on_team_leave(e):
+            export_team_btn.config(bg="#2980b9")
+        export_team_btn.bind("<Enter>", on_team_enter)
+        export_team_btn.bind("<Leave>", on_team_leave)
+        
+        # Colorful Export HTML button
+        export_html_btn = tk.Button(
+            export_frame, 
+            text="🌐 Export HTML", 
+            command=self.export_html,
+            bg="#27ae60",  # Green background
+            fg="white",    # White text
+            font=("Arial", 11, "bold"),
+            relief="raised",
+            bd=2,
+            padx=20,
+            pady=10,
+            cursor="hand2"
+        )
+        export_html_btn.grid(row=0, column=3, padx=(0, 15))
+        
+        # Add hover effects
+        def on_html_enter(e):
+            export_html_btn.config(bg="#1e8449")
+        def on_html_leave(e):
+            export_html_btn.config(bg="#27ae60")
+        export_html_btn.bind("<Enter>", on_html_enter)
+        export_html_btn.bind("<Leave>", on_html_leave)
+        
+        # Colorful Save to History button
+        history_btn = tk.Button(
+            export_frame, 
+            text="🗄️ Save to History", 
+            command=self.save_to_history,
+            bg="#16a085",  # Teal background
+            fg="white",    # White text
+            font=("Arial", 11, "bold"),
+            relief="raised",
+            bd=2,
+            padx=20,
+            pady=10,
+            cursor="hand2"
+        )
+        history_btn.grid(row=0, column=4, padx=(0, 15))
+        
+        # Add hover effects
+        def on_history_enter(e):
+            history_btn.config(bg="#138d75")
+        def on_history_leave(e):
+            history_btn.config(bg="#16a085")
+        history_btn.bind("<Enter>", on_history_enter)
+        history_btn.bind("<Leave>", on_history_leave)
+        
         # Test Dialog button (smaller, different color)
         test_dialog_btn = tk.Button(
             export_frame, 
@@ -231,7 +359,7 @@ class AgentPerformanceGUI:
             pady=8,
             cursor="hand2"
         )
-        test_dialog_btn.grid(row=0, column=2)
+        test_dialog_btn.grid(row=0, column=5)
         
         # Add hover effects
         def on_test_enter(e):
@@ -243,12 +371,36 @@ class AgentPerformanceGUI:
         
         # Status bar (reduced padding)
         self.status_var = tk.StringVar()
-        self.status_var.set("Ready - Select a CSV file to begin")
+        self.status_var.set("Ready - Select a CSV or XLSX file to begin")
         status_bar = ttk.Label(main_frame, textvariable=self.status_var, relief=tk.SUNKEN)
         status_bar.grid(row=4, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(5, 0))
         
     def setup_data_view(self):
         """Setup the data view tab"""
+        # Filters (applied as you type)
+        filter_frame = ttk.Frame(self.data_frame)
+        filter_frame.pack(fill=tk.X, padx=5, pady=(5, 0))
+        
+        ttk.Label(filter_frame, text="Search name or ID:").pack(side=tk.LEFT)
+        self.name_filter_var = tk.StringVar()
+        self.name_filter_var.trace_add('write', lambda *args: self.apply_filters())
+        ttk.Entry(filter_frame, textvariable=self.name_filter_var, width=20).pack(side=tk.LEFT, padx=(5, 10))
+        
+        self.hd_only_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(filter_frame, text="HD only", variable=self.hd_only_var,
+                        command=self.apply_filters).pack(side=tk.LEFT, padx=(0, 10))
+        
+        ttk.Label(filter_frame, text="Band:").pack(side=tk.LEFT)
+        self.band_labels = band_labels()
+        self.band_filter_var = tk.StringVar(value=ALL_BANDS)
+        band_box = ttk.Combobox(filter_frame, textvariable=self.band_filter_var, state='readonly', width=20,
+                                values=[ALL_BANDS] + list(self.band_labels.values()))
+        band_box.pack(side=tk.LEFT, padx=(5, 10))
+        band_box.bind('<<ComboboxSelected>>', lambda event: self.apply_filters())
+        
+        self.view_count_var = tk.StringVar()
+        ttk.Label(filter_frame, textvariable=self.view_count_var).pack(side=tk.RIGHT)
+        
         # Frame for treeview and scrollbars (reduced padding)
         tree_frame = ttk.Frame(self.data_frame)
         tree_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
@@ -256,11 +408,16 @@ class AgentPerformanceGUI:
         # Treeview
         self.tree = ttk.Treeview(tree_frame)
         
-        # Scrollbars
-        v_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        # Scrollbars: the vertical one moves the window of rows shown, not the Treeview
+        v_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.scroll_view)
         h_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.HORIZONTAL, command=self.tree.xview)
+        self.view_scrollbar = v_scrollbar
         
-        self.tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
+        self.tree.configure(xscrollcommand=h_scrollbar.set)
+        self.tree.bind('<Configure>', lambda event: self.render_view())
+        self.tree.bind('<MouseWheel>', self.wheel_view)
+        self.tree.bind('<Button-4>', self.wheel_view)
+        self.tree.bind('<Button-5>', self.wheel_view)
         
         # Grid layout
         self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
@@ -278,15 +435,256 @@ class AgentPerformanceGUI:
         
     def setup_log_view(self):
         """Setup the log view tab"""
+        level_frame = ttk.Frame(self.log_frame)
+        level_frame.pack(fill=tk.X, padx=5, pady=(5, 0))
+        
+        ttk.Label(level_frame, text="Show:").pack(side=tk.LEFT)
+        self.log_level_var = tk.StringVar(value='INFO')
+        level_box = ttk.Combobox(level_frame, textvariable=self.log_level_var, values=list(LEVELS),
+                                 state='readonly', width=10)
+        level_box.pack(side=tk.LEFT, padx=(5, 0))
+        level_box.bind('<<ComboboxSelected>>', lambda event: self.refresh_log_view())
+        
         log_text = scrolledtext.ScrolledText(self.log_frame, wrap=tk.WORD)
         log_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         self.log_text = log_text
         
-    def log(self, message):
-        """Add message to log"""
-        self.log_text.insert(tk.END, f"{message}\n")
+    def setup_history_view(self):
+        """Setup the history view tab"""
+        query_frame = ttk.Frame(self.history_frame)
+        query_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        ttk.Label(query_frame, text="Agent ID:").pack(side=tk.LEFT)
+        self.history_agent_var = tk.StringVar()
+        ttk.Entry(query_frame, textvariable=self.history_agent_var, width=12).pack(side=tk.LEFT, padx=(5, 10))
+        
+        ttk.Label(query_frame, text="Days:").pack(side=tk.LEFT)
+        self.history_days_var = tk.StringVar(value="30")
+        ttk.Spinbox(query_frame, from_=1, to=366, textvariable=self.history_days_var, width=5).pack(side=tk.LEFT, padx=(5, 10))
+        
+        ttk.Button(query_frame, text="Show Agent Trend", command=self.show_agent_history).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(query_frame, text="Show Team Totals", command=self.show_team_history).pack(side=tk.LEFT)
+        
+        history_text = scrolledtext.ScrolledText(self.history_frame, wrap=tk.NONE)
+        history_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.history_text = history_text
+        
+    def setup_comparison_view(self):
+        """Setup the period comparison tab"""
+        query_frame = ttk.Frame(self.comparison_frame)
+        query_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        ttk.Button(query_frame, text="Compare with Earlier Export(s)...",
+                   command=self.compare_with_exports).pack(side=tk.LEFT, padx=(0, 10))
+        
+        ttk.Label(query_frame, text="Last").pack(side=tk.LEFT)
+        self.comparison_days_var = tk.StringVar(value="7")
+        ttk.Spinbox(query_frame, from_=1, to=366, textvariable=self.comparison_days_var, width=5).pack(side=tk.LEFT, padx=5)
+        ttk.Button(query_frame, text="Days vs the Days Before (History)",
+                   command=self.compare_stored_periods).pack(side=tk.LEFT, padx=(0, 10))
+        
+        ttk.Button(query_frame, text="Export Comparison Excel",
+                   command=self.export_comparison).pack(side=tk.LEFT)
+        
+        comparison_text = scrolledtext.ScrolledText(self.comparison_frame, wrap=tk.NONE)
+        comparison_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.comparison_text = comparison_text
+        
+    def compare_with_exports(self):
+        """Compare the processed report with one earlier export (or several, added up per agent)"""
+        if self.processed_df is None:
+            messagebox.showerror("Error", "No data to compare. Please process a file first.")
+            return
+        
+        self.root.lift()
+        self.root.focus_force()
+        filenames = filedialog.askopenfilenames(
+            parent=self.root,
+            title="Select the Earlier Export(s) to Compare With",
+            filetypes=INPUT_FILETYPES,
+            initialdir=os.path.expanduser("~/Desktop")
+        )
+        if filenames:
+            current_name = ', '.join(os.path.basename(path) for path in self.files) or "this report"
+            self.run_job("Comparing reports...", "Error comparing reports", self.comparison_done,
+                         pipeline_worker.compare_with_exports, list(filenames), current_name)
+            
+    def compare_stored_periods(self):
+        """Compare the last N stored days with the N days before them"""
+        try:
+            days = int(self.comparison_days_var.get())
+        except ValueError:
+            messagebox.showerror("Error", "Please enter a number of days")
+            return
+            
+        try:
+            store = self.get_history_store()
+            dates = store.report_dates()
+            if not dates:
+                messagebox.showinfo("Comparison", "No reports saved to history yet")
+                return
+            end = pd.Timestamp(dates[-1]).date()
+            start = end - timedelta(days=days - 1)
+            previous_end = start - timedelta(days=1)
+            previous_start = previous_end - timedelta(days=days - 1)
+            self.run_job("Comparing periods...", "Error comparing periods", self.comparison_done,
+                         pipeline_worker.compare_periods, store.path, (start, end), (previous_start, previous_end))
+        except Exception as e:
+            self.show_error(f"Error comparing periods: {str(e)}")
+            
+    def comparison_done(self, shared):
+        """Map the comparison the worker shared and show it"""
+        frame = self.attach_frame('comparison', shared.frame)
+        self.show_comparison(period_comparison.PeriodComparison(frame.df, shared.current_label,
+                                                                shared.previous_label))
+            
+    def show_comparison(self, comparison):
+        """Show a comparison's summary lines and per-agent changes"""
+        self.comparison = comparison
+        text = comparison.lines() + ['']
+        text.append(comparison.display_frame().head(COMPARISON_PREVIEW_ROWS).to_string())
+        if len(comparison.df) > COMPARISON_PREVIEW_ROWS:
+            text.append(f"... {len(comparison.df) - COMPARISON_PREVIEW_ROWS} more agents in the Excel export")
+        self.comparison_text.delete(1.0, tk.END)
+        self.comparison_text.insert(1.0, '\n'.join(text))
+        self.notebook.select(self.comparison_frame)
+        self.status_var.set("Comparison ready")
+        self.log(comparison.lines()[0])
+        
+    def export_comparison(self):
+        """Export the comparison to one styled Excel sheet"""
+        if self.comparison is None:
+            messagebox.showerror("Error", "No comparison to export. Please compare first.")
+            return
+            
+        self.root.lift()
+        self.root.focus_force()
+        filename = filedialog.asksaveasfilename(
+            parent=self.root,
+            defaultextension=".xlsx",
+            filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")],
+            title="Save Comparison Excel File",
+            initialdir=os.path.expanduser("~/Desktop")
+        )
+        if not filename:
+            self.log("Export cancelled by user")
+            return
+        
+        self.run_job("Creating comparison Excel file...", "Error creating Excel file", self._excel_export_complete,
+                     pipeline_worker.export_comparison, filename)
+        
+    def get_history_store(self):
+        """Open the historical store on first use"""
+        if self.history_store is None:
+            self.history_store = PerformanceStore()
+        return self.history_store
+        
+    def save_to_history(self):
+        """Append the processed report to the historical store"""
+        if self.processed_df is None:
+            messagebox.showerror("Error", "No data to save. Please process a file first.")
+            return
+            
+        # The worker holds the teams of the processed report
+        source_name = ', '.join(os.path.basename(path) for path in self.files)
+        self.run_job("Saving report to history...", "Error saving to history", self._history_saved,
+                     pipeline_worker.save_to_history, self.get_history_store().path, source_name)
+            
+    def _history_saved(self, report_id):
+        self.log(f"Saved {len(self.processed_df)} agents to history (report #{report_id})")
+        self.status_var.set("Report saved to history")
+            
+    def show_agent_history(self):
+        """Show one agent's daily trend from the historical store"""
+        try:
+            agent_id = int(self.history_agent_var.get())
+            days = int(self.history_days_var.get())
+        except ValueError:
+            messagebox.showerror("Error", "Please enter a numeric agent ID and number of days")
+            return
+            
+        try:
+            history = self.get_history_store().agent_history(agent_id, days=days)
+            self.history_text.delete(1.0, tk.END)
+            if len(history) == 0:
+                self.history_text.insert(1.0, f"No history for agent {agent_id} in the last {days} days")
+            else:
+                self.history_text.insert(1.0, history.to_string(index=False))
+        except Exception as e:
+            self.show_error(f"Error reading history: {str(e)}")
+            
+    def show_team_history(self):
+        """Show team inbound totals per day from the historical store"""
+        try:
+            totals = self.get_history_store().team_daily_totals()
+            self.history_text.delete(1.0, tk.END)
+            if len(totals) == 0:
+                self.history_text.insert(1.0, "No reports saved to history yet")
+            else:
+                self.history_text.insert(1.0, totals.to_string(index=False))
+        except Exception as e:
+            self.show_error(f"Error reading history: {str(e)}")
+            
+    def log(self, message, level=logging.INFO):
+        """Add message to log (shown on the next flush)"""
+        self.log_buffer.write(message, level)
+        
+    def log_level(self):
+        return LEVELS.get(self.log_level_var.get(), logging.INFO)
+        
+    def flush_log(self):
+        """Write the lines logged since the last flush in one insert (runs on a timer)"""
+        try:
+            lines = self.log_buffer.take(self.log_level())
+            if lines:
+                self.log_text.insert(tk.END, '\n'.join(lines) + '\n')
+                # Keep the widget as short as the buffer
+                excess = int(self.log_text.index('end-1c').split('.')[0]) - 1 - MAX_LOG_LINES
+                if excess > 0:
+                    self.log_text.delete('1.0', f"{excess + 1}.0")
+                self.log_text.see(tk.END)
+        finally:
+            self.root.after(LOG_FLUSH_MS, self.flush_log)
+            
+    def refresh_log_view(self):
+        """Redraw the Log tab with the lines of the chosen level"""
+        lines = self.log_buffer.lines(self.log_level())
+        self.log_text.delete(1.0, tk.END)
+        if lines:
+            self.log_text.insert(tk.END, '\n'.join(lines) + '\n')
         self.log_text.see(tk.END)
-        self.root.update()
+        
+    def run_job(self, status, error_prefix, on_done, fn, *args):
+        """Submit a job to the worker process; on_done gets its result in the event loop"""
+        self.status_var.set(status)
+        self.jobs.append((self.worker.submit(fn, *args), on_done, error_prefix))
+        
+    def poll_worker(self):
+        """Show worker messages and hand finished jobs to their callbacks (runs on a timer)"""
+        try:
+            for level, message in self.worker.messages():
+                self.log(message, level)
+            finished = [job for job in self.jobs if job[0].done()]
+            self.jobs = [job for job in self.jobs if not job[0].done()]
+            for future, on_done, error_prefix in finished:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self.show_error(f"{error_prefix}: {str(e)}")
+                    continue
+                on_done(result)
+            # Replaced frames are unmapped once nothing shows them any more
+            self.retired_frames = [frame for frame in self.retired_frames if not frame.close()]
+        finally:
+            self.root.after(WORKER_POLL_MS, self.poll_worker)
+            
+    def attach_frame(self, name, layout):
+        """Map a frame shared by the worker; the one it replaces is retired"""
+        frame = self.worker.attach(layout)
+        if name in self.shared_frames:
+            self.retired_frames.append(self.shared_frames[name])
+        self.shared_frames[name] = frame
+        return frame
         
     def browse_file(self):
         """Browse for CSV file"""
@@ -294,56 +692,55 @@ class AgentPerformanceGUI:
         self.root.lift()
         self.root.focus_force()
         
-        filename = filedialog.askopenfilename(
+        # Several files are merged into one report (campaigns of the same day)
+        filenames = filedialog.askopenfilenames(
             parent=self.root,
-            title="Select Agent Performance CSV File",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+            title="Select Agent Performance File(s)",
+            filetypes=INPUT_FILETYPES,
             initialdir=os.path.expanduser("~/Desktop")
         )
-        if filename:
-            self.file_var.set(filename)
-            self.log(f"Selected file: {filename}")
+        if filenames:
+            self.files = list(filenames)
+            if len(self.files) == 1:
+                self.file_var.set(self.files[0])
+                self.log(f"Selected file: {self.files[0]}")
+            else:
+                names = ', '.join(os.path.basename(path) for path in self.files)
+                self.file_var.set(f"{len(self.files)} files to merge: {names}")
+                self.log(f"Selected {len(self.files)} files to merge: {names}")
             
     def process_data(self):
         """Process the selected CSV file"""
         if not self.file_var.get():
-            messagebox.showerror("Error", "Please select a CSV file first")
+            messagebox.showerror("Error", "Please select a CSV or XLSX file first")
             return
             
-        # Run processing in thread to prevent UI freezing
-        threading.Thread(target=self._process_data_thread, daemon=True).start()
+        # Parse and process in the worker process; the window keeps responding
+        self.log("Starting data processing...")
+        self.run_job("Processing data...", "Error processing data", self.processing_done,
+                     pipeline_worker.process_files, list(self.files))
+        
+    def processing_done(self, report):
+        """Take over the processed report from the worker and render it"""
+        frame = self.attach_frame('report', report.frame)
+        self.metadata_rows = report.metadata_rows
+        self.processed_df = frame.df
+        self.summary = report.summary
+        self.quality = report.quality
+        self.has_groups = report.has_groups
+        self.update_ui_after_processing()
         
-    def _process_data_thread(self):
-        """Process data in background thread"""
-        try:
-            self.status_var.set("Processing data...")
-            self.log("Starting data processing...")
-            
-            # Load and clean data
-            self.df, self.metadata_rows = self.load_and_clean_data(self.file_var.get())
-            if self.df is None:
-                return
-                
-            # Process time columns
-            self.df = self.process_time_columns(self.df)
-            
-            # Reorder and sort
-            self.processed_df = self.reorder_and_sort(self.df)
-            
-            # Update UI in main thread
-            self.root.after(0, self.update_ui_after_processing)
-            
-        except Exception as e:
-            self.root.after(0, lambda: self.show_error(f"Error processing data: {str(e)}"))
-            
     def update_ui_after_processing(self):
         """Update UI after data processing is complete"""
         try:
+            start = time.perf_counter()
+            
             # Update treeview
             self.update_treeview()
             
             # Update summary
             self.update_summary()
+            self.log(f"Rendering took {time.perf_counter() - start:.2f}s", logging.DEBUG)
             
             # Switch to data tab
             self.notebook.select(0)
@@ -354,144 +751,23 @@ class AgentPerformanceGUI:
         except Exception as e:
             self.show_error(f"Error updating UI: {str(e)}")
             
-    def load_and_clean_data(self, file_path):
-        """Load CSV and perform initial cleaning"""
-        try:
-            self.log("Loading CSV file...")
-            
-            # Read file content
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-            
-            lines = content.split('\n')
-            
-            # Find the row that contains 'USER NAME' (the actual header)
-            header_row = 0
-            for i, line in enumerate(lines):
-                if 'USER NAME' in line.upper():
-                    header_row = i
-                    break
-            
-            # Store ALL rows before the header as metadata
-            metadata_rows = [line + '\n' for line in lines[:header_row] if line.strip()]
-            
-            # Create StringIO for pandas to read
-            data_content = '\n'.join(lines[header_row:])
-            df = pd.read_csv(io.StringIO(data_content), on_bad_lines='skip', engine='python')
-            
-            self.log(f"Loaded {len(df)} rows of data")
-            
-            # Columns to remove
-            columns_to_delete = [
-                'CURRENT USER GROUP', 'MOST RECENT USER GROUP', 'PAUSAVG', 'WAITAVG',
-                'TALKAVG', 'DISPAVG', 'DEADAVG', 'CUSTAVG', 'ANS', 'SSMS', 'REDIAL',
-                'test', 'testne', 'TestIT', 'TESTNC', 'TESTCB', 'Test22', 'DUPLICATE CALLS'
-            ]
-            
-            # Drop columns (ignore if they don't exist)
-            df = df.drop(columns=[col for col in columns_to_delete if col in df.columns], errors='ignore')
-            
-            # Remove last row (typically totals/summary)
-            if len(df) > 0:
-                df = df.iloc[:-1]
-            
-            self.log("Data cleaning completed")
-            return df, metadata_rows
-            
-        except Exception as e:
-            self.log(f"Error loading file: {str(e)}")
-            self.root.after(0, lambda: messagebox.showerror("Error", f"Error loading file: {str(e)}"))
-            return None, None
-            
-    def process_time_columns(self, df):
-        """Calculate total pause time from PAUSE, DEAD, and DISPO columns"""
-        try:
-            self.log("Processing time columns...")
-            
-            # Convert time columns to timedelta
-            df['TOTAL PAUSE'] = (
-                pd.to_timedelta(df['PAUSE'], errors='coerce').fillna(pd.Timedelta(0)) +
-                pd.to_timedelta(df['DEAD'], errors='coerce').fillna(pd.Timedelta(0)) +
-                pd.to_timedelta(df['DISPO'], errors='coerce').fillna(pd.Timedelta(0))
-            )
-            
-            # Format as HH:MM:SS
-            df['TOTAL PAUSE'] = df['TOTAL PAUSE'].apply(
-                lambda x: f"{int(x.total_seconds() // 3600):02d}:"
-                          f"{int((x.total_seconds() % 3600) // 60):02d}:"
-                          f"{int(x.total_seconds() % 60):02d}"
-                if pd.notna(x) else "00:00:00"
-            )
-            
-            return df
-            
-        except Exception as e:
-            self.log(f"Warning processing time columns: {str(e)}")
-            return df
-            
-    def reorder_and_sort(self, df):
-        """Reorder columns and sort by total inbound calls"""
-        try:
-            self.log("Reordering and sorting data...")
-            
-            # Convert ID to integer
-            df['ID'] = pd.to_numeric(df['ID'], errors='coerce').fillna(0).astype(int)
-            
-            # Sort by total inbound calls (descending)
-            if 'TOTAL INBOUND CALLS' in df.columns:
-                df = df.sort_values(by='TOTAL INBOUND CALLS', ascending=False)
-            
-            # Reset index starting from 1
-            df = df.reset_index(drop=True)
-            df.index = df.index + 1
-            
-            # Reorder columns with ID first
-            desired_columns = [
-                'ID', 'USER NAME', 'CALLS', 'TIME', 'PAUSE', 'WAIT', 'TALK',
-                'DISPO', 'DEAD', 'TOTAL PAUSE', 'CUSTOMER',
-                'TOTAL INBOUND CALLS', 'TOTAL OUTBOUND CALLS'
-            ]
-            
-            # Only include columns that exist
-            existing_cols = [col for col in desired_columns if col in df.columns]
-            df = df[existing_cols]
-            
-            # Add Remarks column as the last column
-            df['REMARKS'] = ''
-            
-            # Add 'HD' in REMARKS if login hour (TIME) is less than 7 hours
-            if 'TIME' in df.columns:
-                for idx in df.index:
-                    try:
-                        time_val = pd.to_timedelta(df.loc[idx, 'TIME'])
-                        if time_val < pd.to_timedelta('7:00:00'):
-                            df.loc[idx, 'REMARKS'] = 'HD'
-                    except:
-                        pass
-            
-            return df
-            
-        except Exception as e:
-            self.log(f"Warning reordering columns: {str(e)}")
-            return df
-            
     def update_treeview(self):
         """Update the treeview with processed data using exact Streamlit colors"""
         if self.processed_df is None:
             return
             
-        # Clear existing data
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-            
+        # Sort orders and filter masks are worked out on the frame; the tree shows a window of it
+        self.table_view = ReportView(self.processed_df)
+        self.view_start = 0
+        
         # Configure columns
-        columns = list(self.processed_df.columns)
+        columns = self.table_view.columns
         self.tree['columns'] = columns
         self.tree['show'] = 'headings'
         
-        # Configure column headings and widths
+        # Configure column headings and widths (click to sort)
         for col in columns:
-            self.tree.heading(col, text=col)
+            self.tree.heading(col, text=col, command=lambda col=col: self.sort_view(col))
             self.tree.column(col, width=100, minwidth=50)
         
         # Define tags for different colors (matching Streamlit exactly)
@@ -503,57 +779,71 @@ class AgentPerformanceGUI:
         self.tree.tag_configure('time_red', background='#FF6B6B', foreground='black')   # Red for <8:45 time
         self.tree.tag_configure('pause_high', background='#DC143C', foreground='black') # Dark red for >2hr pause
         self.tree.tag_configure('remarks_hd', background='#FFFF00', foreground='black') # Yellow for HD remarks
-            
-        # Insert data with exact Streamlit styling
-        for index, row in self.processed_df.iterrows():
-            values = [str(row[col]) for col in columns]
-            
-            # Determine row styling based on TOTAL INBOUND CALLS
-            tag = ''
-            if 'TOTAL INBOUND CALLS' in columns:
-                try:
-                    calls = float(row['TOTAL INBOUND CALLS'])
-                    if calls >= 70:
-                        tag = 'excellent'
-                    elif calls >= 60:
-                        tag = 'good'
-                    elif calls >= 50:
-                        tag = 'average'
-                    else:
-                        tag = 'below_avg'
-                except:
-                    pass
-            
-            # Check for TIME coloring
-            if 'TIME' in columns:
-                try:
-                    td_val = pd.to_timedelta(row['TIME'])
-                    threshold_red = pd.to_timedelta('8:45:00')
-                    threshold_hd = pd.to_timedelta('7:00:00')
-                    
-                    if td_val < threshold_hd:
-                        tag = 'time_hd'
-                    elif td_val < threshold_red:
-                        tag = 'time_red'
-                except:
-                    pass
-            
-            # Check for PAUSE/TOTAL PAUSE coloring
-            for pause_col in ['PAUSE', 'TOTAL PAUSE']:
-                if pause_col in columns:
-                    try:
-                        td_val = pd.to_timedelta(row[pause_col])
-                        threshold = pd.to_timedelta('2:00:00')
-                        if td_val > threshold:
-                            tag = 'pause_high'
-                    except:
-                        pass
-            
-            # Check for REMARKS HD
-            if 'REMARKS' in columns and str(row['REMARKS']).strip().upper() == 'HD':
-                tag = 'remarks_hd'
-            
-            item = self.tree.insert('', 'end', values=values, tags=(tag,))
+        
+        # Filters picked before this report apply to it too
+        self.apply_filters()
+        
+    def visible_rows(self):
+        """Rows that fit in the Treeview as sized now"""
+        return max(1, self.tree.winfo_height() // VIEW_ROW_HEIGHT)
+        
+    def render_view(self):
+        """Put the rows in sight (from view_start) into the Treeview"""
+        if self.table_view is None:
+            return
+        total = len(self.table_view)
+        count = self.visible_rows()
+        self.view_start = max(0, min(self.view_start, total - count))
+        
+        self.tree.delete(*self.tree.get_children())
+        for values, tag in self.table_view.window(self.view_start, count):
+            self.tree.insert('', 'end', values=values, tags=(tag,))
+        
+        if total:
+            self.view_scrollbar.set(self.view_start / total, min(1.0, (self.view_start + count) / total))
+        else:
+            self.view_scrollbar.set(0.0, 1.0)
+            
+    def scroll_view(self, action, amount, unit=None):
+        """Scrollbar command: move the window of rows"""
+        if self.table_view is None:
+            return
+        if action == 'moveto':
+            self.view_start = int(float(amount) * len(self.table_view))
+        else:
+            step = self.visible_rows() if unit == 'pages' else 1
+            self.view_start += int(amount) * step
+        self.render_view()
+        
+    def wheel_view(self, event):
+        """Mouse wheel over the data view (Windows/macOS delta, X11 buttons 4/5)"""
+        if getattr(event, 'num', None) == 4 or getattr(event, 'delta', 0) > 0:
+            self.view_start -= 3
+        else:
+            self.view_start += 3
+        self.render_view()
+        return 'break'
+        
+    def sort_view(self, col):
+        """Sort the data view by a column; clicking it again reverses the order"""
+        if self.table_view is None:
+            return
+        self.table_view.sort(col)
+        arrow = ' \u25bc' if self.table_view.descending else ' \u25b2'
+        for column in self.table_view.columns:
+            self.tree.heading(column, text=column + (arrow if column == col else ''))
+        self.view_start = 0
+        self.render_view()
+        
+    def apply_filters(self):
+        """Narrow the data view to the name/ID search, HD only and the band picked"""
+        if self.table_view is None:
+            return
+        band = next((name for name, label in self.band_labels.items() if label == self.band_filter_var.get()), None)
+        self.table_view.set_filters(self.name_filter_var.get(), self.hd_only_var.get(), band)
+        self.view_count_var.set(f"Showing {len(self.table_view):,} of {len(self.processed_df):,} agents")
+        self.view_start = 0
+        self.render_view()
                     
     def update_summary(self):
         """Update the summary tab"""
@@ -565,45 +855,53 @@ class AgentPerformanceGUI:
         summary.append("=" * 50)
         summary.append("")
         
-        # Basic statistics
-        total_agents = len(self.processed_df)
-        total_inbound = int(self.processed_df['TOTAL INBOUND CALLS'].sum())
-        avg_inbound = self.processed_df['TOTAL INBOUND CALLS'].mean()
+        # All statistics come from the report summary computed during processing
+        stats = self.summary
         
-        summary.append(f"📈 Total Agents: {total_agents}")
-        summary.append(f"📞 Total Inbound Calls: {total_inbound:,}")
-        summary.append(f"📊 Average Inbound Calls: {avg_inbound:.2f}")
+        # Basic statistics
+        summary.append(f"📈 Total Agents: {stats.total_agents}")
+        summary.append(f"📞 Total Inbound Calls: {stats.total_inbound:,}")
+        summary.append(f"📊 Average Inbound Calls: {stats.avg_inbound:.2f}")
+        if stats.inbound_agents:
+            percentiles = ', '.join(f"p{q} {stats.inbound_percentile(q):g}" for q in INBOUND_PERCENTILES)
+            summary.append(f"📐 Inbound Calls Percentiles: {percentiles}")
+        if stats.median_talk_seconds is not None:
+            summary.append(f"🗣️ Median Talk Time: {report_pipeline.format_duration(stats.median_talk_seconds)}")
         summary.append("")
         
         # Top performer
-        if len(self.processed_df) > 0:
-            top_performer = self.processed_df.iloc[0]
-            summary.append(f"🏆 Top Performer: {top_performer['USER NAME']}")
-            summary.append(f"   Calls: {int(top_performer['TOTAL INBOUND CALLS'])}")
+        if stats.top_performer is not None:
+            summary.append(f"🏆 Top Performer: {stats.top_performer}")
+            summary.append(f"   Calls: {stats.top_inbound}")
             summary.append("")
         
         # Performance distribution
         summary.append("📊 PERFORMANCE DISTRIBUTION:")
         summary.append("-" * 30)
         
-        excellent = len(self.processed_df[self.processed_df['TOTAL INBOUND CALLS'] >= 70])
-        good = len(self.processed_df[(self.processed_df['TOTAL INBOUND CALLS'] >= 60) & 
-                                   (self.processed_df['TOTAL INBOUND CALLS'] < 70)])
-        average = len(self.processed_df[(self.processed_df['TOTAL INBOUND CALLS'] >= 50) & 
-                                      (self.processed_df['TOTAL INBOUND CALLS'] < 60)])
-        below_avg = len(self.processed_df[self.processed_df['TOTAL INBOUND CALLS'] < 50])
-        
-        summary.append(f"🟢 Excellent (≥70 calls): {excellent} agents")
-        summary.append(f"🟠 Good (60-69 calls): {good} agents")
-        summary.append(f"🟡 Average (50-59 calls): {average} agents")
-        summary.append(f"🔴 Below Average (<50 calls): {below_avg} agents")
+        band_labels = [
+            ('excellent', "🟢 Excellent (≥70 calls)"),
+            ('good', "🟠 Good (60-69 calls)"),
+            ('average', "🟡 Average (50-59 calls)"),
+            ('below_avg', "🔴 Below Average (<50 calls)"),
+        ]
+        for band, label in band_labels:
+            summary.append(f"{label}: {stats.band_counts[band]} agents "
+                           f"(avg {stats.band_average(band):.1f} calls)")
         summary.append("")
         
         # HD (Half Day) analysis
-        hd_count = len(self.processed_df[self.processed_df['REMARKS'] == 'HD'])
-        summary.append(f"🟡 Half Day (HD) Agents: {hd_count}")
+        summary.append(f"🟡 Half Day (HD) Agents: {stats.hd_count}")
         summary.append("")
         
+        # Data quality (what cleaning skipped, blanked or zeroed)
+        if self.quality is not None:
+            summary.append("🔎 DATA QUALITY:")
+            summary.append("-" * 30)
+            issues = self.quality.lines()
+            summary.extend(issues if issues else ["No issues found"])
+            summary.append("")
+        
         # Color legend
         summary.append("🎨 COLOR LEGEND:")
         summary.append("-" * 20)
@@ -640,7 +938,7 @@ class AgentPerformanceGUI:
                 
         except Exception as e:
             error_msg = f"Dialog test failed: {str(e)}"
-            self.log(f"ERROR: {error_msg}")
+            self.log(f"ERROR: {error_msg}", logging.ERROR)
             messagebox.showerror("Test Failed", error_msg)
             
     def export_csv(self):
@@ -655,12 +953,17 @@ class AgentPerformanceGUI:
             self.root.focus_force()
             self.root.update()
             
+            filetypes = [("CSV files", "*.csv"), ("Gzipped CSV files", "*.csv.gz")]
+            if columnar_export.available():
+                filetypes += [("Parquet files", "*.parquet"), ("Arrow files", "*.arrow")]
+            filetypes.append(("All files", "*.*"))
+            
             # Try different approaches for the dialog
             try:
                 filename = filedialog.asksaveasfilename(
                     parent=self.root,
                     defaultextension=".csv",
-                    filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+                    filetypes=filetypes,
                     title="Save CSV File",
                     initialdir=os.path.expanduser("~/Desktop")
                 )
@@ -669,38 +972,89 @@ class AgentPerformanceGUI:
                 filename = filedialog.asksaveasfilename(
                     parent=self.root,
                     defaultextension=".csv",
-                    filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+                    filetypes=filetypes,
                     title="Save CSV File"
                 )
             
             self.log(f"Dialog returned filename: {filename}")
             
             if filename:
-                # Create CSV with metadata
-                with open(filename, 'w', newline='', encoding='utf-8') as f:
-                    # Write metadata
-                    for row in self.metadata_rows:
-                        f.write(row)
-                    
-                    # Write data
-                    self.processed_df.to_csv(f, index=False)
-                
-                messagebox.showinfo("Success", f"Data exported to {filename}")
-                self.log(f"Data exported to CSV: {filename}")
+                # Written by the worker: CSV with metadata (rows re-rendered only for changed agents;
+                # .gz is compressed) or a typed Parquet / Arrow file for BI tools
+                self.run_job("Exporting data...", "Error exporting CSV", self._csv_export_complete,
+                             pipeline_worker.export_csv, filename)
             else:
                 self.log("Export cancelled by user")
                 
         except Exception as e:
             error_msg = f"Error exporting CSV: {str(e)}"
             messagebox.showerror("Error", error_msg)
-            self.log(f"ERROR: {error_msg}")
+            self.log(f"ERROR: {error_msg}", logging.ERROR)
                 
-    def export_excel(self):
-        """Export data to styled Excel"""
+    def _csv_export_complete(self, filename):
+        """Called when the CSV export is complete"""
+        messagebox.showinfo("Success", f"Data exported to {filename}")
+        self.log(f"Data exported to CSV: {filename}")
+        self.status_var.set("CSV export completed")
+        
+    def export_html(self):
+        """Export a static HTML report (header rows, summary and highlighted table) for email"""
         if self.processed_df is None:
             messagebox.showerror("Error", "No data to export. Please process a file first.")
             return
             
+        try:
+            # Ensure dialog appears on top
+            self.root.lift()
+            self.root.focus_force()
+            self.root.update()
+            
+            # Try different approaches for the dialog
+            try:
+                filename = filedialog.asksaveasfilename(
+                    parent=self.root,
+                    defaultextension=".html",
+                    filetypes=[("HTML files", "*.html"), ("All files", "*.*")],
+                    title="Save HTML Report",
+                    initialdir=os.path.expanduser("~/Desktop")
+                )
+            except:
+                # Fallback without initialdir
+                filename = filedialog.asksaveasfilename(
+                    parent=self.root,
+                    defaultextension=".html",
+                    filetypes=[("HTML files", "*.html"), ("All files", "*.*")],
+                    title="Save HTML Report"
+                )
+            
+            self.log(f"Dialog returned filename: {filename}")
+            
+            if filename:
+                self.run_job("Exporting HTML report...", "Error exporting HTML", self._html_export_complete,
+                             pipeline_worker.export_html, filename)
+            else:
+                self.log("Export cancelled by user")
+                
+        except Exception as e:
+            error_msg = f"Error exporting HTML: {str(e)}"
+            messagebox.showerror("Error", error_msg)
+            self.log(f"ERROR: {error_msg}", logging.ERROR)
+            
+    def _html_export_complete(self, filename):
+        """Called when the HTML export is complete"""
+        messagebox.showinfo("Success", f"HTML report exported to {filename}")
+        self.log(f"HTML report exported: {filename}")
+        self.status_var.set("HTML export completed")
+        
+    def export_excel(self, by_team=False):
+        """Export data to styled Excel (optionally one sheet per team as well)"""
+        if self.processed_df is None:
+            messagebox.showerror("Error", "No data to export. Please process a file first.")
+            return
+        if by_team and not self.has_groups:
+            messagebox.showerror("Error", "This file has no CURRENT USER GROUP column to split by team.")
+            return
+            
         try:
             # Ensure dialog appears on top
             self.root.lift()
@@ -728,200 +1082,19 @@ class AgentPerformanceGUI:
             self.log(f"Dialog returned filename: {filename}")
             
             if filename:
-                self.status_var.set("Creating Excel file...")
                 self.log("Creating styled Excel file...")
                 
-                # Run export in thread
-                threading.Thread(
-                    target=self._export_excel_thread, 
-                    args=(filename,), 
-                    daemon=True
-                ).start()
+                # Desktop layout: summary after one empty row, average as text
+                self.run_job("Creating Excel file...", "Error creating Excel file", self._excel_export_complete,
+                             pipeline_worker.export_excel, filename, by_team, 2, True)
             else:
                 self.log("Export cancelled by user")
                 
         except Exception as e:
             error_msg = f"Error exporting Excel: {str(e)}"
             messagebox.showerror("Error", error_msg)
-            self.log(f"ERROR: {error_msg}")
+            self.log(f"ERROR: {error_msg}", logging.ERROR)
                 
-    def _export_excel_thread(self, filename):
-        """Export Excel in background thread with exact Streamlit app styling"""
-        try:
-            output = io.BytesIO()
-            
-            # Create initial Excel file
-            num_metadata_rows = len(self.metadata_rows)
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                self.processed_df.to_excel(writer, index=False, startrow=num_metadata_rows, sheet_name='Agent Performance')
-            
-            # Load and modify workbook
-            output.seek(0)
-            wb = load_workbook(output)
-            ws = wb.active
-            
-            # Get the current header row
-            header_row_num = num_metadata_rows + 1
-            
-            # Collect all data rows
-            data_rows = []
-            for row in ws.iter_rows(min_row=header_row_num, values_only=False):
-                data_rows.append(row)
-            
-            # Delete all rows from header onwards
-            if ws.max_row >= header_row_num:
-                ws.delete_rows(header_row_num, ws.max_row - header_row_num + 1)
-            
-            # Add metadata rows
-            metadata_style = Font(bold=True, size=11)
-            metadata_fill = PatternFill(start_color='E8F4F8', end_color='E8F4F8', fill_type='solid')
-            
-            current_row = 1
-            for row in self.metadata_rows:
-                clean_row = row.strip().replace('\n', '')
-                if clean_row:
-                    ws.cell(row=current_row, column=1, value=clean_row)
-                    ws.cell(row=current_row, column=1).font = metadata_style
-                    ws.cell(row=current_row, column=1).fill = metadata_fill
-                    current_row += 1
-            
-            # Add data table with styling
-            header_fill = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
-            header_font = Font(bold=True, color='000000')
-            
-            # Color definitions for conditional formatting (EXACT SAME AS STREAMLIT)
-            green_fill = PatternFill(start_color='90EE90', end_color='90EE90', fill_type='solid')
-            orange_fill = PatternFill(start_color='FFA500', end_color='FFA500', fill_type='solid')
-            yellow_fill = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
-            red_fill = PatternFill(start_color='FF6B6B', end_color='FF6B6B', fill_type='solid')
-            dark_red_fill = PatternFill(start_color='DC143C', end_color='DC143C', fill_type='solid')
-            black_font = Font(bold=True, color='000000')
-            
-            header_row_idx = None
-            for idx, row_data in enumerate(data_rows):
-                is_header_row = (idx == 0)
-                if is_header_row:
-                    header_row_idx = current_row
-                
-                for col_idx, cell in enumerate(row_data, start=1):
-                    new_cell = ws.cell(row=current_row, column=col_idx)
-                    if cell.value is not None:
-                        new_cell.value = cell.value
-                    
-                    if is_header_row:
-                        new_cell.fill = header_fill
-                        new_cell.font = header_font
-                    else:
-                        # Get column name from header
-                        col_name = ws.cell(row=header_row_idx, column=col_idx).value
-                        
-                        # Apply conditional formatting (EXACT SAME AS STREAMLIT)
-                        if col_name == 'TOTAL INBOUND CALLS':
-                            try:
-                                val = float(new_cell.value)
-                                if val >= 70:
-                                    new_cell.fill = green_fill
-                                    new_cell.font = black_font
-                                elif val >= 60:
-                                    new_cell.fill = orange_fill
-                                    new_cell.font = black_font
-                                elif val >= 50:
-                                    new_cell.fill = yellow_fill
-                                    new_cell.font = black_font
-                                else:
-                                    new_cell.fill = red_fill
-                                    new_cell.font = black_font
-                            except:
-                                pass
-                        
-                        elif col_name == 'TIME':
-                            try:
-                                td_val = pd.to_timedelta(new_cell.value)
-                                threshold_red = pd.to_timedelta('8:45:00')
-                                threshold_hd = pd.to_timedelta('7:00:00')
-                                
-                                if td_val < threshold_hd:
-                                    new_cell.fill = yellow_fill
-                                    new_cell.font = black_font
-                                elif td_val < threshold_red:
-                                    new_cell.fill = red_fill
-                                    new_cell.font = black_font
-                            except:
-                                pass
-                        
-                        elif col_name in ['PAUSE', 'TOTAL PAUSE']:
-                            try:
-                                td_val = pd.to_timedelta(new_cell.value)
-                                threshold = pd.to_timedelta('2:00:00')
-                                if td_val > threshold:
-                                    new_cell.fill = dark_red_fill
-                                    new_cell.font = black_font
-                            except:
-                                pass
-                        
-                        elif col_name == 'REMARKS':
-                            if str(new_cell.value).strip().upper() == 'HD':
-                                new_cell.fill = yellow_fill
-                                new_cell.font = black_font
-                    
-                    new_cell.alignment = Alignment(horizontal='center', vertical='center')
-                current_row += 1
-            
-            # Add summary rows below the table (separate rows)
-            summary_row_1 = current_row + 2  # Leave one empty row
-            summary_row_2 = current_row + 3
-            
-            # Calculate totals
-            total_inbound = int(self.processed_df['TOTAL INBOUND CALLS'].sum())
-            avg_inbound = float(self.processed_df['TOTAL INBOUND CALLS'].mean())
-            
-            # Style for summary
-            summary_font = Font(bold=True, size=12, color='FFFFFF')
-            summary_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
-            border = Border(
-                left=Side(style='thin'),
-                right=Side(style='thin'),
-                top=Side(style='thin'),
-                bottom=Side(style='thin')
-            )
-            
-            # First row: TOTAL INBOUND CALLS
-            ws.cell(row=summary_row_1, column=1, value='TOTAL INBOUND CALLS')
-            ws.cell(row=summary_row_1, column=1).font = summary_font
-            ws.cell(row=summary_row_1, column=1).fill = summary_fill
-            ws.cell(row=summary_row_1, column=1).alignment = Alignment(horizontal='center', vertical='center')
-            ws.cell(row=summary_row_1, column=1).border = border
-            
-            ws.cell(row=summary_row_1, column=2, value=total_inbound)
-            ws.cell(row=summary_row_1, column=2).font = summary_font
-            ws.cell(row=summary_row_1, column=2).fill = summary_fill
-            ws.cell(row=summary_row_1, column=2).alignment = Alignment(horizontal='center', vertical='center')
-            ws.cell(row=summary_row_1, column=2).border = border
-            
-            # Second row: AVERAGE INBOUND CALLS
-            ws.cell(row=summary_row_2, column=1, value='AVERAGE INBOUND CALLS')
-            ws.cell(row=summary_row_2, column=1).font = summary_font
-            ws.cell(row=summary_row_2, column=1).fill = summary_fill
-            ws.cell(row=summary_row_2, column=1).alignment = Alignment(horizontal='center', vertical='center')
-            ws.cell(row=summary_row_2, column=1).border = border
-            
-            ws.cell(row=summary_row_2, column=2, value=f"{avg_inbound:.2f}")
-            ws.cell(row=summary_row_2, column=2).font = summary_font
-            ws.cell(row=summary_row_2, column=2).fill = summary_fill
-            ws.cell(row=summary_row_2, column=2).alignment = Alignment(horizontal='center', vertical='center')
-            ws.cell(row=summary_row_2, column=2).border = border
-            
-            # Save file
-            wb.save(filename)
-            
-            # Update UI in main thread
-            self.root.after(0, lambda: self._excel_export_complete(filename))
-            
-        except Exception as e:
-            error_msg = f"Error creating Excel file: {str(e)}"
-            self.root.after(0, lambda: messagebox.showerror("Error", error_msg))
-            self.root.after(0, lambda: self.log(f"ERROR: {error_msg}"))
-            
     def _excel_export_complete(self, filename):
         """Called when Excel export is complete"""
         messagebox.showinfo("Success", f"Styled Excel file created: {filename}")
@@ -932,14 +1105,27 @@ class AgentPerformanceGUI:
         """Show error message"""
         messagebox.showerror("Error", message)
         self.status_var.set("Error occurred")
-        self.log(f"ERROR: {message}")
+        self.log(f"ERROR: {message}", logging.ERROR)
         
     def run(self):
         """Run the application"""
         self.log("Agent Performance Data Processor started")
         self.log("Select a CSV file and click 'Process Data' to begin")
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
         self.root.mainloop()
+        
+    def close(self):
+        """Stop the worker process, unmap the shared frames and close the window"""
+        self.worker.close()
+        self.processed_df = None
+        self.table_view = None
+        self.comparison = None
+        for frame in list(self.shared_frames.values()) + self.retired_frames:
+            frame.close()
+        self.root.destroy()
 
 if __name__ == "__main__":
+    # Needed by the pipeline and grouped export worker processes in the packaged exe
+    multiprocessing.freeze_support()
     app = AgentPerformanceGUI()
     app.run()
\ No newline at end of file
@@ -0,0 +1,139 @@
+"""
+Agent Performance Data Processor - Agent Search Index
+Finds agents by part of their name or the start of their ID without rescanning the report
+"""
+
+import numpy as np
+import pandas as pd
+
+# Longest n-gram indexed; longer queries intersect their trigrams and check the few candidates
+MAX_GRAM = 3
+
+# Code points are shifted by one so padding (0) never takes part and n-grams of
+# different lengths get codes in separate ranges (K**3 still fits in int64)
+_K = 0x110001
+
+
+def normalize_names(names):
+    """Lower-case names with runs of whitespace as one space (missing names empty)"""
+    return names.astype(object).fillna('').astype(str).str.lower().str.split().str.join(' ')
+
+
+def normalize_query(query):
+    return ' '.join(str(query).lower().split())
+
+
+def _gram_codes(chars, n):
+    """(codes, rows) of every n-gram of the padded code point matrix"""
+    rows, width = chars.shape
+    if width < n:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    codes = np.zeros((rows, width - n + 1), dtype=np.int64)
+    valid = np.ones(codes.shape, dtype=bool)
+    for k in range(n):
+        part = chars[:, k:width - n + 1 + k].astype(np.int64)
+        codes = codes * _K + part + 1
+        valid &= part != 0
+    row_numbers = np.broadcast_to(np.arange(rows)[:, None], codes.shape)
+    return codes[valid], row_numbers[valid]
+
+
+def _query_code(text):
+    code = 0
+    for char in text:
+        code = code * _K + ord(char) + 1
+    return code
+
+
+class AgentSearchIndex:
+    """Rows of a processed report by name substring (1- to 3-gram postings) or ID prefix
+
+    Built once per report with whole-array operations; a lookup is a couple
+    of binary searches, plus an intersection of posting lists for queries
+    longer than three characters. Results are row positions in the frame.
+    """
+
+    def __init__(self, names, ids=None):
+        self.size = len(names)
+
+        # (gram, row) pairs sorted by gram, each pair once: a gram's rows are one slice
+        self._text = np.array(names, dtype=str) if len(names) else np.zeros(0, dtype='<U1')
+        chars = self._text.view(np.uint32).reshape(len(names), self._text.dtype.itemsize // 4)
+        grams, rows = zip(*[_gram_codes(chars, n) for n in range(1, MAX_GRAM + 1)])
+        grams = np.concatenate(grams)
+        rows = np.concatenate(rows)
+        order = np.lexsort((rows, grams))
+        grams, rows = grams[order], rows[order]
+        first = np.ones(len(grams), dtype=bool)
+        first[1:] = (grams[1:] != grams[:-1]) | (rows[1:] != rows[:-1])
+        self._grams = grams[first]
+        self._rows = rows[first].astype(np.int32)
+
+        # IDs as text, sorted: a prefix is a range
+        self._id_text = None
+        if ids is not None:
+            id_text = np.array(pd.Series(ids).astype(str).tolist(), dtype=str)
+            self._id_order = np.argsort(id_text, kind='stable').astype(np.int32)
+            self._id_text = id_text[self._id_order]
+
+    @classmethod
+    def from_frame(cls, df):
+        """Index USER NAME and ID of a processed report (names normalized once per distinct name)"""
+        names = df['USER NAME'] if 'USER NAME' in df.columns else pd.Series([''] * len(df))
+        if isinstance(names.dtype, pd.CategoricalDtype):
+            categories = normalize_names(pd.Series(names.cat.categories)).tolist() + ['']
+            normalized = [categories[code] for code in names.cat.codes.to_numpy()]
+        else:
+            normalized = normalize_names(names).tolist()
+        ids = df['ID'].to_numpy() if 'ID' in df.columns else None
+        return cls(normalized, ids)
+
+    def _postings(self, text):
+        code = _query_code(text)
+        start, stop = np.searchsorted(self._grams, [code, code + 1])
+        return self._rows[start:stop]
+
+    def name_matches(self, query):
+        """Sorted row positions whose name contains the query"""
+        if len(query) <= MAX_GRAM:
+            return self._postings(query)
+        # Rows holding every trigram of the query, smallest posting list first
+        lists = sorted((self._postings(query[i:i + MAX_GRAM]) for i in range(len(query) - MAX_GRAM + 1)),
+                       key=len)
+        candidates = lists[0]
+        for postings in lists[1:]:
+            if not len(candidates):
+                break
+            # Both are sorted: keep the candidates found in the postings by binary search
+            found = np.minimum(np.searchsorted(postings, candidates), len(postings) - 1)
+            candidates = candidates[postings[found] == candidates] if len(postings) else postings
+        # The trigrams may sit apart in a name: check the candidates themselves
+        return candidates[np.char.find(self._text[candidates], query) >= 0]
+
+    def id_matches(self, query):
+        """Sorted row positions whose ID starts with the query (digits only)"""
+        if self._id_text is None or not query.isdigit():
+            return np.empty(0, dtype=np.int32)
+        # ':' sorts right after '9', so [query, query + ':') holds every ID starting with it
+        start, stop = np.searchsorted(self._id_text, [query, query + ':'])
+        return np.sort(self._id_order[start:stop])
+
+    def search(self, query):
+        """Sorted row positions matching the query by name or ID (None for an empty query)"""
+        query = normalize_query(query)
+        if not query:
+            return None
+        names = self.name_matches(query)
+        ids = self.id_matches(query)
+        if not len(ids):
+            return names
+        return np.union1d(names, ids)
+
+    def mask(self, query):
+        """Boolean mask over the rows (None for an empty query)"""
+        rows = self.search(query)
+        if rows is None:
+            return None
+        mask = np.zeros(self.size, dtype=bool)
+        mask[rows] = True
+        return mask
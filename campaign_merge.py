@@ -0,0 +1,169 @@
+"""
+Agent Performance Data Processor - Multi-Campaign Merge
+Consolidates the exports of several campaigns for the same day into one row per agent
+"""
+
+import os
+import numpy as np
+import pandas as pd
+import report_pipeline
+from report_summary import ReportSummary
+from data_quality import QualityReport, check_rows, SKIPPED_LINES, TRAILING_ROW_KEPT, DUPLICATE_IDS
+from incremental_refresh import RefreshResult
+from performance_store import extract_report_date
+
+# Per-agent sums (TOTAL PAUSE and REMARKS are recomputed from them)
+SUM_COLUMNS = [col for col in report_pipeline.DURATION_COLUMNS if col != 'TOTAL PAUSE'] + \
+              [col for col in report_pipeline.COUNT_COLUMNS if col != 'ID']
+# Taken from the agent's first row
+FIRST_COLUMNS = ['USER NAME', report_pipeline.GROUP_COLUMN]
+
+
+def source_name(source, number):
+    """File name of a path or upload, for the metadata row and messages"""
+    if report_pipeline.is_path(source):
+        return os.path.basename(os.fspath(source))
+    return getattr(source, 'name', None) or f"export {number}"
+
+
+def agent_keys(ids):
+    """Group key per row: the numeric agent ID, or a key of its own for rows without one"""
+    numeric = pd.to_numeric(ids, errors='coerce').to_numpy(dtype='float64')
+    missing = np.isnan(numeric)
+    # Rows without an ID are never merged with each other
+    numeric[missing] = -np.arange(1, missing.sum() + 1)
+    return numeric.astype('int64')
+
+
+def consolidate(rows, keys):
+    """One row per agent key: call counts and durations summed, name and team from the first row
+
+    rows are per-row processed frames (durations as int seconds), keys from
+    agent_keys(). Agents keep the order of their first row.
+    """
+    sums = [col for col in SUM_COLUMNS if col in rows.columns]
+    firsts = [col for col in FIRST_COLUMNS if col in rows.columns]
+    values = {}
+    for col in sums:
+        # Durations are int seconds already; counts are still text
+        numbers = rows[col] if col in report_pipeline.DURATION_COLUMNS else pd.to_numeric(rows[col], errors='coerce')
+        values[col] = numbers.astype('Int64')
+    for col in firsts:
+        values[col] = rows[col]
+    grouped = pd.DataFrame(values, index=rows.index).groupby(keys, sort=False)
+
+    # Nullable sums: an agent with the value missing in every row stays missing
+    merged = grouped[sums].sum(min_count=1)
+    for col in firsts:
+        merged[col] = grouped[col].first()
+    merged.insert(0, 'ID', np.where(merged.index > 0, merged.index, 0))
+
+    # Recompute the derived durations on the consolidated rows
+    for col in report_pipeline.DURATION_COLUMNS:
+        if col in merged.columns:
+            merged[col] = merged[col].astype('Int32')
+    merged['TOTAL PAUSE'] = (
+        merged['PAUSE'].fillna(0) + merged['DEAD'].fillna(0) + merged['DISPO'].fillna(0)
+    ).astype('Int32')
+    return merged
+
+
+class MergedReport:
+    """Consolidated report of several exports, used by the front ends like IncrementalProcessor"""
+
+    def __init__(self, df, metadata_rows, summary, groups, quality, names):
+        self.df = df
+        self.metadata_rows = metadata_rows
+        self.summary = summary
+        self.groups = groups        # team per row of df (None when no export has teams)
+        self.quality = quality
+        self.names = names          # source file names
+        self.outputs = {}
+
+    @property
+    def result(self):
+        return RefreshResult(self.df, self.metadata_rows, self.summary, 'merged', len(self.df), self.quality)
+
+    def iter_csv(self, chunk_rows=report_pipeline.CSV_CHUNK_ROWS):
+        return report_pipeline.iter_csv(self.df, self.metadata_rows, chunk_rows)
+
+    def csv_text(self):
+        return ''.join(self.iter_csv())
+
+    def group_labels(self):
+        return self.groups
+
+    def cached_output(self, name, builder):
+        if name not in self.outputs:
+            output = builder()
+            if output is None:
+                return None
+            self.outputs[name] = output
+        return self.outputs[name]
+
+
+def merge_reports(sources, log=None):
+    """Parse several exports of the same day and merge them into one row per agent
+
+    Every export is parsed on its own, the raw rows are concatenated once and
+    the durations converted in one pass; a single groupby on the agent ID then
+    sums the counts and durations. HD, bands and the summary are worked out on
+    the consolidated rows, so partial rows are neither ranked nor counted twice.
+    """
+    log = log or report_pipeline._noop_log
+    if not sources:
+        raise ValueError("No exports to merge")
+
+    frames = []
+    names = []
+    preambles = []
+    skipped = 0
+    skipped_examples = []
+    kept_last = []
+    for number, source in enumerate(sources, start=1):
+        name = source_name(source, number)
+        if not report_pipeline.is_path(source) and hasattr(source, 'getvalue'):
+            source = source.getvalue()
+        quality = QualityReport()
+        raw, metadata_rows = report_pipeline.load_and_clean_data(source, log=log, quality=quality)
+        log(f"{name}: {len(raw)} rows")
+        frames.append(raw)
+        names.append(name)
+        preambles.append(metadata_rows)
+        skipped += quality.count(SKIPPED_LINES)
+        skipped_examples += [f"{name} {example}" for example in quality.checks[SKIPPED_LINES][1]]
+        if quality.count(TRAILING_ROW_KEPT):
+            kept_last.append(name)
+
+    dates = {extract_report_date(rows) for rows in preambles} - {None}
+    if len(dates) > 1:
+        log(f"Exports are from different days ({', '.join(sorted(str(day) for day in dates))}); merging anyway")
+
+    raw = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0].reset_index(drop=True)
+    missing = [col for col in report_pipeline.REQUIRED_COLUMNS if col not in raw.columns]
+    if missing:
+        raise ValueError(f"Exports are missing columns: {', '.join(missing)}")
+
+    # Per-row conversion once for all exports, then one groupby per agent
+    rows = report_pipeline.process_time_columns(raw.copy(), log=log)
+    keys = agent_keys(raw['ID'])
+    merged = consolidate(rows, keys)
+    log(f"Merged {len(raw)} rows from {len(frames)} exports into {len(merged)} agents")
+
+    processed = report_pipeline.select_columns(merged)
+    ordered = report_pipeline.sort_by_inbound(processed.rename_axis('_key').reset_index())
+    order = ordered.pop('_key')
+    groups = None
+    if report_pipeline.GROUP_COLUMN in merged.columns:
+        groups = merged[report_pipeline.GROUP_COLUMN].astype('category').reindex(order).set_axis(ordered.index)
+
+    # Column checks run on the rows as exported; repeated agents are what a merge consolidates
+    quality = check_rows(raw, report_pipeline.select_columns(rows))
+    del quality.checks[DUPLICATE_IDS]
+    quality.record(SKIPPED_LINES, skipped, skipped_examples)
+    quality.record(TRAILING_ROW_KEPT, len(kept_last), kept_last)
+
+    # First export's header rows (report date etc.) plus a note of what was merged
+    metadata_rows = list(preambles[0]) + [f"Merged {len(names)} exports: {', '.join(names)}\n"]
+    summary = ReportSummary.from_frame(ordered)
+    return MergedReport(ordered, metadata_rows, summary, groups, quality, names)
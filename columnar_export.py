@@ -0,0 +1,160 @@
+"""
+Agent Performance Data Processor - Columnar Export
+Parquet and Arrow IPC outputs of the processed report for BI tools and month-long analyses
+"""
+
+import os
+import json
+import importlib.util
+from datetime import date
+import numpy as np
+import pandas as pd
+import report_pipeline
+import metrics
+from performance_store import extract_report_date
+
+# Output formats and their file extensions
+COLUMNAR_FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+# File-level key/value metadata (the dialer preamble is kept here, not as text lines)
+METADATA_ROWS_KEY = b'agent_performance.metadata_rows'
+REPORT_DATE_KEY = b'agent_performance.report_date'
+
+# Extra column with the inbound band of each agent
+BAND_COLUMN = 'INBOUND BAND'
+
+
+def available():
+    """True when pyarrow is installed (the desktop build leaves it out)"""
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def _arrow():
+    """pyarrow is only needed for these outputs"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.ipc
+    except ImportError:
+        raise RuntimeError("Parquet / Arrow export needs the pyarrow package (pip install pyarrow)")
+    return pyarrow
+
+
+def _dictionary(pa, codes, categories):
+    """Categorical column from codes (-1 = missing) and its category names"""
+    codes = np.asarray(codes, dtype=np.int8)
+    indices = pa.array(codes, mask=codes < 0, type=pa.int8())
+    return pa.DictionaryArray.from_arrays(indices, pa.array(list(categories), type=pa.string()))
+
+
+def _column(pa, name, values):
+    """Arrow array with a fixed type per column, so reports of any size share one schema"""
+    if name in report_pipeline.DURATION_COLUMNS:
+        # Seconds -> real durations
+        seconds = pa.array(pd.array(values, dtype='Int64'))
+        return seconds.cast(pa.duration('s'))
+    if name in report_pipeline.COUNT_COLUMNS:
+        return pa.array(pd.array(values, dtype='Int64')).cast(pa.int32())
+    if isinstance(values.dtype, pd.CategoricalDtype) and name == 'REMARKS':
+        return _dictionary(pa, values.cat.codes, values.cat.categories)
+    return pa.array(values.astype(object).to_numpy(), from_pandas=True, type=pa.string())
+
+
+def report_table(df, metadata_rows):
+    """Processed report as an Arrow table with durations, categorical bands and file metadata"""
+    pa = _arrow()
+    names = list(df.columns)
+    arrays = [_column(pa, name, df[name]) for name in names]
+
+    if 'TOTAL INBOUND CALLS' in df.columns:
+        inbound = pd.to_numeric(df['TOTAL INBOUND CALLS'], errors='coerce').to_numpy(dtype=float)
+        names.append(BAND_COLUMN)
+        arrays.append(_dictionary(pa, report_pipeline.inbound_band_codes(inbound), report_pipeline.BAND_NAMES))
+
+    metadata = {METADATA_ROWS_KEY: json.dumps(list(metadata_rows or [])).encode('utf-8')}
+    report_date = extract_report_date(metadata_rows)
+    if report_date is not None:
+        metadata[REPORT_DATE_KEY] = report_date.isoformat().encode('ascii')
+    return pa.Table.from_arrays(arrays, names=names, metadata=metadata)
+
+
+def columnar_format(path):
+    """'parquet' or 'arrow' from a file name (None for anything else)"""
+    ext = os.path.splitext(str(path))[1].lower()
+    for fmt, fmt_ext in COLUMNAR_FORMATS.items():
+        if ext == fmt_ext or (fmt == 'arrow' and ext in ('.feather', '.ipc')):
+            return fmt
+    return None
+
+
+def write_parquet(df, metadata_rows, target, compression='zstd'):
+    """Write the report as Parquet to a path or binary file object"""
+    pa = _arrow()
+    pa.parquet.write_table(report_table(df, metadata_rows), target, compression=compression)
+    return target
+
+
+def write_arrow(df, metadata_rows, target):
+    """Write the report as an Arrow IPC file to a path or binary file object"""
+    pa = _arrow()
+    table = report_table(df, metadata_rows)
+    with pa.ipc.new_file(target, table.schema) as writer:
+        writer.write_table(table)
+    return target
+
+
+@metrics.timed('write_columnar')
+def write_columnar(df, metadata_rows, target, fmt=None):
+    """Write Parquet or Arrow, picking the format from the file name unless given"""
+    fmt = fmt or columnar_format(target)
+    if fmt == 'parquet':
+        return metrics.record_export(fmt, write_parquet(df, metadata_rows, target))
+    if fmt == 'arrow':
+        return metrics.record_export(fmt, write_arrow(df, metadata_rows, target))
+    raise ValueError(f"Unknown columnar format: {fmt}")
+
+
+def read_table(source, columns=None):
+    """Arrow table of a written report (Parquet or Arrow IPC)"""
+    pa = _arrow()
+    if columnar_format(source) == 'arrow':
+        # Memory-mapped: columns are used in place, not copied
+        table = pa.ipc.open_file(pa.memory_map(os.fspath(source))).read_all()
+        return table.select(columns) if columns else table
+    return pa.parquet.read_table(source, columns=columns)
+
+
+def report_metadata(table):
+    """(metadata_rows, report date string or None) stored in a table's schema"""
+    metadata = table.schema.metadata or {}
+    rows = json.loads(metadata.get(METADATA_ROWS_KEY, b'[]').decode('utf-8'))
+    report_date = metadata.get(REPORT_DATE_KEY)
+    return rows, report_date.decode('ascii') if report_date else None
+
+
+def read_report(source):
+    """Load one written report back as (DataFrame, metadata_rows)"""
+    table = read_table(source)
+    metadata_rows, _ = report_metadata(table)
+    return table.to_pandas(), metadata_rows
+
+
+def load_reports(paths, columns=None):
+    """Many written reports as one DataFrame with REPORT DATE and SOURCE columns
+
+    Each file is read column-wise (only the requested columns) and the tables
+    are concatenated before a single conversion to pandas.
+    """
+    pa = _arrow()
+    tables = []
+    for path in paths:
+        table = read_table(path, columns=columns)
+        _, report_date = report_metadata(table)
+        report_date = date.fromisoformat(report_date) if report_date else None
+        table = table.replace_schema_metadata(None)
+        table = table.append_column('REPORT DATE', pa.repeat(pa.scalar(report_date, type=pa.date32()), table.num_rows))
+        table = table.append_column('SOURCE', pa.repeat(pa.scalar(os.path.basename(str(path))), table.num_rows))
+        tables.append(table)
+    if not tables:
+        return pd.DataFrame()
+    return pa.concat_tables(tables, promote_options='permissive').to_pandas()
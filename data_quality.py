@@ -0,0 +1,137 @@
+"""
+Agent Performance Data Processor - Data Quality
+Column-wise checks of what the cleaning steps skip, blank or zero, collected into a compact report
+"""
+
+import numpy as np
+import pandas as pd
+import report_pipeline
+
+# Checks in report order
+SKIPPED_LINES = 'Lines skipped (more fields than the header)'
+TRAILING_ROW_KEPT = 'Last row kept (not a totals row)'
+MALFORMED_DURATIONS = 'Malformed durations (left blank)'
+NEGATIVE_DURATIONS = 'Negative durations (left blank)'
+LONGER_THAN_LOGIN = 'Durations longer than login TIME'
+INVALID_IDS = 'ID missing or not a number (set to 0)'
+DUPLICATE_IDS = 'Duplicate IDs'
+NON_NUMERIC_COUNTS = 'Non-numeric call counts (left blank)'
+CHECKS = [SKIPPED_LINES, TRAILING_ROW_KEPT, MALFORMED_DURATIONS, NEGATIVE_DURATIONS, LONGER_THAN_LOGIN,
+          INVALID_IDS, DUPLICATE_IDS, NON_NUMERIC_COUNTS]
+
+# Activity durations that cannot exceed the login time they are part of
+ACTIVITY_COLUMNS = ['PAUSE', 'WAIT', 'TALK', 'DISPO', 'DEAD', 'CUSTOMER']
+
+# Example values shown per check
+MAX_EXAMPLES = 3
+
+
+def _examples(values, limit=MAX_EXAMPLES):
+    """First few distinct values as text"""
+    return [str(value) for value in pd.unique(np.asarray(values, dtype=object))[:limit]]
+
+
+class QualityReport:
+    """Rows flagged per check, with a few example values each
+
+    The parser records what it skipped and whether the trailing row was a
+    totals row; check_rows() adds the column checks of the cleaned frame.
+    """
+
+    def __init__(self):
+        self.checks = {}        # check -> (rows, examples)
+
+    def record(self, check, rows, examples=()):
+        self.checks[check] = (int(rows), list(examples)[:MAX_EXAMPLES])
+
+    def record_parse(self, skipped, examples, kept_last_row=None):
+        """What the parser dropped: skipped lines, and the name on a last row kept as an agent"""
+        self.record(SKIPPED_LINES, skipped, examples)
+        self.record(TRAILING_ROW_KEPT, kept_last_row is not None, [kept_last_row] if kept_last_row else [])
+
+    def count(self, check):
+        return self.checks.get(check, (0, []))[0]
+
+    def rows(self):
+        """(check, rows, examples text) for every check that ran, in report order"""
+        order = CHECKS + [check for check in self.checks if check not in CHECKS]
+        return [(check, self.checks[check][0], ', '.join(self.checks[check][1]))
+                for check in order if check in self.checks]
+
+    def issues(self):
+        """Only the checks that flagged rows"""
+        return [row for row in self.rows() if row[1] > 0]
+
+    @property
+    def issue_count(self):
+        return sum(rows for _, rows, _ in self.issues())
+
+    def lines(self):
+        """One line per issue for logs and the desktop summary"""
+        return [f"{check}: {rows}" + (f" (e.g. {examples})" if examples else '')
+                for check, rows, examples in self.issues()]
+
+    def frame(self):
+        """The report as a table"""
+        return pd.DataFrame(self.rows(), columns=['Check', 'Rows', 'Examples'])
+
+
+def check_rows(raw, rows, quality=None):
+    """Column checks of the cleaned rows against the parsed text they came from (same index)
+
+    Everything is a comparison of whole columns: a value that was present in
+    the text but is missing (or zero) after conversion was coerced.
+    """
+    quality = quality if quality is not None else QualityReport()
+    names = rows['USER NAME'].astype(object) if 'USER NAME' in rows.columns else pd.Series(rows.index, index=rows.index)
+
+    # Durations: present in the text, blank after parsing
+    malformed = []
+    for col in report_pipeline.DURATION_COLUMNS:
+        if col in raw.columns and col in rows.columns:
+            candidates = raw[col].notna().to_numpy() & rows[col].isna().to_numpy()
+            if candidates.any():
+                text = raw[col][candidates].astype(str).str.strip()
+                malformed.append(col + '=' + text[text != ''])
+    malformed = pd.concat(malformed) if malformed else pd.Series(dtype=object)
+    quality.record(MALFORMED_DURATIONS, len(malformed), _examples(malformed))
+    negative = malformed[malformed.str.split('=', n=1).str[1].str.startswith('-')] if len(malformed) else malformed
+    quality.record(NEGATIVE_DURATIONS, len(negative), _examples(negative))
+
+    # Activities longer than the login time they belong to
+    if 'TIME' in rows.columns:
+        login = rows['TIME'].to_numpy(dtype='float64', na_value=np.nan)
+        longer = np.zeros(len(rows), dtype=bool)
+        first_column = np.full(len(rows), '', dtype=object)
+        for col in ACTIVITY_COLUMNS:
+            if col in rows.columns:
+                over = rows[col].to_numpy(dtype='float64', na_value=np.nan) > login
+                first_column[over & ~longer] = col
+                longer |= over
+        # Object arrays on both sides: a str Series plus an (empty) object array raises
+        labels = names[longer].astype(str).to_numpy(dtype=object) + ' ' + first_column[longer]
+        quality.record(LONGER_THAN_LOGIN, longer.sum(), _examples(labels))
+
+    # IDs: zero after conversion but not a zero in the text; repeated IDs
+    if 'ID' in rows.columns:
+        ids = rows['ID']
+        zero = (ids == 0).to_numpy()
+        if zero.any() and 'ID' in raw.columns:
+            zero_text = pd.to_numeric(raw['ID'][zero], errors='coerce') == 0
+            invalid = raw['ID'][zero][~zero_text.to_numpy()]
+        else:
+            invalid = pd.Series(dtype=object)
+        quality.record(INVALID_IDS, len(invalid), _examples(invalid.fillna('(blank)')))
+        repeated = ids.duplicated(keep=False).to_numpy() & ~zero
+        quality.record(DUPLICATE_IDS, repeated.sum(), _examples(ids[repeated]))
+
+    # Call counts: present in the text, blank after conversion
+    bad_counts = []
+    for col in report_pipeline.COUNT_COLUMNS:
+        if col != 'ID' and col in raw.columns and col in rows.columns:
+            coerced = raw[col].notna().to_numpy() & rows[col].isna().to_numpy()
+            if coerced.any():
+                bad_counts.append(col + '=' + raw[col][coerced].astype(str))
+    bad_counts = pd.concat(bad_counts) if bad_counts else pd.Series(dtype=object)
+    quality.record(NON_NUMERIC_COUNTS, len(bad_counts), _examples(bad_counts))
+    return quality
@@ -0,0 +1,139 @@
+"""
+Agent Performance Data Processor - Grouped Workbook Export
+One styled sheet per team plus the overall sheet, with sheets built in parallel worker processes
+"""
+
+import io
+import os
+import re
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from openpyxl import Workbook
+import report_pipeline
+from report_summary import ReportSummary
+
+# Sheet for agents without a team
+NO_GROUP_LABEL = 'No Group'
+
+# Below this many rows the sheets are written in-process (worker start-up costs more)
+PARALLEL_MIN_ROWS = 20000
+
+# Characters Excel does not allow in sheet names
+INVALID_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+MAX_SHEET_NAME = 31
+
+
+def sheet_title(name, used):
+    """Valid, unique Excel sheet name for a team"""
+    base = INVALID_SHEET_CHARS.sub('_', str(name)).strip().strip("'") or NO_GROUP_LABEL
+    title = base[:MAX_SHEET_NAME]
+    number = 2
+    while title.lower() in used:
+        suffix = f" ({number})"
+        title = base[:MAX_SHEET_NAME - len(suffix)] + suffix
+        number += 1
+    used.add(title.lower())
+    return title
+
+
+def split_by_group(df, groups):
+    """(team, rows) per team in name order, rows keeping the sorted report order (one groupby)"""
+    labels = groups.astype(object).where(groups.notna(), NO_GROUP_LABEL).astype(str).to_numpy()
+    positions = df.groupby(labels, sort=True).indices
+    return [(team, df.iloc[index]) for team, index in positions.items()]
+
+
+def _write_sheets(wb, sheets, metadata_rows, summary_offset, average_as_text):
+    for title, part, summary in sheets:
+        if summary is None:
+            summary = ReportSummary.from_frame(part)
+        report_pipeline.write_report_sheet(wb, title, report_pipeline.sheet_payload(part), metadata_rows, summary,
+                                           summary_offset=summary_offset, average_as_text=average_as_text)
+
+
+def _sheet_file(title, part, metadata_rows, summary, summary_offset, average_as_text):
+    """Worker: write one sheet into its own workbook and return (sheet XML, styles XML)"""
+    wb = Workbook(write_only=True)
+    _write_sheets(wb, [(title, part, summary)], metadata_rows, summary_offset, average_as_text)
+    with zipfile.ZipFile(report_pipeline.save_workbook(wb)) as archive:
+        return archive.read('xl/worksheets/sheet1.xml'), archive.read('xl/styles.xml')
+
+
+def _skeleton(sheets, columns, quality=None):
+    """Workbook with every sheet (header only) registering the same styles the workers use"""
+    wb = Workbook(write_only=True)
+    empty = (columns, [], np.zeros((0, len(columns)), dtype=np.int8))
+    for title, _, _ in sheets:
+        report_pipeline.write_report_sheet(wb, title, empty, [], ReportSummary())
+    # The quality sheet is small and unstyled: written here in full
+    if quality is not None:
+        report_pipeline.write_quality_sheet(wb, quality)
+    return zipfile.ZipFile(report_pipeline.save_workbook(wb))
+
+
+def _save_in_process(sheets, metadata_rows, target, summary_offset, average_as_text, quality):
+    wb = Workbook(write_only=True)
+    _write_sheets(wb, sheets, metadata_rows, summary_offset, average_as_text)
+    if quality is not None:
+        report_pipeline.write_quality_sheet(wb, quality)
+    return report_pipeline.save_workbook(wb, target)
+
+
+def _pool_context():
+    """Start workers without forking a threaded host (Streamlit, the Tk GUI)"""
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    # Workers fork from a server that already imported pandas and openpyxl
+    context.set_forkserver_preload(['grouped_export'])
+    return context
+
+
+def save_grouped_excel(df, groups, metadata_rows, target=None, summary=None, workers=None,
+                       summary_offset=1, average_as_text=False, quality=None):
+    """Workbook with the overall sheet first, one styled sheet per team and the data quality sheet
+
+    groups holds the team of each row of df (same index). Each sheet is
+    serialized by its own worker process and the sheet files are assembled into
+    one XLSX, so export time follows the largest sheet, not the number of teams.
+    """
+    used = {report_pipeline.DEFAULT_SHEET_NAME.lower()}
+    sheets = [(report_pipeline.DEFAULT_SHEET_NAME, df, summary)]
+    for team, part in split_by_group(df, groups):
+        sheets.append((sheet_title(team, used), part, None))
+
+    workers = workers or min(len(sheets), os.cpu_count() or 1)
+    if workers < 2 or len(df) < PARALLEL_MIN_ROWS:
+        return _save_in_process(sheets, metadata_rows, target, summary_offset, average_as_text, quality)
+
+    # Largest sheets first so one big team does not start last
+    order = sorted(range(len(sheets)), key=lambda i: -len(sheets[i][1]))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+        futures = {
+            i: pool.submit(_sheet_file, sheets[i][0], sheets[i][1], metadata_rows, sheets[i][2],
+                           summary_offset, average_as_text)
+            for i in order
+        }
+        sheet_files = {i: future.result() for i, future in futures.items()}
+
+    # Swap the worker-written sheets into a skeleton carrying the workbook parts
+    skeleton = _skeleton(sheets, list(df.columns), quality)
+    styles = skeleton.read('xl/styles.xml')
+    if any(styles_xml != styles for _, styles_xml in sheet_files.values()):
+        # Style ids would not line up; fall back to writing in-process
+        skeleton.close()
+        return _save_in_process(sheets, metadata_rows, target, summary_offset, average_as_text, quality)
+
+    output = target if target is not None else io.BytesIO()
+    with skeleton, zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for item in skeleton.infolist():
+            match = re.fullmatch(r'xl/worksheets/sheet(\d+)\.xml', item.filename)
+            if match and int(match.group(1)) - 1 in sheet_files:
+                archive.writestr(item.filename, sheet_files[int(match.group(1)) - 1][0])
+            else:
+                archive.writestr(item, skeleton.read(item))
+    if hasattr(output, 'seek'):
+        output.seek(0)
+    return output
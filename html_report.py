@@ -0,0 +1,119 @@
+"""
+Agent Performance Data Processor - HTML Report
+Compact static HTML of a processed report: highlights as CSS classes, rows written in chunks
+"""
+
+import html
+import numpy as np
+import pandas as pd
+import report_pipeline
+import metrics
+from table_view import band_labels
+
+# Everything is scoped to this table class, so the report can sit inside another page (Streamlit)
+TABLE_CLASS = 'agent-report'
+DEFAULT_TITLE = 'Agent Performance Report'
+
+# Opening tag per style code: highlighted cells carry a short class, defined once in the stylesheet
+_CELL_TAGS = np.array(['<td>'] + [f'<td class="s{code}">' for code in sorted(report_pipeline.STYLE_COLORS)],
+                      dtype=object)
+
+
+def stylesheet():
+    """CSS for the table and one rule per highlight colour"""
+    scope = f"table.{TABLE_CLASS}"
+    rules = [
+        f"{scope}{{border-collapse:collapse;font-family:Arial,sans-serif;font-size:13px}}",
+        f"{scope} th,{scope} td{{border:1px solid #ddd;padding:2px 6px;text-align:center}}",
+        f"{scope} thead th{{background:#f0f2f6}}",
+        f"{scope}.summary th{{text-align:left}}",
+        f".{TABLE_CLASS}-meta{{font-family:Arial,sans-serif;font-size:13px;margin:2px 0}}",
+    ]
+    for code in sorted(report_pipeline.STYLE_COLORS):
+        rules.append(f"{scope} td.s{code}{{background-color:#{report_pipeline.STYLE_COLORS[code]};"
+                     f"color:black;font-weight:bold}}")
+    return '\n'.join(rules)
+
+
+def summary_rows(summary):
+    """(label, value) lines of the summary block"""
+    rows = [
+        ('Total agents', f"{summary.total_agents:,}"),
+        ('Total inbound calls', f"{summary.total_inbound:,}"),
+        ('Average inbound calls', f"{summary.avg_inbound:.2f}"),
+    ]
+    if summary.top_performer is not None:
+        rows.append(('Top performer', f"{summary.top_performer} ({summary.top_inbound} calls)"))
+    rows.append(('HD agents', f"{summary.hd_count:,}"))
+    for band, label in band_labels().items():
+        rows.append((label, f"{summary.band_counts[band]:,} agents"))
+    return rows
+
+
+def _cell_text(values):
+    """Escaped text per value of a display column (missing values empty)"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Escape each distinct name once
+        categories = [html.escape(str(category)) for category in values.cat.categories] + ['']
+        return np.array(categories, dtype=object)[values.cat.codes.to_numpy()]
+    text = values.astype(object).where(values.notna(), '').to_numpy()
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        return text.astype(str).astype(object)
+    return np.array([html.escape(str(value)) for value in text], dtype=object)
+
+
+def iter_table(df, chunk_rows=report_pipeline.CSV_CHUNK_ROWS):
+    """HTML of the report table, chunk_rows rows at a time
+
+    Cells are built a column at a time for a chunk of rows, so the markup
+    per cell is just the value and, when highlighted, a class name.
+    """
+    codes = report_pipeline.excel_style_codes(df)
+    header = ''.join(f"<th>{html.escape(str(col))}</th>" for col in df.columns)
+    yield f'<table class="{TABLE_CLASS}">\n<thead><tr><th></th>{header}</tr></thead>\n<tbody>\n'
+    for start in range(0, len(df), chunk_rows):
+        part = report_pipeline.display_frame(df.iloc[start:start + chunk_rows])
+        part_codes = codes[start:start + chunk_rows]
+        rows = '<tr><th>' + part.index.astype(str).to_numpy(dtype=object) + '</th>'
+        for i, col in enumerate(part.columns):
+            rows = rows + _CELL_TAGS[part_codes[:, i]] + _cell_text(part[col]) + '</td>'
+        yield '</tr>\n'.join(rows) + '</tr>\n' if len(rows) else ''
+    yield '</tbody>\n</table>\n'
+
+
+def iter_html(df, metadata_rows=(), summary=None, title=DEFAULT_TITLE, full_page=True,
+              chunk_rows=report_pipeline.CSV_CHUNK_ROWS):
+    """Report as HTML text chunks: header rows, summary block and table
+
+    full_page=False leaves out the document wrapper (for embedding); the
+    stylesheet is always included.
+    """
+    style = f"<style>\n{stylesheet()}\n</style>\n"
+    if full_page:
+        yield (f'<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n'
+               f'<title>{html.escape(title)}</title>\n{style}</head>\n<body>\n'
+               f'<h2>{html.escape(title)}</h2>\n')
+    else:
+        yield style
+    for row in metadata_rows:
+        clean_row = row.strip().replace('\n', '')
+        if clean_row:
+            yield f'<p class="{TABLE_CLASS}-meta">{html.escape(clean_row)}</p>\n'
+    if summary is not None:
+        lines = ''.join(f"<tr><th>{html.escape(label)}</th><td>{html.escape(value)}</td></tr>"
+                        for label, value in summary_rows(summary))
+        yield f'<table class="{TABLE_CLASS} summary">\n{lines}\n</table>\n<br>\n'
+    yield from iter_table(df, chunk_rows)
+    if full_page:
+        yield '</body>\n</html>\n'
+
+
+def html_text(df, metadata_rows=(), summary=None, **options):
+    return ''.join(iter_html(df, metadata_rows, summary, **options))
+
+
+@metrics.timed('write_html')
+def write_html(df, metadata_rows, target, summary=None, **options):
+    """Stream the HTML report (UTF-8) to a path or binary file object"""
+    chunks = iter_html(df, metadata_rows, summary, **options)
+    return metrics.record_export('html', report_pipeline.write_chunks(report_pipeline.iter_encoded(chunks), target))
@@ -0,0 +1,250 @@
+"""
+Agent Performance Data Processor - Incremental Refresh
+Re-processes only the agents whose rows changed between intraday exports of the same report
+"""
+
+import re
+import hashlib
+from collections import OrderedDict, namedtuple
+import pandas as pd
+import report_pipeline
+import xlsx_input
+import metrics
+from report_summary import ReportSummary
+from data_quality import QualityReport, check_rows
+
+# Results returned to the front ends
+RefreshResult = namedtuple('RefreshResult', ['df', 'metadata_rows', 'summary', 'mode', 'changed', 'quality'],
+                           defaults=[None])
+
+# Below this share of known agents a "refresh" is treated as a different report
+MIN_AGENT_OVERLAP = 0.5
+
+
+def report_key(metadata_rows):
+    """Identity of a report from its preamble, ignoring clock times that change per export"""
+    parts = []
+    for row in metadata_rows or []:
+        row = re.sub(r'\d{1,2}:\d{2}(:\d{2})?', '', row)
+        parts.append(' '.join(row.split()))
+    return '\n'.join(part for part in parts if part)
+
+
+def row_keys(raw):
+    """Stable per-row key: raw agent ID plus occurrence number for repeated IDs"""
+    ids = raw['ID'].astype(str)
+    return ids + '#' + ids.groupby(ids).cumcount().astype(str)
+
+
+class CachedReport:
+    """Last processed version of one report"""
+
+    def __init__(self, metadata_rows, columns, hashes, rows, summary):
+        self.metadata_rows = metadata_rows
+        self.columns = columns
+        self.hashes = hashes      # row key -> raw row hash
+        self.rows = rows          # processed rows indexed by row key, in file order
+        self.summary = summary   # ReportSummary of the current version
+        self.quality = None       # QualityReport of the current version
+        self.groups = None        # row key -> team (CURRENT USER GROUP) when the export has it
+        self.content_hash = None
+        self.order = None
+        self.sorted_df = None
+        self.csv_lines = None     # row key -> rendered CSV line
+        self.outputs = {}         # output name -> built output for the current version
+
+    def set_metadata(self, metadata_rows):
+        """Take a refresh's header rows; built outputs embed them, so they go when the rows change"""
+        if metadata_rows != self.metadata_rows:
+            self.outputs = {}
+        self.metadata_rows = metadata_rows
+
+
+class IncrementalProcessor:
+    """Keeps recently processed reports and patches them when a newer export arrives"""
+
+    def __init__(self, max_reports=8):
+        self.max_reports = max_reports
+        self._reports = OrderedDict()
+        self._last_key = None
+
+    def process(self, source, log=None):
+        """Process a report, reusing the cached version when it is a refresh of a known one"""
+        log = log or report_pipeline._noop_log
+        if xlsx_input.is_xlsx(source):
+            # Workbooks are streamed to a CSV copy on disk and read like any export file
+            with xlsx_input.csv_copy(source, report_pipeline._layout_cache().is_header) as path:
+                return self.process(path, log=log)
+        if report_pipeline.is_path(source):
+            # Files on disk are memory-mapped and parsed in place
+            with report_pipeline.MappedReport(source, log=log) as report:
+                return self._process(report.metadata_rows, report.data_hash(), report.parse, log)
+
+        content = report_pipeline.read_source_text(source)
+        metadata_rows, data_content, profile = report_pipeline.split_layout(content, log=log)
+        content_hash = hashlib.blake2b(data_content.encode('utf-8', errors='ignore'), digest_size=16).digest()
+        return self._process(metadata_rows, content_hash,
+                             lambda log, quality: report_pipeline.parse_data_section(
+                                 data_content, log=log, layout=profile, quality=quality), log)
+
+    def _process(self, metadata_rows, content_hash, parse, log):
+        result = self._refresh(metadata_rows, content_hash, parse, log)
+        # Unchanged and patched reports reuse the cached one
+        metrics.record_cache('report', result.mode != 'full')
+        return result
+
+    def _refresh(self, metadata_rows, content_hash, parse, log):
+        key = report_key(metadata_rows)
+
+        # Identical data section: nothing to parse or recompute
+        cached = self._reports.get(key)
+        if cached is not None and cached.content_hash == content_hash:
+            cached.set_metadata(metadata_rows)
+            self._remember(key, cached)
+            log("Report unchanged since last refresh")
+            return RefreshResult(self._sorted(cached), metadata_rows, cached.summary, 'unchanged', 0, cached.quality)
+
+        quality = QualityReport()
+        raw = parse(log=log, quality=quality)
+        keys = row_keys(raw)
+        raw = raw.set_axis(keys)
+        hashes = pd.util.hash_pandas_object(raw, index=False)
+
+        if cached is not None and cached.columns == list(raw.columns):
+            overlap = hashes.index.isin(cached.hashes.index).mean() if len(hashes) else 0.0
+            if overlap >= MIN_AGENT_OVERLAP:
+                return self._patch(key, cached, raw, hashes, content_hash, metadata_rows, quality, log)
+
+        return self._full(key, raw, hashes, content_hash, metadata_rows, quality, log)
+
+    def _full(self, key, raw, hashes, content_hash, metadata_rows, quality, log):
+        """Process every row and cache the result"""
+        rows = self._derive(raw, log)
+        cached = CachedReport(metadata_rows, list(raw.columns), hashes, rows, ReportSummary.from_frame(rows))
+        cached.content_hash = content_hash
+        cached.groups = self._groups(raw)
+        cached.quality = self._check(raw, cached, quality, log)
+        self._remember(key, cached)
+        log(f"Full processing: {len(rows)} agents")
+        return RefreshResult(self._sorted(cached), metadata_rows, cached.summary, 'full', len(rows), cached.quality)
+
+    def _patch(self, key, cached, raw, hashes, content_hash, metadata_rows, quality, log):
+        """Recompute only new or changed rows and patch the cached report"""
+        previous = cached.hashes.reindex(hashes.index)
+        changed_keys = hashes.index[previous.isna().to_numpy() | (previous.to_numpy() != hashes.to_numpy())]
+        removed_keys = cached.hashes.index.difference(hashes.index)
+
+        cached.content_hash = content_hash
+        if len(changed_keys) == 0 and len(removed_keys) == 0:
+            cached.set_metadata(metadata_rows)
+            cached.quality = self._check(raw, cached, quality, log)
+            self._remember(key, cached)
+            log("Report unchanged since last refresh")
+            return RefreshResult(self._sorted(cached), metadata_rows, cached.summary, 'unchanged', 0, cached.quality)
+
+        # Take the outgoing rows out of the summary, then add the recomputed ones
+        outgoing = cached.rows.loc[cached.rows.index.intersection(changed_keys.append(removed_keys))]
+        fresh = self._derive(raw.loc[changed_keys], log)
+        summary = cached.summary - ReportSummary.from_frame(outgoing) + ReportSummary.from_frame(fresh)
+
+        # Keep file order so ties sort exactly as a full run would
+        unchanged = cached.rows.loc[hashes.index.difference(changed_keys)]
+        previous_dtypes = cached.rows.dtypes.astype(str)
+        cached.rows = report_pipeline.compact_frame(pd.concat([unchanged, fresh]).reindex(hashes.index))
+        cached.hashes = hashes
+        cached.groups = self._groups(raw)
+        cached.summary = summary
+        cached.metadata_rows = metadata_rows
+        cached.sorted_df = None
+        cached.outputs = {}
+        if not cached.rows.dtypes.astype(str).equals(previous_dtypes):
+            # Number formatting may change for every row, so re-render lazily
+            cached.csv_lines = None
+        if cached.csv_lines is not None:
+            for row_key in removed_keys.append(changed_keys):
+                cached.csv_lines.pop(row_key, None)
+            cached.csv_lines.update(self._render_csv_lines(fresh))
+        cached.quality = self._check(raw, cached, quality, log)
+        self._remember(key, cached)
+
+        log(f"Incremental refresh: {len(changed_keys)} changed, {len(removed_keys)} removed of {len(hashes)} agents")
+        return RefreshResult(self._sorted(cached), metadata_rows, summary, 'incremental', len(changed_keys),
+                             cached.quality)
+
+    def _derive(self, raw, log):
+        """Derived columns for a set of raw rows, still indexed by row key"""
+        return report_pipeline.select_columns(report_pipeline.process_time_columns(raw.copy(), log=log))
+
+    def _check(self, raw, cached, quality, log):
+        """Column checks over every row (not only the recomputed ones), cheap next to the parse"""
+        quality = check_rows(raw, cached.rows, quality)
+        if quality.issues():
+            log(f"Data quality: {quality.issue_count} rows flagged in {len(quality.issues())} checks")
+        return quality
+
+    def _groups(self, raw):
+        """Team per row key, kept beside the processed rows (which drop the column)"""
+        if report_pipeline.GROUP_COLUMN not in raw.columns:
+            return None
+        return raw[report_pipeline.GROUP_COLUMN].astype('category')
+
+    def _sorted(self, cached):
+        """Sorted output frame for the current version"""
+        if cached.sorted_df is None:
+            ordered = report_pipeline.sort_by_inbound(cached.rows.rename_axis('_row_key').reset_index())
+            cached.order = ordered.pop('_row_key').tolist()
+            cached.sorted_df = ordered
+            cached.summary.set_top_performer(ordered)
+        return cached.sorted_df
+
+    def _remember(self, key, cached):
+        """Store a report as most recently used, evicting the oldest"""
+        self._reports[key] = cached
+        self._reports.move_to_end(key)
+        self._last_key = key
+        while len(self._reports) > self.max_reports:
+            self._reports.popitem(last=False)
+
+    def _render_csv_lines(self, rows):
+        """Render processed rows as CSV lines keyed by row key"""
+        if len(rows) == 0:
+            return {}
+        text = report_pipeline.display_frame(rows).to_csv(index=False, header=False, lineterminator='\n')
+        return dict(zip(rows.index, text.split('\n')[:-1]))
+
+    def iter_csv(self, chunk_rows=report_pipeline.CSV_CHUNK_ROWS):
+        """CSV of the last processed report with metadata rows, in chunks of patched per-agent lines"""
+        cached = self._reports[self._last_key]
+        df = self._sorted(cached)
+        if cached.csv_lines is None:
+            cached.csv_lines = self._render_csv_lines(cached.rows)
+        lines = cached.csv_lines
+        order = cached.order
+        if cached.metadata_rows:
+            yield ''.join(cached.metadata_rows)
+        yield pd.DataFrame(columns=df.columns).to_csv(index=False, lineterminator='\n')
+        for start in range(0, len(order), chunk_rows):
+            yield ''.join(lines[row_key] + '\n' for row_key in order[start:start + chunk_rows])
+
+    def csv_text(self):
+        """CSV of the last processed report as one string"""
+        return metrics.record_text('csv', ''.join(self.iter_csv()))
+
+    def group_labels(self):
+        """Team of each row of the last sorted report (None when the export has no groups)"""
+        cached = self._reports[self._last_key]
+        if cached.groups is None:
+            return None
+        df = self._sorted(cached)
+        return cached.groups.reindex(cached.order).set_axis(df.index)
+
+    def cached_output(self, name, builder):
+        """Build an output once per report version (e.g. the styled workbook)"""
+        cached = self._reports[self._last_key]
+        metrics.record_cache('outputs', name in cached.outputs)
+        if name not in cached.outputs:
+            output = builder()
+            if output is None:
+                return None
+            cached.outputs[name] = output
+        return cached.outputs[name]
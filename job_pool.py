@@ -0,0 +1,197 @@
+"""
+Agent Performance Data Processor - Shared Job Pool
+Process-wide bounded executor with per-session fairness and memory-budget admission
+"""
+
+import os
+import threading
+from collections import OrderedDict, deque
+import metrics
+import xlsx_input
+
+# Defaults for a single-box deployment (override with environment variables)
+DEFAULT_WORKERS = int(os.environ.get('AGENT_PERF_WORKERS', '2'))
+DEFAULT_MEMORY_BUDGET_MB = int(os.environ.get('AGENT_PERF_MEMORY_BUDGET_MB', '1024'))
+
+# Jobs above this many rows are "heavy" and need memory budget to start
+HEAVY_ROW_THRESHOLD = 50000
+# Rough peak memory per report row across parsing, styling and workbook building
+BYTES_PER_ROW = 4096
+
+
+class JobCancelled(Exception):
+    """Raised by Ticket.result() for a job cancelled before it started"""
+
+
+class Ticket:
+    """Handle on a submitted job"""
+
+    def __init__(self, pool, session_id, fn, args, kwargs, estimated_rows):
+        self.pool = pool
+        self.session_id = session_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.estimated_rows = estimated_rows
+        self.estimated_bytes = estimated_rows * pool.bytes_per_row
+        self.heavy = estimated_rows > pool.heavy_row_threshold
+        self.state = 'queued'
+        self._value = None
+        self._error = None
+        self._done = threading.Event()
+
+    def position(self):
+        """1-based position in the dispatch order (0 once running or finished)"""
+        return self.pool.position(self)
+
+    def wait(self, timeout=None):
+        """Wait for the job to finish; True when done"""
+        return self._done.wait(timeout)
+
+    def done(self):
+        return self._done.is_set()
+
+    def cancel(self):
+        """Withdraw the job if it has not started yet"""
+        return self.pool.cancel(self)
+
+    def result(self, timeout=None):
+        """The job's return value (re-raises its exception)"""
+        if not self._done.wait(timeout):
+            raise TimeoutError("job still running")
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+class JobPool:
+    """Bounded worker threads fed round-robin from per-session queues"""
+
+    def __init__(self, workers=DEFAULT_WORKERS, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB,
+                 heavy_row_threshold=HEAVY_ROW_THRESHOLD, bytes_per_row=BYTES_PER_ROW):
+        self.workers = workers
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.heavy_row_threshold = heavy_row_threshold
+        self.bytes_per_row = bytes_per_row
+        self._queues = OrderedDict()   # session id -> deque of tickets, in round-robin order
+        self._running = []
+        self._memory_in_use = 0
+        self._lock = threading.Condition()
+        self._threads = []
+        metrics.REGISTRY.register_gauge('queue_depth', 'Jobs waiting for a worker',
+                                        lambda: self.stats()['queued'], [('queue', 'job_pool')])
+        metrics.REGISTRY.register_gauge('jobs_running', 'Jobs being processed',
+                                        lambda: self.stats()['running'], [('queue', 'job_pool')])
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f"job-pool-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, session_id, fn, *args, estimated_rows=0, **kwargs):
+        """Queue fn(*args, **kwargs) for a session and return its Ticket"""
+        ticket = Ticket(self, session_id, fn, args, kwargs, estimated_rows)
+        with self._lock:
+            self._queues.setdefault(session_id, deque()).append(ticket)
+            self._lock.notify_all()
+        return ticket
+
+    def cancel(self, ticket):
+        with self._lock:
+            queue = self._queues.get(ticket.session_id)
+            if ticket.state != 'queued' or queue is None or ticket not in queue:
+                return False
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[ticket.session_id]
+            ticket.state = 'cancelled'
+            ticket._error = JobCancelled()
+            ticket._done.set()
+            self._lock.notify_all()
+            return True
+
+    def _admissible(self, ticket):
+        """Light jobs always fit; heavy jobs need memory budget (or an otherwise idle pool)"""
+        if not ticket.heavy:
+            return True
+        if self._memory_in_use + ticket.estimated_bytes <= self.memory_budget:
+            return True
+        # A job bigger than the whole budget still runs, but only on its own
+        return not any(running.heavy for running in self._running)
+
+    def _dispatch_order(self):
+        """Queued tickets in the order they would start: one per session per round"""
+        queues = [list(queue) for queue in self._queues.values()]
+        order = []
+        depth = 0
+        while True:
+            layer = [queue[depth] for queue in queues if depth < len(queue)]
+            if not layer:
+                return order
+            order.extend(layer)
+            depth += 1
+
+    def _next_ticket(self):
+        """Head of the next session (round-robin) whose job can be admitted (caller holds the lock)"""
+        for session_id, queue in list(self._queues.items()):
+            ticket = queue[0]
+            if not self._admissible(ticket):
+                continue
+            queue.popleft()
+            # Served sessions go to the back of the rotation
+            del self._queues[session_id]
+            if queue:
+                self._queues[session_id] = queue
+            return ticket
+        return None
+
+    def _worker(self):
+        while True:
+            with self._lock:
+                ticket = self._next_ticket()
+                while ticket is None:
+                    self._lock.wait()
+                    ticket = self._next_ticket()
+                ticket.state = 'running'
+                self._running.append(ticket)
+                if ticket.heavy:
+                    self._memory_in_use += ticket.estimated_bytes
+
+            try:
+                ticket._value = ticket.fn(*ticket.args, **ticket.kwargs)
+            except BaseException as e:
+                ticket._error = e
+            finally:
+                with self._lock:
+                    self._running.remove(ticket)
+                    if ticket.heavy:
+                        self._memory_in_use -= ticket.estimated_bytes
+                    ticket.state = 'failed' if ticket._error is not None else 'done'
+                    ticket._done.set()
+                    self._lock.notify_all()
+
+    def position(self, ticket):
+        with self._lock:
+            if ticket.state != 'queued':
+                return 0
+            order = self._dispatch_order()
+            return order.index(ticket) + 1 if ticket in order else 0
+
+    def stats(self):
+        """Queue depth and load for status displays"""
+        with self._lock:
+            return {
+                'queued': sum(len(queue) for queue in self._queues.values()),
+                'running': len(self._running),
+                'sessions_waiting': len(self._queues),
+                'memory_in_use_mb': round(self._memory_in_use / (1024 * 1024), 1),
+                'memory_budget_mb': round(self.memory_budget / (1024 * 1024), 1),
+            }
+
+
+def estimate_rows(data):
+    """Cheap row estimate for uploaded bytes (line count, or the sheet size of a workbook)"""
+    if not isinstance(data, (bytes, bytearray)):
+        return 0
+    if xlsx_input.is_xlsx(data):
+        return xlsx_input.estimate_rows(data)
+    return data.count(b'\n')
@@ -0,0 +1,335 @@
+"""
+Agent Performance Data Processor - Report Layout Profiles
+Remembers where the header, delimiter and kept columns are for each dialer report template
+"""
+
+import os
+import re
+import csv
+import json
+import time
+import hashlib
+import threading
+import metrics
+import vendor_mappings
+
+# Row that marks the start of the data section
+HEADER_MARKER = 'USER NAME'
+
+# Delimiters tried when a new layout is detected (dialers export ',' or ';' by locale)
+CANDIDATE_DELIMITERS = (',', ';', '\t', '|')
+FIELD_SPLIT = re.compile(r'[,;\t|]')
+
+# Data bytes sampled to decide between UTF-8 and the Windows code page
+ENCODING_SAMPLE_BYTES = 64 * 1024
+FALLBACK_ENCODING = 'cp1252'
+
+# Known layouts kept, least recently used dropped first
+MAX_PROFILES = 32
+
+PROFILE_FILE_NAME = 'layout_profiles.json'
+
+
+def template_text(line):
+    """A preamble row with the parts that change per export (digits, spacing) removed"""
+    return ' '.join(re.sub(r'\d+', '#', line).split())
+
+
+def preamble_fingerprint(lines, header):
+    """Identity of a report template: the preamble rows as templates plus the header row"""
+    parts = [template_text(line) for line in lines if line.strip()]
+    parts.append(header)
+    return hashlib.blake2b('\n'.join(parts).encode('utf-8'), digest_size=12).hexdigest()
+
+
+def preamble_lines(buffer, offset, encoding):
+    """Text rows before the header row of a bytes-like report"""
+    text = bytes(buffer[:offset]).decode(encoding, errors='ignore')
+    return [line.rstrip('\r') for line in text.split('\n')]
+
+
+def sniff_delimiter(header):
+    """Delimiter that splits the header row into the most fields"""
+    counts = [(header.count(delimiter), delimiter) for delimiter in CANDIDATE_DELIMITERS]
+    count, delimiter = max(counts, key=lambda item: item[0])
+    return delimiter if count else ','
+
+
+def split_header(header, delimiter):
+    """Column names of a header row (quoted names handled like the CSV parser does)"""
+    return next(csv.reader([header], delimiter=delimiter), [])
+
+
+def detect_encoding(sample):
+    """'utf-8' when the sample decodes as UTF-8, else the Windows code page dialers use"""
+    # Cut at the last line end so a character split by the sample size does not count
+    end = sample.rfind(b'\n')
+    if end > 0:
+        sample = sample[:end]
+    try:
+        sample.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+
+
+class LayoutProfile:
+    """Where the data starts and how to read it, for one report template"""
+
+    def __init__(self, fingerprint, header, header_line, header_offset, delimiter, encoding,
+                 columns, keep, drop, preamble=None, vendor='standard', names=None, mapping_version=None):
+        self.fingerprint = fingerprint
+        self.header = header                # header row text, without the line end
+        self.header_line = header_line      # line number of the header row
+        self.header_offset = header_offset  # byte offset of the header row (None when only seen as text)
+        self.delimiter = delimiter
+        self.encoding = encoding
+        self.columns = columns              # header column names in file order
+        self.names = names or vendor_mappings.unique_names(columns)   # pipeline name per column
+        self.keep = keep                    # pipeline columns kept, in file order
+        self.drop = drop                    # file columns dropped while parsing
+        self.preamble = preamble            # preamble template fingerprint
+        self.vendor = vendor                # vendor mapping the names come from
+        self.mapping_version = mapping_version
+        self.last_used = time.time()
+        self.hits = 0
+
+    @property
+    def renamed(self):
+        """True when parsing has to name the columns (another vendor's names)"""
+        return self.names != vendor_mappings.unique_names(self.columns)
+
+    @classmethod
+    def from_dict(cls, values):
+        profile = cls(values['fingerprint'], values['header'], values['header_line'], values.get('header_offset'),
+                      values['delimiter'], values['encoding'], values['columns'], values['keep'],
+                      values['drop'], values.get('preamble'), values.get('vendor', 'standard'),
+                      values.get('names'), values.get('mapping_version'))
+        profile.last_used = values.get('last_used', profile.last_used)
+        return profile
+
+    def as_dict(self):
+        return {
+            'fingerprint': self.fingerprint,
+            'header': self.header,
+            'header_line': self.header_line,
+            'header_offset': self.header_offset,
+            'delimiter': self.delimiter,
+            'encoding': self.encoding,
+            'columns': self.columns,
+            'keep': self.keep,
+            'drop': self.drop,
+            'preamble': self.preamble,
+            'vendor': self.vendor,
+            'names': self.names,
+            'mapping_version': self.mapping_version,
+            'last_used': self.last_used,
+        }
+
+
+class LayoutCache:
+    """Known layouts, persisted as JSON so every run and process starts with them
+
+    A file matches a profile when its header row sits where the profile says
+    and its preamble rows have the same template; the loader then skips the
+    line-by-line header search. Unknown layouts are detected once, their
+    columns mapped to pipeline names (vendor_mappings), validated (every
+    required column present) and added.
+    """
+
+    def __init__(self, path=None, input_columns=(), required_columns=(), max_profiles=MAX_PROFILES,
+                 mappings=None):
+        self.path = path
+        self.input_columns = frozenset(input_columns)
+        self.required_columns = list(required_columns)
+        self.mappings = mappings if mappings is not None else vendor_mappings.load_mappings()
+        self.mapping_version = vendor_mappings.mapping_version(self.mappings)
+        self.header_names = vendor_mappings.header_names(self.mappings)
+        self.max_profiles = max_profiles
+        self._profiles = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        for values in self._read_file():
+            try:
+                profile = LayoutProfile.from_dict(values)
+            except (KeyError, TypeError):
+                continue
+            # Resolved with other vendor mappings: detect again
+            if profile.mapping_version == self.mapping_version:
+                self._profiles[profile.fingerprint] = profile
+
+    def _read_file(self):
+        if not self.path or not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                values = json.load(f)
+        except (OSError, ValueError):
+            return []
+        return values if isinstance(values, list) else []
+
+    def _save(self):
+        """Merge with profiles other processes saved, then replace the file atomically"""
+        if not self.path:
+            return
+        merged = {}
+        for values in self._read_file():
+            if isinstance(values, dict) and 'fingerprint' in values:
+                merged[values['fingerprint']] = values
+        for fingerprint, profile in self._profiles.items():
+            merged[fingerprint] = profile.as_dict()
+        newest = sorted(merged.values(), key=lambda values: -values.get('last_used', 0))[:self.max_profiles]
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(newest, f, indent=1)
+            os.replace(temp_path, self.path)
+        except OSError:
+            # Read-only data folder: profiles stay in memory for this run
+            pass
+
+    def profiles(self):
+        with self._lock:
+            self._load()
+            return list(self._profiles.values())
+
+    def _get(self, fingerprint):
+        with self._lock:
+            self._load()
+            return self._profiles.get(fingerprint)
+
+    def _add(self, profile, log):
+        with self._lock:
+            self._load()
+            known = profile.fingerprint in self._profiles
+            self._profiles[profile.fingerprint] = profile
+            if len(self._profiles) > self.max_profiles:
+                oldest = min(self._profiles.values(), key=lambda item: item.last_used)
+                del self._profiles[oldest.fingerprint]
+            self._save()
+        if not known:
+            log(f"New report layout ({profile.vendor}): header on line {profile.header_line + 1}, "
+                f"{len(profile.columns)} columns, delimiter {profile.delimiter!r}, {profile.encoding}")
+
+    def _used(self, profile):
+        profile.hits += 1
+        profile.last_used = time.time()
+        return profile
+
+    def _build(self, preamble_lines, header, header_line, header_offset, encoding, log):
+        """Validated profile for a newly found header row (None when it is not usable)"""
+        delimiter = sniff_delimiter(header)
+        columns = split_header(header, delimiter)
+        if columns:
+            # The parser drops a byte order mark in front of the first name
+            columns[0] = columns[0].lstrip('\ufeff')
+        # Vendor names -> pipeline names, once per layout
+        vendor, names = vendor_mappings.resolve(columns, self.mappings, self.required_columns)
+        if HEADER_MARKER not in [name.strip().upper() for name in names]:
+            log(f"Header row on line {header_line + 1} has no {HEADER_MARKER} column; layout not cached")
+            return None
+        missing = [column for column in self.required_columns if column not in names]
+        if missing:
+            log(f"Header row on line {header_line + 1} is missing columns: {', '.join(missing)}; layout not cached")
+            return None
+        return LayoutProfile(
+            preamble_fingerprint(preamble_lines, header), header, header_line, header_offset, delimiter, encoding,
+            columns,
+            # Repeated names are numbered (X.1), so only the first one is kept
+            [name for name in names if name in self.input_columns],
+            [column for column, name in zip(columns, names) if name not in self.input_columns],
+            preamble=preamble_fingerprint(preamble_lines, ''),
+            vendor=vendor,
+            names=names,
+            mapping_version=self.mapping_version,
+        )
+
+    def is_header(self, line):
+        """The header row holds USER NAME (or a vendor's name for it as a whole field)"""
+        upper = line.upper()
+        if HEADER_MARKER in upper:
+            return True
+        return any(' '.join(field.split()) in self.header_names for field in FIELD_SPLIT.split(upper))
+
+    def for_bytes(self, buffer, log):
+        """(profile or None, header byte offset) for a report held in a bytes-like buffer (e.g. an mmap)"""
+        for profile in self.profiles():
+            offset = profile.header_offset
+            if offset is None or not self._header_at(buffer, offset, profile):
+                continue
+            if preamble_fingerprint(preamble_lines(buffer, offset, profile.encoding), '') == profile.preamble:
+                metrics.record_cache('layout', True)
+                return self._used(profile), offset
+
+        # Unknown layout: scan for the header row once
+        metrics.record_cache('layout', False)
+        position = 0
+        header_line = 0
+        while position < len(buffer):
+            end = buffer.find(b'\n', position)
+            end = len(buffer) if end < 0 else end + 1
+            line = buffer[position:end]
+            if self.is_header(line.decode('utf-8', errors='ignore')):
+                encoding = detect_encoding(buffer[:end + ENCODING_SAMPLE_BYTES])
+                header = line.decode(encoding, errors='ignore').rstrip('\r\n')
+                profile = self._build(preamble_lines(buffer, position, encoding), header, header_line, position,
+                                      encoding, log)
+                if profile is not None:
+                    self._add(profile, log)
+                return profile, position
+            position = end
+            header_line += 1
+        log(f"No header row with {HEADER_MARKER} found; reading the first line as the header")
+        return None, 0
+
+    def _header_at(self, buffer, offset, profile):
+        header = profile.header.encode(profile.encoding, errors='ignore')
+        end = offset + len(header)
+        if end > len(buffer) or buffer[offset:end] != header:
+            return False
+        # The header row must start and end a line
+        if offset > 0 and buffer[offset - 1:offset] != b'\n':
+            return False
+        return end == len(buffer) or buffer[end:end + 1] in (b'\r', b'\n')
+
+    def for_lines(self, lines, log):
+        """(profile or None, header line number) for a report already split into text lines"""
+        for profile in self.profiles():
+            row = profile.header_line
+            if row < len(lines) and lines[row].rstrip('\r') == profile.header:
+                if preamble_fingerprint(lines[:row], '') == profile.preamble:
+                    metrics.record_cache('layout', True)
+                    return self._used(profile), row
+
+        metrics.record_cache('layout', False)
+        for row, line in enumerate(lines):
+            if self.is_header(line):
+                header = line.rstrip('\r')
+                existing = self._get(preamble_fingerprint(lines[:row], header))
+                profile = existing or self._build(lines[:row], header, row, None, 'utf-8', log)
+                if existing is None and profile is not None:
+                    self._add(profile, log)
+                return profile, row
+        log(f"No header row with {HEADER_MARKER} found; reading the first line as the header")
+        return None, 0
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache(input_columns=(), required_columns=()):
+    """Process-wide cache stored in the app data folder (AGENT_PERF_HOME)"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            from performance_store import APP_DATA_DIR
+            _default_cache = LayoutCache(os.path.join(APP_DATA_DIR, PROFILE_FILE_NAME), input_columns,
+                                         required_columns, mappings=vendor_mappings.default_mappings())
+        return _default_cache
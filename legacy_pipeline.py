@@ -0,0 +1,344 @@
+"""
+Agent Performance Data Processor - Legacy Pipeline
+The original row-by-row processing, kept as the reference regression_harness compares against
+"""
+
+import io
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+
+# Code as it was before the vectorized pipeline, minus the UI calls (errors are raised).
+# Do not optimise it: its only job is to say what the output should be.
+
+
+def load_and_clean_data(content):
+    """Load CSV text (bytes or str) and perform initial cleaning"""
+    if isinstance(content, bytes):
+        content = content.decode('utf-8', errors='ignore')
+    lines = content.split('\n')
+
+    # Find the row that contains 'USER NAME' (the actual header)
+    header_row = 0
+    for i, line in enumerate(lines):
+        if 'USER NAME' in line.upper():
+            header_row = i
+            break
+
+    # Store ALL rows before the header as metadata
+    metadata_rows = [line + '\n' for line in lines[:header_row] if line.strip()]
+
+    # Create StringIO for pandas to read
+    data_content = '\n'.join(lines[header_row:])
+    df = pd.read_csv(io.StringIO(data_content), on_bad_lines='skip', engine='python')
+
+    # Columns to remove
+    columns_to_delete = [
+        'CURRENT USER GROUP', 'MOST RECENT USER GROUP', 'PAUSAVG', 'WAITAVG',
+        'TALKAVG', 'DISPAVG', 'DEADAVG', 'CUSTAVG', 'ANS', 'SSMS', 'REDIAL',
+        'test', 'testne', 'TestIT', 'TESTNC', 'TESTCB', 'Test22', 'DUPLICATE CALLS'
+    ]
+
+    # Drop columns (ignore if they don't exist)
+    df = df.drop(columns=[col for col in columns_to_delete if col in df.columns], errors='ignore')
+
+    # Remove last row (typically totals/summary)
+    if len(df) > 0:
+        df = df.iloc[:-1]
+
+    return df, metadata_rows
+
+
+def process_time_columns(df):
+    """Calculate total pause time from PAUSE, DEAD, and DISPO columns"""
+    # Convert time columns to timedelta
+    df['TOTAL PAUSE'] = (
+        pd.to_timedelta(df['PAUSE'], errors='coerce').fillna(pd.Timedelta(0)) +
+        pd.to_timedelta(df['DEAD'], errors='coerce').fillna(pd.Timedelta(0)) +
+        pd.to_timedelta(df['DISPO'], errors='coerce').fillna(pd.Timedelta(0))
+    )
+
+    # Format as HH:MM:SS
+    df['TOTAL PAUSE'] = df['TOTAL PAUSE'].apply(
+        lambda x: f"{int(x.total_seconds() // 3600):02d}:"
+                  f"{int((x.total_seconds() % 3600) // 60):02d}:"
+                  f"{int(x.total_seconds() % 60):02d}"
+        if pd.notna(x) else "00:00:00"
+    )
+
+    return df
+
+
+def reorder_and_sort(df):
+    """Reorder columns and sort by total inbound calls"""
+    # Convert ID to integer
+    df['ID'] = pd.to_numeric(df['ID'], errors='coerce').fillna(0).astype(int)
+
+    # Sort by total inbound calls (descending)
+    if 'TOTAL INBOUND CALLS' in df.columns:
+        df = df.sort_values(by='TOTAL INBOUND CALLS', ascending=False)
+
+    # Reset index starting from 1
+    df = df.reset_index(drop=True)
+    df.index = df.index + 1
+
+    # Reorder columns with ID first
+    desired_columns = [
+        'ID', 'USER NAME', 'CALLS', 'TIME', 'PAUSE', 'WAIT', 'TALK',
+        'DISPO', 'DEAD', 'TOTAL PAUSE', 'CUSTOMER',
+        'TOTAL INBOUND CALLS', 'TOTAL OUTBOUND CALLS'
+    ]
+
+    # Only include columns that exist
+    existing_cols = [col for col in desired_columns if col in df.columns]
+    df = df[existing_cols].copy()
+
+    # Add Remarks column as the last column
+    df['REMARKS'] = ''
+
+    # Add 'HD' in REMARKS if login hour (TIME) is less than 7 hours
+    if 'TIME' in df.columns:
+        for idx in df.index:
+            try:
+                time_val = pd.to_timedelta(df.loc[idx, 'TIME'])
+                if time_val < pd.to_timedelta('7:00:00'):
+                    df.loc[idx, 'REMARKS'] = 'HD'
+            except:
+                pass
+
+    return df
+
+
+def process_report(content):
+    """The three legacy steps in order: (df, metadata_rows)"""
+    df, metadata_rows = load_and_clean_data(content)
+    return reorder_and_sort(process_time_columns(df)), metadata_rows
+
+
+def row_tag(row, columns):
+    """Data view row colour of one row, as the desktop app picked it"""
+    tag = ''
+    if 'TOTAL INBOUND CALLS' in columns:
+        try:
+            calls = float(row['TOTAL INBOUND CALLS'])
+            if calls >= 70:
+                tag = 'excellent'
+            elif calls >= 60:
+                tag = 'good'
+            elif calls >= 50:
+                tag = 'average'
+            else:
+                tag = 'below_avg'
+        except:
+            pass
+
+    # Check for TIME coloring
+    if 'TIME' in columns:
+        try:
+            td_val = pd.to_timedelta(row['TIME'])
+            threshold_red = pd.to_timedelta('8:45:00')
+            threshold_hd = pd.to_timedelta('7:00:00')
+
+            if td_val < threshold_hd:
+                tag = 'time_hd'
+            elif td_val < threshold_red:
+                tag = 'time_red'
+        except:
+            pass
+
+    # Check for PAUSE/TOTAL PAUSE coloring
+    for pause_col in ['PAUSE', 'TOTAL PAUSE']:
+        if pause_col in columns:
+            try:
+                td_val = pd.to_timedelta(row[pause_col])
+                threshold = pd.to_timedelta('2:00:00')
+                if td_val > threshold:
+                    tag = 'pause_high'
+            except:
+                pass
+
+    # Check for REMARKS HD
+    if 'REMARKS' in columns and str(row['REMARKS']).strip().upper() == 'HD':
+        tag = 'remarks_hd'
+    return tag
+
+
+def row_tags(df):
+    columns = list(df.columns)
+    return [row_tag(row, columns) for _, row in df.iterrows()]
+
+
+def summary_values(df):
+    """Numbers of the desktop summary tab"""
+    values = {
+        'total_agents': len(df),
+        'total_inbound': int(df['TOTAL INBOUND CALLS'].sum()),
+        'avg_inbound': round(float(df['TOTAL INBOUND CALLS'].mean()), 2),
+        'excellent': len(df[df['TOTAL INBOUND CALLS'] >= 70]),
+        'good': len(df[(df['TOTAL INBOUND CALLS'] >= 60) & (df['TOTAL INBOUND CALLS'] < 70)]),
+        'average': len(df[(df['TOTAL INBOUND CALLS'] >= 50) & (df['TOTAL INBOUND CALLS'] < 60)]),
+        'below_avg': len(df[df['TOTAL INBOUND CALLS'] < 50]),
+        'hd_count': len(df[df['REMARKS'] == 'HD']),
+        'top_performer': None,
+        'top_inbound': None,
+    }
+    if len(df) > 0:
+        top_performer = df.iloc[0]
+        values['top_performer'] = str(top_performer['USER NAME'])
+        values['top_inbound'] = int(top_performer['TOTAL INBOUND CALLS'])
+    return values
+
+
+def save_to_excel(df, metadata_rows):
+    """Save data to Excel with metadata and styling"""
+    output = io.BytesIO()
+
+    # Create initial Excel file
+    num_metadata_rows = len(metadata_rows)
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, startrow=num_metadata_rows, sheet_name='Agent Performance')
+
+    # Load and modify workbook
+    output.seek(0)
+    wb = load_workbook(output)
+    ws = wb.active
+
+    # Get the current header row
+    header_row_num = num_metadata_rows + 1
+
+    # Collect all data rows
+    data_rows = []
+    for row in ws.iter_rows(min_row=header_row_num, values_only=False):
+        data_rows.append(row)
+
+    # Delete all rows from header onwards
+    if ws.max_row >= header_row_num:
+        ws.delete_rows(header_row_num, ws.max_row - header_row_num + 1)
+
+    # Add metadata rows
+    metadata_style = Font(bold=True, size=11)
+    metadata_fill = PatternFill(start_color='E8F4F8', end_color='E8F4F8', fill_type='solid')
+
+    current_row = 1
+    for row in metadata_rows:
+        clean_row = row.strip().replace('\n', '')
+        if clean_row:
+            ws.cell(row=current_row, column=1, value=clean_row)
+            ws.cell(row=current_row, column=1).font = metadata_style
+            ws.cell(row=current_row, column=1).fill = metadata_fill
+            current_row += 1
+
+    # Add data table with styling
+    header_fill = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
+    header_font = Font(bold=True, color='000000')
+
+    # Color definitions for conditional formatting
+    green_fill = PatternFill(start_color='90EE90', end_color='90EE90', fill_type='solid')
+    orange_fill = PatternFill(start_color='FFA500', end_color='FFA500', fill_type='solid')
+    yellow_fill = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
+    red_fill = PatternFill(start_color='FF6B6B', end_color='FF6B6B', fill_type='solid')
+    dark_red_fill = PatternFill(start_color='DC143C', end_color='DC143C', fill_type='solid')
+    black_font = Font(bold=True, color='000000')
+
+    header_row_idx = None
+    for idx, row_data in enumerate(data_rows):
+        is_header_row = (idx == 0)
+        if is_header_row:
+            header_row_idx = current_row
+
+        for col_idx, cell in enumerate(row_data, start=1):
+            new_cell = ws.cell(row=current_row, column=col_idx)
+            if cell.value is not None:
+                new_cell.value = cell.value
+
+            if is_header_row:
+                new_cell.fill = header_fill
+                new_cell.font = header_font
+            else:
+                # Get column name from header
+                col_name = ws.cell(row=header_row_idx, column=col_idx).value
+
+                # Apply conditional formatting
+                if col_name == 'TOTAL INBOUND CALLS':
+                    try:
+                        val = float(new_cell.value)
+                        if val >= 70:
+                            new_cell.fill = green_fill
+                            new_cell.font = black_font
+                        elif val >= 60:
+                            new_cell.fill = orange_fill
+                            new_cell.font = black_font
+                        elif val >= 50:
+                            new_cell.fill = yellow_fill
+                            new_cell.font = black_font
+                        else:
+                            new_cell.fill = red_fill
+                            new_cell.font = black_font
+                    except:
+                        pass
+
+                elif col_name == 'TIME':
+                    try:
+                        td_val = pd.to_timedelta(new_cell.value)
+                        threshold_red = pd.to_timedelta('8:45:00')
+                        threshold_hd = pd.to_timedelta('7:00:00')
+
+                        if td_val < threshold_hd:
+                            new_cell.fill = yellow_fill
+                            new_cell.font = black_font
+                        elif td_val < threshold_red:
+                            new_cell.fill = red_fill
+                            new_cell.font = black_font
+                    except:
+                        pass
+
+                elif col_name in ['PAUSE', 'TOTAL PAUSE']:
+                    try:
+                        td_val = pd.to_timedelta(new_cell.value)
+                        threshold = pd.to_timedelta('2:00:00')
+                        if td_val > threshold:
+                            new_cell.fill = dark_red_fill
+                            new_cell.font = black_font
+                    except:
+                        pass
+
+                elif col_name == 'REMARKS':
+                    if str(new_cell.value).strip().upper() == 'HD':
+                        new_cell.fill = yellow_fill
+                        new_cell.font = black_font
+
+            new_cell.alignment = Alignment(horizontal='center', vertical='center')
+        current_row += 1
+
+    # Add summary row below the table
+    summary_row = current_row + 1
+
+    # Calculate totals
+    total_inbound = int(df['TOTAL INBOUND CALLS'].sum())
+    avg_inbound = float(df['TOTAL INBOUND CALLS'].mean())
+
+    # Style for summary
+    summary_font = Font(bold=True, size=12, color='FFFFFF')
+    summary_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
+    border = Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
+
+    # Add summary labels and values
+    for offset, (label, value) in enumerate([('TOTAL INBOUND CALLS', total_inbound),
+                                             ('AVERAGE INBOUND CALLS', round(avg_inbound, 2))]):
+        for column, cell_value in ((1, label), (2, value)):
+            cell = ws.cell(row=summary_row + offset, column=column, value=cell_value)
+            cell.font = summary_font
+            cell.fill = summary_fill
+            cell.alignment = Alignment(horizontal='center', vertical='center')
+            cell.border = border
+
+    # Save to BytesIO
+    output = io.BytesIO()
+    wb.save(output)
+    output.seek(0)
+    return output
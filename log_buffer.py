@@ -0,0 +1,56 @@
+"""
+Agent Performance Data Processor - Log Buffer
+Thread-safe bounded ring of leveled log lines that a UI takes in batches
+"""
+
+import logging
+import threading
+from itertools import islice
+from collections import deque
+
+# Lines kept (and shown at most); older lines are dropped first
+MAX_LOG_LINES = 5000
+
+# Levels offered by the log view, lowest first
+LEVELS = {
+    'DEBUG': logging.DEBUG,
+    'INFO': logging.INFO,
+    'WARNING': logging.WARNING,
+    'ERROR': logging.ERROR,
+}
+
+
+class LogBuffer:
+    """Log lines with their level, appended from any thread
+
+    write() only takes a lock and appends to a fixed-size deque, so frequent
+    messages (per-stage timings, per-chunk progress) cost the writer almost
+    nothing; the UI calls take() on a timer and renders the new lines at once.
+    """
+
+    def __init__(self, max_lines=MAX_LOG_LINES):
+        self._lines = deque(maxlen=max_lines)   # (sequence number, level, text)
+        self._lock = threading.Lock()
+        self._written = 0
+        self._taken = 0
+
+    def write(self, message, level=logging.INFO):
+        with self._lock:
+            self._written += 1
+            self._lines.append((self._written, level, str(message)))
+
+    def take(self, min_level=logging.INFO):
+        """Lines written since the last take at or above min_level (a note first when some were dropped)"""
+        with self._lock:
+            count = min(self._written - self._taken, len(self._lines))
+            new = list(islice(reversed(self._lines), count))[::-1]
+            dropped = self._written - self._taken - count
+            self._taken = self._written
+        lines = [f"... {dropped} earlier lines dropped"] if dropped > 0 else []
+        return lines + [text for _, level, text in new if level >= min_level]
+
+    def lines(self, min_level=logging.INFO):
+        """Every kept line at or above min_level (to redraw the view with another level)"""
+        with self._lock:
+            self._taken = self._written
+            return [text for _, level, text in self._lines if level >= min_level]
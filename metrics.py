@@ -0,0 +1,330 @@
+"""
+Agent Performance Data Processor - Metrics
+Prometheus text-format counters and histograms of the pipeline, served on a local port or written to a file
+
+Usage:
+    AGENT_PERF_METRICS_PORT=9464 streamlit run streamlit_app.py     # scrape http://127.0.0.1:9464/metrics
+    AGENT_PERF_METRICS_FILE=/var/lib/node_exporter/agent_perf.prom  # or a file for a textfile collector
+"""
+
+import os
+import time
+import threading
+import functools
+import contextlib
+import multiprocessing
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+PREFIX = 'agent_perf_'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+METRICS_PORT_ENV = 'AGENT_PERF_METRICS_PORT'
+METRICS_FILE_ENV = 'AGENT_PERF_METRICS_FILE'
+METRICS_HOST = '127.0.0.1'
+# How often the metrics file is rewritten
+FILE_INTERVAL_SECONDS = 15
+
+# Histogram upper bounds
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+ROW_BUCKETS = (100, 500, 1000, 5000, 10000, 50000, 100000, 500000, 1000000)
+BYTE_BUCKETS = (10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7, 10 ** 8, 10 ** 9)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels_text(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+    """One metric family: a value (counter) or bucket counts, sum and count (histogram) per label set"""
+
+    def __init__(self, name, kind, help_text, label_names=(), buckets=None):
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets) if buckets else None
+        self.series = {}    # label values -> float, or [per-bucket counts..., +Inf count, sum]
+
+    def _empty(self):
+        return 0.0 if self.buckets is None else [0] * (len(self.buckets) + 1) + [0.0]
+
+    def add(self, values, amount):
+        self.series[values] = self.series.get(values, 0.0) + amount
+
+    def observe(self, values, value):
+        series = self.series.setdefault(values, self._empty())
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+                break
+        else:
+            series[len(self.buckets)] += 1
+        series[-1] += value
+
+    def lines(self):
+        full_name = PREFIX + self.name
+        yield f"# HELP {full_name} {self.help_text}"
+        yield f"# TYPE {full_name} {self.kind}"
+        for values, series in sorted(self.series.items()):
+            if self.buckets is None:
+                yield f"{full_name}{_labels_text(self.label_names, values)} {_number(series)}"
+                continue
+            # Stored per bucket; the exposition format wants cumulative counts
+            total = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                total += count
+                labels = _labels_text(self.label_names, values, [('le', _number(bound))])
+                yield f"{full_name}_bucket{labels} {total}"
+            labels = _labels_text(self.label_names, values)
+            yield f"{full_name}_sum{labels} {_number(series[-1])}"
+            yield f"{full_name}_count{labels} {total}"
+
+
+class MetricsRegistry:
+    """Pipeline metrics of this process, rendered in the Prometheus text format
+
+    Worker processes (watch folder, processing service) record into their own
+    registry and hand drain() to the parent, which merge()s it; gauges such
+    as queue depth are read from callbacks when the metrics are rendered.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._gauges = {}           # (name, labels) -> (help, callback)
+        self.files = self._add('files_processed_total', 'counter', 'Report files parsed')
+        self.rows = self._add('rows_per_file', 'histogram', 'Agent rows per parsed report', buckets=ROW_BUCKETS)
+        self.errors = self._add('errors_total', 'counter', 'Pipeline stages that raised an error', ['stage'])
+        self.stages = self._add('stage_seconds', 'histogram', 'Time spent per pipeline stage', ['stage'],
+                                LATENCY_BUCKETS)
+        self.exports = self._add('export_bytes', 'histogram', 'Size of written reports', ['format'], BYTE_BUCKETS)
+        self.cache = self._add('cache_requests_total', 'counter', 'Cache lookups by result (hit or miss)',
+                               ['cache', 'result'])
+        # Shown as 0 before the first report rather than missing
+        self.files.series[()] = 0.0
+
+    def _add(self, name, kind, help_text, label_names=(), buckets=None):
+        metric = Metric(name, kind, help_text, label_names, buckets)
+        self._metrics[name] = metric
+        return metric
+
+    def inc(self, metric, values=(), amount=1):
+        with self._lock:
+            metric.add(tuple(values), amount)
+
+    def observe(self, metric, value, values=()):
+        with self._lock:
+            metric.observe(tuple(values), value)
+
+    def register_gauge(self, name, help_text, callback, labels=()):
+        """Gauge read from callback() on every render (a later registration replaces it)"""
+        with self._lock:
+            self._gauges[(name, tuple(labels))] = (help_text, callback)
+
+    def drain(self):
+        """Counter and histogram values recorded since the last drain, reset to zero (picklable)"""
+        with self._lock:
+            state = {name: metric.series for name, metric in self._metrics.items() if metric.series}
+            for metric in self._metrics.values():
+                metric.series = {}
+        return state
+
+    def merge(self, state):
+        """Add values drained in another process"""
+        with self._lock:
+            for name, series in (state or {}).items():
+                metric = self._metrics[name]
+                for values, value in series.items():
+                    if metric.buckets is None:
+                        metric.add(values, value)
+                    else:
+                        current = metric.series.setdefault(values, metric._empty())
+                        metric.series[values] = [a + b for a, b in zip(current, value)]
+
+    def _hit_ratios(self):
+        totals = {}
+        for (cache, result), count in self.cache.series.items():
+            hits, lookups = totals.get(cache, (0, 0))
+            totals[cache] = (hits + (count if result == 'hit' else 0), lookups + count)
+        return {cache: hits / lookups for cache, (hits, lookups) in totals.items() if lookups}
+
+    def render(self):
+        """All metrics as Prometheus exposition text"""
+        with self._lock:
+            lines = []
+            for metric in self._metrics.values():
+                lines.extend(metric.lines())
+            ratio = Metric('cache_hit_ratio', 'gauge', 'Share of cache lookups that were hits', ['cache'])
+            ratio.series = {(cache,): value for cache, value in self._hit_ratios().items()}
+            gauges = dict(self._gauges)
+        lines.extend(ratio.lines())
+
+        # Callbacks run outside the lock: they take their owners' locks
+        families = {}
+        for (name, labels), (help_text, callback) in gauges.items():
+            family = families.setdefault(name, Metric(name, 'gauge', help_text, [label for label, _ in labels]))
+            try:
+                family.series[tuple(value for _, value in labels)] = float(callback())
+            except Exception:
+                continue
+        for family in families.values():
+            lines.extend(family.lines())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+
+def record_file(rows):
+    REGISTRY.inc(REGISTRY.files)
+    REGISTRY.observe(REGISTRY.rows, rows)
+
+
+def record_cache(cache, hit):
+    REGISTRY.inc(REGISTRY.cache, (cache, 'hit' if hit else 'miss'))
+
+
+def output_size(target):
+    """Bytes in a written path, built bytes, or a buffer or seekable file (None when unknown)"""
+    if isinstance(target, int):
+        return target
+    if isinstance(target, (bytes, bytearray)):
+        return len(target)
+    if isinstance(target, str) or hasattr(target, '__fspath__'):
+        return os.path.getsize(target)
+    if hasattr(target, 'getbuffer'):
+        return target.getbuffer().nbytes
+    try:
+        position = target.tell()
+        target.seek(0, os.SEEK_END)
+        size = target.tell()
+        target.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def record_export(fmt, target):
+    """Observe the size of a written report; returns target so writers can return through it"""
+    size = output_size(target)
+    if size is not None:
+        REGISTRY.observe(REGISTRY.exports, size, (fmt,))
+    return target
+
+
+def record_text(fmt, text):
+    """Observe the UTF-8 size of a report built as a string; returns text"""
+    REGISTRY.observe(REGISTRY.exports, len(text.encode('utf-8')), (fmt,))
+    return text
+
+
+def worker_state():
+    """Metrics a pool worker hands back with its result (None outside worker processes)"""
+    if multiprocessing.parent_process() is None:
+        return None
+    return REGISTRY.drain()
+
+
+def merge(state):
+    REGISTRY.merge(state)
+
+
+@contextlib.contextmanager
+def stage_timer(stage):
+    """Time a block as a pipeline stage, counting an error when it raises"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        REGISTRY.inc(REGISTRY.errors, (stage,))
+        raise
+    finally:
+        REGISTRY.observe(REGISTRY.stages, time.perf_counter() - started, (stage,))
+
+
+def timed(stage):
+    """Decorator form of stage_timer"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port, host=METRICS_HOST, registry=None):
+    """Serve /metrics from a background thread (port 0 picks a free port: server.server_port)"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry or REGISTRY
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
+
+
+def write_file(path, registry=None):
+    """Write the metrics to path, swapped in whole so a scraper never reads half a file"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write((registry or REGISTRY).render())
+    os.replace(temp_path, path)
+    return path
+
+
+def start_file_writer(path, interval=FILE_INTERVAL_SECONDS, registry=None):
+    """Rewrite the metrics file every interval seconds from a background thread"""
+    def loop():
+        while True:
+            try:
+                write_file(path, registry)
+            except OSError:
+                pass
+            time.sleep(interval)
+    thread = threading.Thread(target=loop, name='metrics-file', daemon=True)
+    thread.start()
+    return thread
+
+
+_exporter_lock = threading.Lock()
+_exporters = {}
+
+
+def start_from_env():
+    """Start the endpoint and/or file writer configured in the environment, once per process"""
+    with _exporter_lock:
+        port = os.environ.get(METRICS_PORT_ENV)
+        if port and 'server' not in _exporters:
+            _exporters['server'] = start_server(int(port))
+        path = os.environ.get(METRICS_FILE_ENV)
+        if path and 'file' not in _exporters:
+            _exporters['file'] = start_file_writer(path)
+        return dict(_exporters)
@@ -0,0 +1,262 @@
+"""
+Agent Performance Data Processor - Historical Store
+Append-only SQLite store of processed reports for agent trend queries
+"""
+
+import os
+import re
+import json
+import sqlite3
+from datetime import date, datetime, timedelta
+import pandas as pd
+import report_pipeline
+from report_summary import ReportSummary
+from grouped_export import NO_GROUP_LABEL
+
+# Default location shared by the web app and the desktop GUI
+APP_DATA_DIR = os.environ.get(
+    'AGENT_PERF_HOME',
+    os.path.join(os.path.expanduser('~'), '.agent_performance')
+)
+DEFAULT_STORE_PATH = os.path.join(APP_DATA_DIR, 'history.db')
+
+# Processed report columns -> store columns
+DURATION_COLUMNS = {
+    'TIME': 'time_s',
+    'PAUSE': 'pause_s',
+    'WAIT': 'wait_s',
+    'TALK': 'talk_s',
+    'DISPO': 'dispo_s',
+    'DEAD': 'dead_s',
+    'TOTAL PAUSE': 'total_pause_s',
+    'CUSTOMER': 'customer_s',
+}
+COUNT_COLUMNS = {
+    'CALLS': 'calls',
+    'TOTAL INBOUND CALLS': 'inbound',
+    'TOTAL OUTBOUND CALLS': 'outbound',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    report_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    report_date TEXT NOT NULL,
+    ingested_at TEXT NOT NULL,
+    source_name TEXT,
+    metadata TEXT,
+    agent_count INTEGER NOT NULL,
+    total_inbound INTEGER NOT NULL,
+    total_outbound INTEGER NOT NULL,
+    hd_count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reports_date ON reports (report_date, report_id);
+
+CREATE TABLE IF NOT EXISTS agent_daily (
+    report_id INTEGER NOT NULL REFERENCES reports (report_id),
+    report_date TEXT NOT NULL,
+    agent_id INTEGER,                   -- NULL when the export had no usable ID
+    user_name TEXT,
+    team TEXT,                          -- CURRENT USER GROUP, NULL when the export has none
+    calls INTEGER,
+    time_s INTEGER,
+    pause_s INTEGER,
+    wait_s INTEGER,
+    talk_s INTEGER,
+    dispo_s INTEGER,
+    dead_s INTEGER,
+    total_pause_s INTEGER,
+    customer_s INTEGER,
+    inbound INTEGER,
+    outbound INTEGER,
+    hd INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_agent_daily_agent ON agent_daily (agent_id, report_date, report_id);
+CREATE INDEX IF NOT EXISTS idx_agent_daily_report ON agent_daily (report_id);
+
+-- A day may be ingested several times (intraday refreshes); the latest wins
+CREATE VIEW IF NOT EXISTS current_reports AS
+    SELECT report_date, MAX(report_id) AS report_id FROM reports GROUP BY report_date;
+"""
+
+AGENT_COLUMNS = (['agent_id', 'user_name', 'team'] + list(COUNT_COLUMNS.values()) + list(DURATION_COLUMNS.values())
+                 + ['hd'])
+
+
+def extract_report_date(metadata_rows):
+    """Find the report date in the dialer preamble rows (None if absent)"""
+    for row in metadata_rows or []:
+        match = re.search(r'(\d{4})-(\d{2})-(\d{2})', row)
+        if match:
+            try:
+                return date(*map(int, match.groups()))
+            except ValueError:
+                pass
+        match = re.search(r'(\d{1,2})/(\d{1,2})/(\d{4})', row)
+        if match:
+            month, day, year = map(int, match.groups())
+            try:
+                return date(year, month, day)
+            except ValueError:
+                pass
+    return None
+
+
+class PerformanceStore:
+    """Append-only history of processed reports keyed by report date and agent ID"""
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_STORE_PATH
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._memory_conn = sqlite3.connect(':memory:', check_same_thread=False) if self.path == ':memory:' else None
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            self._release(conn)
+
+    def _connect(self):
+        """Open a connection (one per call so both front ends can share the file)"""
+        if self._memory_conn is not None:
+            return self._memory_conn
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _release(self, conn):
+        """Close a per-call connection"""
+        if conn is not self._memory_conn:
+            conn.close()
+
+    def ingest_report(self, df, metadata_rows=None, report_date=None, source_name=None, summary=None, groups=None):
+        """Append a processed report and return its report_id
+
+        groups holds the team of each row of df (same index, e.g.
+        IncrementalProcessor.group_labels()); without it no team is stored.
+        """
+        if summary is None:
+            summary = ReportSummary.from_frame(df)
+        if report_date is None:
+            report_date = extract_report_date(metadata_rows) or date.today()
+        report_date = pd.Timestamp(report_date).date().isoformat()
+
+        # Build the agent rows column-wise
+        rows = pd.DataFrame(index=df.index)
+        # The pipeline writes 0 for a missing or non-numeric ID: stored as NULL, never one shared agent
+        ids = pd.to_numeric(df['ID'], errors='coerce')
+        rows['agent_id'] = ids.where(ids != 0).astype('Int64')
+        rows['user_name'] = df['USER NAME'].astype(str) if 'USER NAME' in df.columns else None
+        if groups is not None:
+            teams = groups.reindex(df.index)
+            rows['team'] = teams.astype(str).where(teams.notna())
+        else:
+            rows['team'] = None
+        for col, store_col in COUNT_COLUMNS.items():
+            if col in df.columns:
+                rows[store_col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype('int64')
+            else:
+                rows[store_col] = None
+        for col, store_col in DURATION_COLUMNS.items():
+            if col in df.columns:
+                rows[store_col] = report_pipeline.duration_seconds(df[col]).fillna(0).astype('int64')
+            else:
+                rows[store_col] = None
+        if 'REMARKS' in df.columns:
+            rows['hd'] = (df['REMARKS'].astype(str).str.strip().str.upper() == 'HD').astype('int64')
+        else:
+            rows['hd'] = 0
+        rows = rows[AGENT_COLUMNS]
+
+        conn = self._connect()
+        try:
+            with conn:
+                cursor = conn.execute(
+                    'INSERT INTO reports (report_date, ingested_at, source_name, metadata, agent_count, '
+                    'total_inbound, total_outbound, hd_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (
+                        report_date,
+                        datetime.now().isoformat(timespec='seconds'),
+                        source_name,
+                        json.dumps([row.strip() for row in metadata_rows or []]),
+                        summary.total_agents,
+                        summary.total_inbound,
+                        summary.total_outbound,
+                        summary.hd_count,
+                    )
+                )
+                report_id = cursor.lastrowid
+                records = rows.astype(object).where(rows.notna(), None).itertuples(index=False, name=None)
+                conn.executemany(
+                    f'INSERT INTO agent_daily (report_id, report_date, {", ".join(AGENT_COLUMNS)}) '
+                    f'VALUES (?, ?, {", ".join("?" * len(AGENT_COLUMNS))})',
+                    ((report_id, report_date) + record for record in records)
+                )
+        finally:
+            self._release(conn)
+        return report_id
+
+    def _query(self, sql, params=()):
+        """Run a read query into a DataFrame"""
+        conn = self._connect()
+        try:
+            return pd.read_sql_query(sql, conn, params=params)
+        finally:
+            self._release(conn)
+
+    def agent_history(self, agent_id, days=30, end_date=None):
+        """Daily rows for one agent over the last `days` days (latest ingest per day)"""
+        end = pd.Timestamp(end_date or date.today()).date()
+        start = end - timedelta(days=days - 1)
+        return self._query(
+            'SELECT a.report_date, a.' + ', a.'.join(AGENT_COLUMNS) + ' '
+            'FROM agent_daily a JOIN current_reports c ON a.report_id = c.report_id '
+            'WHERE a.agent_id = ? AND a.report_date BETWEEN ? AND ? '
+            'ORDER BY a.report_date',
+            (int(agent_id), start.isoformat(), end.isoformat())
+        )
+
+    def team_daily_totals(self, start_date=None, end_date=None):
+        """Per-day totals per team (agents, inbound, outbound, HD) from the latest ingest of each day
+
+        Teams are the CURRENT USER GROUP of each agent; agents without one
+        (or reports saved without teams) count under "No Group".
+        """
+        start = pd.Timestamp(start_date).date().isoformat() if start_date else '0000-00-00'
+        end = pd.Timestamp(end_date).date().isoformat() if end_date else '9999-99-99'
+        return self._query(
+            'SELECT a.report_date, COALESCE(a.team, ?) AS team, COUNT(*) AS agent_count, '
+            'COALESCE(SUM(a.inbound), 0) AS total_inbound, COALESCE(SUM(a.outbound), 0) AS total_outbound, '
+            'SUM(a.hd) AS hd_count '
+            'FROM agent_daily a JOIN current_reports c ON a.report_id = c.report_id '
+            'WHERE a.report_date BETWEEN ? AND ? GROUP BY a.report_date, 2 ORDER BY a.report_date, 2',
+            (NO_GROUP_LABEL, start, end)
+        )
+
+    def report_dates(self):
+        """List the report dates held in the store"""
+        return self._query('SELECT report_date FROM current_reports ORDER BY report_date')['report_date'].tolist()
+
+    def period_report(self, start_date, end_date):
+        """One row per agent with counts and durations summed over a date range (latest ingest per day)
+
+        The frame has the processed report columns (durations as int seconds)
+        plus DAYS, sorted by inbound calls, so a stored week or month can be
+        compared like a single report. Agents stored without an ID are left
+        out: they cannot be matched from one day to the next.
+        """
+        start = pd.Timestamp(start_date).date().isoformat()
+        end = pd.Timestamp(end_date).date().isoformat()
+        sums = {**COUNT_COLUMNS, **DURATION_COLUMNS}
+        totals = self._query(
+            'SELECT a.agent_id, MAX(a.user_name) AS user_name, COUNT(*) AS days, '
+            + ', '.join(f'SUM(a.{store_col}) AS {store_col}' for store_col in sums.values()) + ' '
+            'FROM agent_daily a JOIN current_reports c ON a.report_id = c.report_id '
+            'WHERE a.report_date BETWEEN ? AND ? AND a.agent_id IS NOT NULL GROUP BY a.agent_id',
+            (start, end)
+        )
+        df = pd.DataFrame({'ID': totals['agent_id'].astype('int64'), 'USER NAME': totals['user_name']})
+        for col, store_col in sums.items():
+            df[col] = totals[store_col].astype('Int64')
+        df = df[[col for col in report_pipeline.DESIRED_COLUMNS if col in df.columns]]
+        df['DAYS'] = totals['days'].astype('int64')
+        return report_pipeline.sort_by_inbound(report_pipeline.compact_frame(df))
@@ -0,0 +1,192 @@
+"""
+Agent Performance Data Processor - Period Comparison
+Lines up two processed reports on agent ID and works out the change per agent
+"""
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+import report_pipeline
+
+# Columns compared per agent (rank is by inbound calls)
+COMPARE_COLUMNS = ['TOTAL INBOUND CALLS', 'TIME', 'PAUSE', 'TOTAL PAUSE']
+RANK_COLUMN = 'RANK'
+
+# Whether a positive CHANGE is an improvement (more pause is worse; RANK CHANGE is positive moving up)
+BETTER_WHEN_HIGHER = {
+    'TOTAL INBOUND CALLS': True,
+    'TIME': True,
+    'PAUSE': False,
+    'TOTAL PAUSE': False,
+    RANK_COLUMN: True,
+}
+
+# Agents in only one of the two reports
+STATUS_NEW = 'NEW'
+STATUS_GONE = 'GONE'
+
+COMPARISON_SHEET_NAME = 'Comparison'
+
+BEFORE_SUFFIX = ' BEFORE'
+CHANGE_SUFFIX = ' CHANGE'
+
+
+def before_column(col):
+    return col + BEFORE_SUFFIX
+
+
+def change_column(col):
+    return col + CHANGE_SUFFIX
+
+
+def base_column(col):
+    """Compared column a BEFORE/CHANGE column belongs to"""
+    for suffix in (BEFORE_SUFFIX, CHANGE_SUFFIX):
+        if col.endswith(suffix):
+            return col[:-len(suffix)]
+    return col
+
+
+def agent_table(df):
+    """Compared columns of a processed report indexed by agent ID, with the inbound rank
+
+    Rows without a valid ID (0) cannot be matched and are left out; a
+    repeated ID keeps its first row.
+    """
+    ids = pd.to_numeric(df['ID'], errors='coerce').fillna(0).astype('int64').to_numpy()
+    table = pd.DataFrame(index=pd.Index(ids, name='ID'))
+    table['USER NAME'] = df['USER NAME'].astype(object).to_numpy() if 'USER NAME' in df.columns else None
+    for col in COMPARE_COLUMNS:
+        if col not in df.columns:
+            table[col] = pd.array([pd.NA] * len(df), dtype='Int64')
+        elif col in report_pipeline.DURATION_COLUMNS:
+            table[col] = report_pipeline.duration_seconds(df[col]).astype('Int64').array
+        else:
+            table[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64').array
+    table = table[(ids != 0) & ~table.index.duplicated()]
+
+    # Competition ranking: tied agents share the better rank
+    table[RANK_COLUMN] = table['TOTAL INBOUND CALLS'].rank(method='min', ascending=False).astype('Int64')
+    return table
+
+
+def format_signed_seconds(seconds):
+    """Format int second changes as +HH:MM:SS / -HH:MM:SS (<NA> becomes an empty string)"""
+    values = seconds.to_numpy(dtype='float64', na_value=np.nan)
+    sign = np.where(values > 0, '+', np.where(values < 0, '-', ''))
+    text = report_pipeline.format_seconds(seconds.abs())
+    return (sign + text).where(text != '', '')
+
+
+class PeriodComparison:
+    """Per-agent changes between two reports (current against previous)"""
+
+    def __init__(self, df, current_label, previous_label):
+        self.df = df
+        self.current_label = current_label
+        self.previous_label = previous_label
+
+    @property
+    def matched(self):
+        return int((self.df['STATUS'] == '').sum())
+
+    @property
+    def new(self):
+        return int((self.df['STATUS'] == STATUS_NEW).sum())
+
+    @property
+    def gone(self):
+        return int((self.df['STATUS'] == STATUS_GONE).sum())
+
+    def totals(self):
+        """(column, previous total, current total) over each report's agents"""
+        return [(col, self.df[before_column(col)].sum(), self.df[col].sum()) for col in COMPARE_COLUMNS]
+
+    def lines(self):
+        """Short text summary for the UIs and the sheet header"""
+        lines = [
+            f"Comparison: {self.current_label} against {self.previous_label}",
+            f"Agents: {self.matched} in both, {self.new} new, {self.gone} gone",
+        ]
+        for col, before, now in self.totals():
+            if col in report_pipeline.DURATION_COLUMNS:
+                change = format_signed_seconds(pd.Series([now - before])).iloc[0] or '00:00:00'
+                lines.append(f"{col}: {report_pipeline.format_duration(before)} -> "
+                             f"{report_pipeline.format_duration(now)} ({change})")
+            else:
+                lines.append(f"{col}: {before:,} -> {now:,} ({now - before:+,})")
+        return lines
+
+    def display_frame(self):
+        """Copy with durations and duration changes as text, for tables and the sheet"""
+        df = self.df.copy()
+        for col in df.columns:
+            if base_column(col) in report_pipeline.DURATION_COLUMNS:
+                if col.endswith(CHANGE_SUFFIX):
+                    df[col] = format_signed_seconds(df[col])
+                else:
+                    df[col] = report_pipeline.format_seconds(df[col])
+        return df
+
+    def style_codes(self):
+        """Style code per cell: improvements green, regressions red, new/gone agents marked"""
+        codes = np.zeros((len(self.df), len(self.df.columns)), dtype=np.int8)
+        for i, col in enumerate(self.df.columns):
+            if col.endswith(CHANGE_SUFFIX):
+                change = self.df[col].to_numpy(dtype='float64', na_value=np.nan)
+                if not BETTER_WHEN_HIGHER[base_column(col)]:
+                    change = -change
+                codes[:, i] = np.select([change > 0, change < 0],
+                                        [report_pipeline.STYLE_GREEN, report_pipeline.STYLE_RED],
+                                        default=report_pipeline.STYLE_NONE)
+            elif col == 'STATUS':
+                status = self.df[col].to_numpy()
+                codes[:, i] = np.select([status == STATUS_NEW, status == STATUS_GONE],
+                                        [report_pipeline.STYLE_YELLOW, report_pipeline.STYLE_ORANGE],
+                                        default=report_pipeline.STYLE_NONE)
+        return codes
+
+    def sheet_payload(self):
+        """Header, rows and style codes for report_pipeline.write_report_sheet()"""
+        display = self.display_frame().astype(object)
+        rows = list(display.where(display.notna() & (display != ''), None).itertuples(index=False, name=None))
+        return list(display.columns), rows, self.style_codes()
+
+    def save_excel(self, target=None):
+        """One styled sheet with the per-agent changes below the summary lines"""
+        wb = Workbook(write_only=True)
+        report_pipeline.write_report_sheet(wb, COMPARISON_SHEET_NAME, self.sheet_payload(), self.lines(), None)
+        return report_pipeline.save_workbook(wb, target)
+
+
+def compare_reports(current, previous, current_label='current', previous_label='previous'):
+    """Compare two processed reports (single days, merged exports or stored periods)
+
+    Both reports are indexed on agent ID and joined once; every change is a
+    whole-column subtraction, so month-long reports compare as fast as days.
+    RANK CHANGE is positive for agents who moved up. Rows are in current rank
+    order, agents who are gone after them.
+    """
+    now = agent_table(current)
+    before = agent_table(previous)
+    joined = now.join(before, how='outer', rsuffix=BEFORE_SUFFIX)
+
+    in_now = joined.index.isin(now.index)
+    in_before = joined.index.isin(before.index)
+    df = pd.DataFrame(index=joined.index)
+    df['ID'] = joined.index.to_numpy()
+    df['USER NAME'] = joined['USER NAME'].where(in_now, joined[before_column('USER NAME')])
+    df[RANK_COLUMN] = joined[RANK_COLUMN]
+    df[before_column(RANK_COLUMN)] = joined[before_column(RANK_COLUMN)]
+    df[change_column(RANK_COLUMN)] = joined[before_column(RANK_COLUMN)] - joined[RANK_COLUMN]
+    for col in COMPARE_COLUMNS:
+        df[before_column(col)] = joined[before_column(col)]
+        df[col] = joined[col]
+        df[change_column(col)] = joined[col] - joined[before_column(col)]
+    df['STATUS'] = np.where(~in_before, STATUS_NEW, np.where(~in_now, STATUS_GONE, ''))
+
+    # Current rank order; agents no longer present follow in their previous order
+    df = df.sort_values([RANK_COLUMN, before_column(RANK_COLUMN)], na_position='last', kind='stable')
+    df = df.reset_index(drop=True)
+    df.index = df.index + 1
+    return PeriodComparison(df, current_label, previous_label)
@@ -0,0 +1,344 @@
+"""
+Agent Performance Data Processor - Pipeline Worker Process
+Runs parsing, processing and exports for the desktop app in a separate process, frames shared through memory
+"""
+
+import os
+import time
+import queue
+import logging
+import functools
+import multiprocessing
+from multiprocessing import shared_memory
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import pandas as pd
+import report_pipeline
+import grouped_export
+import campaign_merge
+import columnar_export
+import html_report
+import period_comparison
+from incremental_refresh import IncrementalProcessor
+from performance_store import PerformanceStore
+
+# Column buffers start on this boundary inside the shared block
+ALIGNMENT = 64
+
+# Where each column of a shared frame lives: one block, (offset, dtype, length) per buffer.
+# kind is 'array' (numpy values), 'masked' (values + mask of a nullable column),
+# 'category' (codes; categories in extra) or 'object' (values in extra, pickled)
+FrameLayout = namedtuple('FrameLayout', ['segment', 'index', 'columns'])
+ColumnLayout = namedtuple('ColumnLayout', ['name', 'kind', 'dtype', 'buffers', 'extra'])
+
+# Results of a processing job (the frame itself stays in shared memory)
+ProcessedReport = namedtuple('ProcessedReport', ['frame', 'metadata_rows', 'summary', 'quality', 'mode',
+                                                 'changed', 'has_groups'])
+SharedComparison = namedtuple('SharedComparison', ['frame', 'current_label', 'previous_label'])
+
+
+def _column_parts(values):
+    """(kind, numpy arrays, extra) for one column"""
+    dtype = values.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        return 'category', [codes], (list(dtype.categories), dtype.ordered)
+    if isinstance(values.array, pd.arrays.IntegerArray) or isinstance(values.array, pd.arrays.BooleanArray):
+        mask = values.isna().to_numpy()
+        return 'masked', [values.to_numpy(dtype=dtype.numpy_dtype, na_value=0), mask], None
+    if isinstance(dtype, np.dtype) and dtype.kind in 'biuf':
+        return 'array', [values.to_numpy()], None
+    # Names and other text: no fixed-width layout, pickled with the layout
+    return 'object', [], values.to_numpy(dtype=object).tolist()
+
+
+def share_frame(df):
+    """Copy a frame's columns into one new shared memory block; returns (block, FrameLayout)"""
+    parts = [(name, df[name].dtype) + _column_parts(df[name]) for name in df.columns]
+
+    # Lay the buffers out back to back, aligned
+    size = 0
+    placed = []
+    for name, dtype, kind, arrays, extra in parts:
+        buffers = []
+        for array in arrays:
+            size = -(-size // ALIGNMENT) * ALIGNMENT
+            buffers.append((size, array.dtype.str, len(array)))
+            size += array.nbytes
+        placed.append((ColumnLayout(name, kind, dtype, buffers, extra), arrays))
+
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    for column, arrays in placed:
+        for (offset, dtype, length), array in zip(column.buffers, arrays):
+            if length:
+                np.ndarray(length, dtype=dtype, buffer=block.buf, offset=offset)[:] = array
+
+    index = df.index
+    if isinstance(index, pd.RangeIndex):
+        index = (index.start, index.stop, index.step)
+    return block, FrameLayout(block.name, index, [column for column, _ in placed])
+
+
+class SharedFrame:
+    """A frame whose columns are views on a shared memory block written by the worker
+
+    Keep it for as long as the frame is used; close() unmaps the block once
+    nothing references the columns any more.
+    """
+
+    def __init__(self, layout):
+        self.block = shared_memory.SharedMemory(name=layout.segment)
+        if os.name != 'nt':
+            # Mapped now: drop the name so the block goes away with the last mapping
+            self.block.unlink()
+        buffer = self.block.buf
+
+        columns = {}
+        for column in layout.columns:
+            arrays = [np.frombuffer(buffer, dtype=dtype, count=length, offset=offset) if length else np.empty(0, dtype)
+                      for offset, dtype, length in column.buffers]
+            if column.kind == 'array':
+                columns[column.name] = arrays[0]
+            elif column.kind == 'masked':
+                columns[column.name] = column.dtype.construct_array_type()(arrays[0], arrays[1])
+            elif column.kind == 'category':
+                categories, ordered = column.extra
+                columns[column.name] = pd.Categorical.from_codes(arrays[0], categories=categories, ordered=ordered)
+            else:
+                columns[column.name] = pd.array(column.extra, dtype=column.dtype)
+
+        index = layout.index
+        if isinstance(index, tuple):
+            index = pd.RangeIndex(*index)
+        self.df = pd.DataFrame(columns, index=index, copy=False)
+
+    def close(self):
+        """Unmap the block; False while views of it are still in use (call again later)"""
+        self.df = None
+        try:
+            self.block.close()
+        except BufferError:
+            return False
+        return True
+
+
+# State of the worker process (set up by _init_worker)
+_log_queue = None
+_state = None
+
+
+class _WorkerState:
+    """What the worker keeps between jobs"""
+
+    def __init__(self):
+        self.incremental = IncrementalProcessor()
+        self.report = None          # incremental processor or merged report of the last run
+        self.result = None          # RefreshResult of the last run
+        self.comparison = None      # last PeriodComparison
+        self.blocks = {}            # shared blocks not yet released by the app
+
+    def share(self, df):
+        block, layout = share_frame(df)
+        self.blocks[block.name] = block
+        return layout
+
+    def processed(self):
+        if self.result is None:
+            raise RuntimeError("No processed report in the worker. Please process a file first.")
+        return self.result
+
+
+def _init_worker(log_queue):
+    global _log_queue, _state
+    _log_queue = log_queue
+    _state = _WorkerState()
+
+
+def _log(message, level=logging.INFO):
+    _log_queue.put((level, message))
+
+
+def _timed(job):
+    """Log how long a job took (DEBUG, shown when the log view is set to it)"""
+    @functools.wraps(job)
+    def run(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return job(*args, **kwargs)
+        finally:
+            _log(f"{job.__name__} took {time.perf_counter() - start:.2f}s", logging.DEBUG)
+    return run
+
+
+def ready():
+    """No-op job that starts the worker ahead of the first real one"""
+    return os.getpid()
+
+
+def release_frames(names):
+    """Close the worker's handles on blocks the app has mapped"""
+    for name in names:
+        block = _state.blocks.pop(name, None)
+        if block is not None:
+            block.close()
+
+
+@_timed
+def process_files(paths):
+    """Process one export (refreshes patched incrementally) or merge several"""
+    if len(paths) > 1:
+        report = campaign_merge.merge_reports(paths, log=_log)
+        result = report.result
+    else:
+        report = _state.incremental
+        result = report.process(paths[0], log=_log)
+    _state.report = report
+    _state.result = result
+
+    footprint = report_pipeline.memory_footprint(result.df).loc['TOTAL']
+    _log(f"Processed data uses {footprint['bytes'] / 1024:.0f} KB "
+         f"({footprint['saved_pct']:.0f}% less than as text)")
+    return ProcessedReport(_state.share(result.df), result.metadata_rows, result.summary, result.quality,
+                           result.mode, result.changed, report.group_labels() is not None)
+
+
+@_timed
+def export_csv(filename):
+    """CSV (plain or .gz) with patched per-agent lines, or Parquet / Arrow by file name"""
+    result = _state.processed()
+    if columnar_export.columnar_format(filename):
+        columnar_export.write_columnar(result.df, result.metadata_rows, filename)
+    else:
+        report_pipeline.write_csv(result.df, result.metadata_rows, filename, csv_chunks=_state.report.iter_csv())
+    return filename
+
+
+@_timed
+def export_excel(filename, by_team=False, summary_offset=2, average_as_text=True):
+    """Styled workbook, optionally with one sheet per team"""
+    result = _state.processed()
+    if by_team:
+        grouped_export.save_grouped_excel(result.df, _state.report.group_labels(), result.metadata_rows, filename,
+                                          summary=result.summary, summary_offset=summary_offset,
+                                          average_as_text=average_as_text, quality=result.quality)
+    else:
+        report_pipeline.save_to_excel(result.df, result.metadata_rows, filename, summary_offset=summary_offset,
+                                      average_as_text=average_as_text, summary=result.summary,
+                                      quality=result.quality)
+    return filename
+
+
+@_timed
+def export_html(filename):
+    """Static HTML page: header rows, summary and the highlighted table"""
+    result = _state.processed()
+    html_report.write_html(result.df, result.metadata_rows, filename, summary=result.summary)
+    return filename
+
+
+def _shared_comparison(comparison):
+    _state.comparison = comparison
+    return SharedComparison(_state.share(comparison.df), comparison.current_label, comparison.previous_label)
+
+
+@_timed
+def compare_with_exports(paths, current_label):
+    """Compare the processed report with one earlier export, or several added up per agent"""
+    result = _state.processed()
+    if len(paths) == 1:
+        previous = report_pipeline.process_report(paths[0], log=_log)[0]
+    else:
+        previous = campaign_merge.merge_reports(paths, log=_log).df
+    names = [os.path.basename(path) for path in paths]
+    previous_label = ', '.join(names) if len(names) <= 3 else f"{len(names)} exports"
+    return _shared_comparison(period_comparison.compare_reports(result.df, previous, current_label,
+                                                                previous_label))
+
+
+@_timed
+def save_to_history(store_path, source_name):
+    """Append the processed report, with each agent's team, to the historical store"""
+    result = _state.processed()
+    return PerformanceStore(store_path).ingest_report(result.df, result.metadata_rows, source_name=source_name,
+                                                      summary=result.summary, groups=_state.report.group_labels())
+
+
+@_timed
+def compare_periods(store_path, current_period, previous_period):
+    """Compare two date ranges of the historical store"""
+    store = PerformanceStore(store_path)
+    return _shared_comparison(period_comparison.compare_reports(
+        store.period_report(*current_period), store.period_report(*previous_period),
+        f"{current_period[0]} to {current_period[1]}", f"{previous_period[0]} to {previous_period[1]}"
+    ))
+
+
+@_timed
+def export_comparison(filename):
+    if _state.comparison is None:
+        raise RuntimeError("No comparison in the worker. Please compare first.")
+    _state.comparison.save_excel(filename)
+    return filename
+
+
+def _worker_context():
+    """Start the worker without forking the threaded Tk process"""
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(['pipeline_worker'])
+    return context
+
+
+class PipelineWorker:
+    """The desktop app's handle on its worker process
+
+    Jobs run one at a time in submission order and return Futures; the app
+    polls them (and messages()) from its event loop, so no pandas work or
+    unpickling of whole frames happens in the UI process. A worker that died
+    is started again on the next submit (its cached reports are lost).
+    """
+
+    def __init__(self):
+        self._context = _worker_context()
+        self._log_queue = self._context.Queue()
+        self._executor = None
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=1, mp_context=self._context,
+                                                 initializer=_init_worker, initargs=(self._log_queue,))
+        return self._executor
+
+    def submit(self, fn, *args, **kwargs):
+        try:
+            return self._pool().submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            self._executor = None
+            return self._pool().submit(fn, *args, **kwargs)
+
+    def start(self):
+        """Start the worker process now rather than on the first job"""
+        return self.submit(ready)
+
+    def messages(self):
+        """(level, message) pairs the worker logged since the last call"""
+        messages = []
+        while True:
+            try:
+                messages.append(self._log_queue.get_nowait())
+            except queue.Empty:
+                return messages
+
+    def attach(self, layout):
+        """Map a frame the worker shared and let the worker drop its handle"""
+        frame = SharedFrame(layout)
+        self.submit(release_frames, [layout.segment])
+        return frame
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,451 @@
+"""
+Agent Performance Data Processor - Local Processing Service
+Small HTTP API that queues CSV uploads to a worker pool and serves the processed CSV/XLSX
+
+Usage:
+    python processing_service.py [--host 127.0.0.1] [--port 8502] [--workers 2] [--formats xlsx,csv]
+
+API:
+    POST   /jobs                      raw CSV or XLSX body (Content-Length required, X-Filename optional)
+    GET    /jobs/<id>                 job status as JSON
+    GET    /jobs/<id>/result.csv      processed CSV once the job is done
+    GET    /jobs/<id>/result.xlsx     styled workbook once the job is done
+    GET    /jobs/<id>/result.csv.gz   gzipped CSV (service started with --formats including csv.gz)
+    GET    /jobs/<id>/result.zip      CSV + XLSX bundle (service started with --formats including zip)
+    GET    /jobs/<id>/result.parquet  Parquet / Arrow IPC file (--formats including parquet / arrow)
+    GET    /jobs/<id>/result.arrow
+    DELETE /jobs/<id>                 drop the job and its files
+    GET    /health                    service status
+    GET    /metrics                   Prometheus metrics (files, errors, stage times, queue depth)
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+import urllib.request
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import metrics
+from watch_folder import process_file, output_paths, OUTPUT_FORMATS, DEFAULT_FORMATS
+
+logger = logging.getLogger('processing_service')
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_PORT = 8502
+DEFAULT_MAX_UPLOAD_BYTES = 200 * 1024 * 1024
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv.gz': 'application/gzip',
+    'zip': 'application/zip',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file',
+}
+
+
+class Job:
+    """One uploaded file and its processing state"""
+
+    def __init__(self, job_id, filename, job_dir):
+        self.job_id = job_id
+        self.filename = filename
+        self.job_dir = job_dir
+        self.input_path = os.path.join(job_dir, 'upload.csv')
+        self.created = time.time()
+        self.finished = None
+        self.future = None
+        self.result = None
+        self.error = None
+
+    @property
+    def status(self):
+        if self.error is not None:
+            return 'failed'
+        if self.result is not None:
+            return 'done'
+        if self.future is not None:
+            return 'running'
+        return 'queued'
+
+
+class ProcessingService:
+    """Job registry in front of a bounded process pool"""
+
+    def __init__(self, workers=2, max_queued=8, max_upload_bytes=DEFAULT_MAX_UPLOAD_BYTES,
+                 spool_dir=None, job_ttl=3600, executor=None, formats=DEFAULT_FORMATS):
+        self.workers = workers
+        self.formats = tuple(formats)
+        self.max_queued = max_queued
+        self.max_upload_bytes = max_upload_bytes
+        self.job_ttl = job_ttl
+        self._owns_spool = spool_dir is None
+        self.spool_dir = spool_dir or tempfile.mkdtemp(prefix='agent_perf_jobs_')
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self.executor = executor or ProcessPoolExecutor(max_workers=workers)
+        self._jobs = {}
+        self._order = []
+        self._pending = deque()   # uploaded jobs waiting for a free worker
+        self._running = 0
+        self._lock = threading.Lock()
+        metrics.REGISTRY.register_gauge('queue_depth', 'Jobs waiting for a worker', lambda: len(self._pending),
+                                        [('queue', 'service')])
+        metrics.REGISTRY.register_gauge('jobs_running', 'Jobs being processed', lambda: self._running,
+                                        [('queue', 'service')])
+
+    def active_jobs(self):
+        """Jobs waiting or running"""
+        return [job for job in self._jobs.values() if job.status in ('queued', 'running')]
+
+    def create_job(self, filename):
+        """Reserve a job slot and spool directory (None when the queue is full)"""
+        with self._lock:
+            self._expire()
+            if len(self.active_jobs()) >= self.max_queued:
+                return None
+            job_id = uuid.uuid4().hex
+            job_dir = os.path.join(self.spool_dir, job_id)
+            os.makedirs(job_dir)
+            job = Job(job_id, os.path.basename(filename or 'upload.csv'), job_dir)
+            self._jobs[job_id] = job
+            self._order.append(job_id)
+            return job
+
+    def start_job(self, job):
+        """Queue an uploaded job; it runs as soon as a worker is free"""
+        with self._lock:
+            self._pending.append(job)
+            self._dispatch()
+
+    def _dispatch(self):
+        """Hand pending jobs to the pool while workers are free (caller holds the lock)"""
+        while self._pending and self._running < self.workers:
+            job = self._pending.popleft()
+            self._running += 1
+            job.future = self.executor.submit(process_file, job.input_path, job.job_dir, self.formats)
+            job.future.add_done_callback(lambda future, job=job: self._finish(job, future))
+
+    def _finish(self, job, future):
+        try:
+            job.result = future.result()
+            # Metrics recorded in the worker process
+            metrics.merge(job.result.pop('metrics', None))
+        except Exception as e:
+            metrics.merge(getattr(e, 'metrics', None))
+            job.error = str(e) or type(e).__name__
+            logger.error("Job %s failed: %s", job.job_id, job.error)
+        job.finished = time.time()
+        with self._lock:
+            self._running -= 1
+            self._dispatch()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def remove(self, job_id):
+        """Forget a job and delete its files"""
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+            if job_id in self._order:
+                self._order.remove(job_id)
+            if job in self._pending:
+                self._pending.remove(job)
+        if job is not None:
+            if job.future is None or job.future.done():
+                shutil.rmtree(job.job_dir, ignore_errors=True)
+            else:
+                # Still running: clean up once the worker lets go of the files
+                job.future.add_done_callback(lambda future: shutil.rmtree(job.job_dir, ignore_errors=True))
+        return job
+
+    def _expire(self):
+        """Drop finished jobs older than job_ttl (caller holds the lock)"""
+        now = time.time()
+        for job_id in list(self._order):
+            job = self._jobs[job_id]
+            if job.finished is not None and now - job.finished > self.job_ttl:
+                del self._jobs[job_id]
+                self._order.remove(job_id)
+                shutil.rmtree(job.job_dir, ignore_errors=True)
+
+    def queue_position(self, job):
+        """1-based position among queued jobs (0 once running or finished)"""
+        with self._lock:
+            for position, pending in enumerate(self._pending, start=1):
+                if pending is job:
+                    return position
+        return 0
+
+    def describe(self, job):
+        """JSON-friendly job status"""
+        info = {
+            'job_id': job.job_id,
+            'filename': job.filename,
+            'status': job.status,
+            'position': self.queue_position(job),
+            'created': job.created,
+            'finished': job.finished,
+        }
+        if job.result is not None:
+            info['rows'] = job.result['rows']
+            info['seconds'] = round(job.result['seconds'], 3)
+            info['results'] = {
+                fmt: f"/jobs/{job.job_id}/result.{fmt}"
+                for fmt, path in output_paths(job.input_path, job.job_dir, self.formats).items()
+                if os.path.exists(path)
+            }
+        if job.error is not None:
+            info['error'] = job.error
+        return info
+
+    def result_path(self, job, fmt):
+        return output_paths(job.input_path, job.job_dir, formats=(fmt,))[fmt]
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self._owns_spool:
+            shutil.rmtree(self.spool_dir, ignore_errors=True)
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """HTTP front of ProcessingService"""
+
+    server_version = 'AgentPerformanceService/1.0'
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        logger.info("%s %s", self.address_string(), format % args)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self):
+        """Path segments without the query string"""
+        parts = [part for part in self.path.split('?', 1)[0].split('/') if part]
+        return parts
+
+    def do_GET(self):
+        parts = self._route()
+        if parts == ['health']:
+            self._send_json(200, {
+                'status': 'ok',
+                'workers': self.service.workers,
+                'active_jobs': len(self.service.active_jobs()),
+                'max_queued': self.service.max_queued,
+                'max_upload_bytes': self.service.max_upload_bytes,
+            })
+            return
+        if parts == ['metrics']:
+            body = metrics.REGISTRY.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', metrics.CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if len(parts) < 2 or parts[0] != 'jobs':
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        job = self.service.get(parts[1])
+        if job is None:
+            self._send_json(404, {'error': 'unknown job'})
+            return
+        if len(parts) == 2:
+            self._send_json(200, self.service.describe(job))
+            return
+
+        fmt = parts[2][len('result.'):] if parts[2].startswith('result.') else None
+        if fmt not in self.service.formats:
+            self._send_json(404, {'error': 'not found'})
+            return
+        if job.status != 'done':
+            self._send_json(409, {'error': f"job is {job.status}"})
+            return
+        self._send_file(self.service.result_path(job, fmt), CONTENT_TYPES[fmt],
+                        f"{os.path.splitext(job.filename)[0]}_processed.{fmt}")
+
+    def _send_file(self, path, content_type, download_name):
+        """Stream a result file from disk"""
+        size = os.path.getsize(path)
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(size))
+        self.send_header('Content-Disposition', f'attachment; filename="{download_name}"')
+        self.end_headers()
+        with open(path, 'rb') as f:
+            shutil.copyfileobj(f, self.wfile, CHUNK_SIZE)
+
+    def do_POST(self):
+        if self._route() != ['jobs']:
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        length = self.headers.get('Content-Length')
+        if length is None:
+            self._send_json(411, {'error': 'Content-Length required'})
+            return
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # The body cannot be delimited: answer and drop the connection
+            self._send_json(400, {'error': 'invalid Content-Length'}, headers={'Connection': 'close'})
+            self.close_connection = True
+            return
+        if length == 0:
+            self._send_json(400, {'error': 'empty upload'})
+            return
+        if length > self.service.max_upload_bytes:
+            self._send_json(413, {'error': f"upload exceeds {self.service.max_upload_bytes} bytes"},
+                            headers={'Connection': 'close'})
+            self.close_connection = True
+            return
+
+        job = self.service.create_job(self.headers.get('X-Filename'))
+        if job is None:
+            self._send_json(503, {'error': 'queue full, retry later'}, headers={'Retry-After': '5'})
+            self.close_connection = True
+            return
+
+        # Stream the body to disk instead of holding it in memory
+        remaining = length
+        with open(job.input_path, 'wb') as f:
+            while remaining > 0:
+                chunk = self.rfile.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                f.write(chunk)
+                remaining -= len(chunk)
+        if remaining > 0:
+            self.service.remove(job.job_id)
+            self._send_json(400, {'error': 'upload truncated'})
+            return
+
+        self.service.start_job(job)
+        self._send_json(202, self.service.describe(job), headers={'Location': f"/jobs/{job.job_id}"})
+
+    def do_DELETE(self):
+        parts = self._route()
+        if len(parts) != 2 or parts[0] != 'jobs' or self.service.remove(parts[1]) is None:
+            self._send_json(404, {'error': 'unknown job'})
+            return
+        self._send_json(200, {'deleted': parts[1]})
+
+
+def make_server(service, host='127.0.0.1', port=DEFAULT_PORT):
+    """HTTP server bound to host:port (port 0 picks a free port)"""
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+# Client helpers for the Streamlit app and scripts
+
+def submit_file(base_url, data, filename='upload.csv', timeout=60):
+    """Upload CSV or XLSX bytes or a file path and return the job status"""
+    if isinstance(data, (str, os.PathLike)):
+        filename = os.path.basename(data)
+        with open(data, 'rb') as f:
+            data = f.read()
+    request = urllib.request.Request(
+        f"{base_url.rstrip('/')}/jobs",
+        data=data,
+        method='POST',
+        headers={'Content-Type': 'text/csv', 'X-Filename': filename},
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def job_status(base_url, job_id, timeout=30):
+    """Fetch a job's status"""
+    with urllib.request.urlopen(f"{base_url.rstrip('/')}/jobs/{job_id}", timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def wait_for_job(base_url, job_id, timeout=600, poll_seconds=0.5, on_status=None):
+    """Poll until the job is done or failed"""
+    deadline = time.monotonic() + timeout
+    while True:
+        status = job_status(base_url, job_id)
+        if on_status is not None:
+            on_status(status)
+        if status['status'] in ('done', 'failed'):
+            return status
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"job {job_id} still {status['status']} after {timeout}s")
+        time.sleep(poll_seconds)
+
+
+def fetch_result(base_url, job_id, fmt, target=None, timeout=120):
+    """Download a result; returns bytes, or streams into a target path"""
+    url = f"{base_url.rstrip('/')}/jobs/{job_id}/result.{fmt}"
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        if target is None:
+            return response.read()
+        with open(target, 'wb') as f:
+            shutil.copyfileobj(response, f, CHUNK_SIZE)
+        return target
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP processing service for agent performance exports")
+    parser.add_argument('--host', default='127.0.0.1', help="Interface to bind (default: localhost only)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=2, help="Parallel processing workers")
+    parser.add_argument('--max-queued', type=int, default=8, help="Jobs waiting or running before uploads get 503")
+    parser.add_argument('--max-upload-mb', type=int, default=DEFAULT_MAX_UPLOAD_BYTES // (1024 * 1024))
+    parser.add_argument('--spool-dir', help="Where uploads and results are kept (default: temp folder)")
+    parser.add_argument('--formats', default=','.join(DEFAULT_FORMATS),
+                        help="Comma-separated results per job: xlsx, csv, csv.gz, zip (CSV + XLSX bundle), parquet, arrow")
+    args = parser.parse_args(argv)
+
+    formats = [fmt.strip().lower() for fmt in args.formats.split(',') if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in OUTPUT_FORMATS]
+    if unknown:
+        parser.error(f"unknown format(s): {', '.join(unknown)}")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    service = ProcessingService(
+        workers=args.workers,
+        max_queued=args.max_queued,
+        max_upload_bytes=args.max_upload_mb * 1024 * 1024,
+        spool_dir=args.spool_dir,
+        formats=formats,
+    )
+    server = make_server(service, args.host, args.port)
+    logger.info("Serving on http://%s:%d", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
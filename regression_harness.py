@@ -0,0 +1,566 @@
+"""
+Agent Performance Data Processor - Regression Harness
+Runs the pipeline and the legacy code on a corpus of exports: same outputs, within time and memory budgets
+"""
+
+import io
+import os
+import re
+import sys
+import csv
+import glob
+import time
+import random
+import argparse
+import threading
+import tracemalloc
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+import report_pipeline
+import legacy_pipeline
+import table_view
+import processing_service
+from report_summary import ReportSummary
+from incremental_refresh import IncrementalProcessor
+
+# Budgets per stage of the current pipeline: (seconds per 1,000 rows, peak traced bytes per row).
+# About three times what a laptop needs; --time-scale stretches the times on slower machines
+STAGE_BUDGETS = {
+    'load_and_clean_data': (0.03, 2500),
+    'process_time_columns': (0.03, 1000),
+    'reorder_and_sort': (0.03, 1500),
+    'save_to_excel': (0.80, 6000),
+    'row_tags': (0.01, 400),
+}
+
+# Smaller files are only checked for equal outputs (fixed costs dominate their timings)
+BUDGET_MIN_ROWS = 2000
+
+# Rows of the synthetic export that is also timed
+DEFAULT_ROWS = 5000
+
+CorpusFile = namedtuple('CorpusFile', ['name', 'content'])
+PipelineRun = namedtuple('PipelineRun', ['df', 'metadata_rows', 'xlsx', 'tags', 'stages'])
+
+# Columns of a dialer export, in the order the dialer writes them
+EXPORT_COLUMNS = [
+    'USER NAME', 'ID', 'CURRENT USER GROUP', 'MOST RECENT USER GROUP', 'CALLS', 'TIME', 'PAUSE', 'PAUSAVG',
+    'WAIT', 'WAITAVG', 'TALK', 'TALKAVG', 'DISPO', 'DISPAVG', 'DEAD', 'DEADAVG', 'CUSTOMER', 'CUSTAVG',
+    'ANS', 'SSMS', 'REDIAL', 'TOTAL INBOUND CALLS', 'TOTAL OUTBOUND CALLS',
+]
+SURNAMES = ['Smith', 'Khan', 'Lee', 'Garcia', 'Nguyen', 'Okafor']
+
+
+def _duration(seconds, padded=False):
+    hours = f"{seconds // 3600:02d}" if padded else str(seconds // 3600)
+    return f"{hours}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+
+def synthetic_export(rows, seed=1, variant='standard'):
+    """CSV bytes shaped like a dialer export (header rows, agents, totals row)
+
+    Activities fit in the login time (PAUSE, WAIT, TALK, DISPO and DEAD add
+    up to at most TIME, CUSTOMER is part of TALK) as in a real export.
+    variant 'gaps' blanks or garbles some values, 'long_shifts' has logins
+    of a day or more and zero-padded hours, 'ties' puts many agents on the
+    same inbound count, 'no_groups' leaves out the team columns and
+    'overlong' draws activities regardless of the login time.
+    """
+    r = random.Random(seed)
+    columns = EXPORT_COLUMNS
+    if variant == 'no_groups':
+        columns = [col for col in columns if 'USER GROUP' not in col]
+    out = io.StringIO()
+    out.write("Agent Performance Detail                        2024-03-15 18:30:01\n")
+    out.write("Time range: 2024-03-15 00:00:00 to 2024-03-15 23:59:59\n\n")
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerow(columns)
+    padded = variant == 'long_shifts'
+    for i in range(rows):
+        group = r.choice(['SALES', 'SUPPORT', 'RETENTION'])
+        login = r.randint(3 * 3600, 10 * 3600) if variant != 'long_shifts' else r.randint(3 * 3600, 30 * 3600)
+        inbound = r.randint(45, 75) if variant == 'ties' else r.randint(20, 100)
+        name = f"Agent {i} {r.choice(SURNAMES)}" if r.random() > 0.02 else f"{r.choice(SURNAMES)}, Agent {i}"
+        activities = {'PAUSE': r.randint(0, 3 * 3600), 'WAIT': r.randint(0, 3600), 'TALK': r.randint(0, 5 * 3600),
+                      'DISPO': r.randint(0, 1800), 'DEAD': r.randint(0, 900)}
+        if variant == 'overlong':
+            customer = r.randint(0, 5 * 3600)
+        else:
+            # Scaled down to fit in the login time when they would not
+            scale = min(1.0, login / max(sum(activities.values()), 1))
+            activities = {col: int(seconds * scale) for col, seconds in activities.items()}
+            customer = r.randint(0, activities['TALK'])
+        values = {
+            'USER NAME': name, 'ID': str(1000 + i),
+            'CURRENT USER GROUP': group, 'MOST RECENT USER GROUP': group,
+            'CALLS': str(r.randint(20, 120)), 'TIME': _duration(login, padded),
+            'PAUSE': _duration(activities['PAUSE'], padded), 'PAUSAVG': _duration(r.randint(0, 300)),
+            'WAIT': _duration(activities['WAIT'], padded), 'WAITAVG': _duration(r.randint(0, 200)),
+            'TALK': _duration(activities['TALK'], padded), 'TALKAVG': _duration(r.randint(0, 400)),
+            'DISPO': _duration(activities['DISPO'], padded), 'DISPAVG': _duration(r.randint(0, 50)),
+            'DEAD': _duration(activities['DEAD'], padded), 'DEADAVG': _duration(r.randint(0, 30)),
+            'CUSTOMER': _duration(customer, padded), 'CUSTAVG': _duration(r.randint(0, 300)),
+            'ANS': str(r.randint(0, 50)), 'SSMS': str(r.randint(0, 5)), 'REDIAL': str(r.randint(0, 5)),
+            'TOTAL INBOUND CALLS': str(inbound), 'TOTAL OUTBOUND CALLS': str(r.randint(0, 30)),
+        }
+        if variant == 'gaps' and r.random() < 0.1:
+            values[r.choice(['PAUSE', 'WAIT', 'DISPO', 'DEAD', 'TIME'])] = r.choice(['', 'n/a'])
+        if variant == 'gaps' and r.random() < 0.05:
+            values[r.choice(['CALLS', 'TOTAL INBOUND CALLS'])] = ''
+        writer.writerow([values[col] for col in columns])
+    writer.writerow(['TOTALS', f"{rows} agents"] + ['0'] * (len(columns) - 2))
+    return out.getvalue().encode('utf-8')
+
+
+def synthetic_corpus(rows=DEFAULT_ROWS):
+    """Small files of every variant plus one standard export of rows agents (the timed one)"""
+    corpus = [CorpusFile(f"synthetic-{variant}-300", synthetic_export(300, seed, variant))
+              for seed, variant in enumerate(['standard', 'gaps', 'long_shifts', 'ties', 'no_groups', 'overlong'],
+                                             start=1)]
+    corpus.append(CorpusFile(f"synthetic-standard-{rows}", synthetic_export(rows, 99)))
+    return corpus
+
+
+# Exports both apps must process without a data quality issue: (name, export, agents)
+_EDGE_HEADER = ("Agent Performance Detail                        2024-03-15 18:30:01\n\n"
+                "USER NAME,ID,CURRENT USER GROUP,CALLS,TIME,PAUSE,WAIT,TALK,DISPO,DEAD,CUSTOMER,"
+                "TOTAL INBOUND CALLS\n")
+EDGE_EXPORTS = [
+    ('edge-clean', (_EDGE_HEADER
+                    + "Agent 1 Lee,1001,SALES,40,6:00:00,0:30:00,0:20:00,4:00:00,0:10:00,0:02:00,3:30:00,55\n"
+                    + "Agent 2 Khan,1002,SUPPORT,35,5:30:00,0:45:00,0:15:00,3:20:00,0:08:00,0:01:00,3:00:00,48\n"
+                    + "TOTALS,2 agents,,75,11:30:00,1:15:00,0:35:00,7:20:00,0:18:00,0:03:00,6:30:00,103\n"
+                    ).encode('utf-8'), 2),
+    ('edge-header-only', _EDGE_HEADER.encode('utf-8'), 0),
+]
+
+
+def check_edge_exports(out=sys.stdout):
+    """Run EDGE_EXPORTS through IncrementalProcessor; returns the number that failed"""
+    failed = 0
+    for name, content, agents in EDGE_EXPORTS:
+        try:
+            result = IncrementalProcessor().process(content)
+            failures = [] if len(result.df) == agents else [f"{len(result.df)} agents, expected {agents}"]
+            failures += [f"data quality: {line}" for line in result.quality.lines()]
+        except Exception as e:
+            failures = [f"the pipeline failed: {type(e).__name__}: {e}"]
+        out.write(f"{'FAIL' if failures else 'ok  '} {name} ({agents} agents, incremental)\n")
+        for failure in failures:
+            out.write(f"       - {failure}\n")
+        out.flush()
+        failed += bool(failures)
+    return failed
+
+
+def xlsx_copy(content):
+    """The export saved as a workbook the way Excel saves an opened CSV (one cell per field)"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    for row in csv.reader(io.StringIO(content.decode('utf-8'))):
+        ws.append([int(value) if value.isdigit() else value for value in row])
+    out = io.BytesIO()
+    wb.save(out)
+    return out.getvalue()
+
+
+def check_service_xlsx(content, out=sys.stdout):
+    """Upload a workbook copy of an export to a processing service; its CSV must match the CSV export's
+
+    Returns 1 when it fails. The service spools every upload under one name
+    (upload.csv), so this is the path that must read workbooks by content.
+    """
+    df, metadata_rows = report_pipeline.process_report(content)
+    expected = report_pipeline.write_csv(df, metadata_rows, io.BytesIO()).getvalue()
+    service = processing_service.ProcessingService(workers=1)
+    server = processing_service.make_server(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    try:
+        job = processing_service.submit_file(base_url, xlsx_copy(content), filename='export.xlsx')
+        status = processing_service.wait_for_job(base_url, job['job_id'])
+        if status['status'] != 'done':
+            failures = [f"the service job failed: {status.get('error')}"]
+        else:
+            result = processing_service.fetch_result(base_url, job['job_id'], 'csv')
+            lines = (expected.decode('utf-8').split('\n'), result.decode('utf-8').split('\n'))
+            failures = [] if result == expected else [f"service CSV: {_first_difference(*lines)}"]
+    except Exception as e:
+        failures = [f"the service failed: {type(e).__name__}: {e}"]
+    finally:
+        server.shutdown()
+        service.close()
+    out.write(f"{'FAIL' if failures else 'ok  '} service-xlsx ({len(df)} agents, XLSX upload)\n")
+    for failure in failures:
+        out.write(f"       - {failure}\n")
+    out.flush()
+    return int(bool(failures))
+
+
+def load_corpus(directory):
+    """Exports (*.csv) of a corpus folder, e.g. anonymised real ones"""
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.csv'))):
+        with open(path, 'rb') as f:
+            corpus.append(CorpusFile(os.path.basename(path), f.read()))
+    return corpus
+
+
+def anonymize_export(content):
+    """Export with agent names and IDs replaced (header rows, layout and figures kept)
+
+    Review the header rows before sharing: they are copied as they are.
+    """
+    text = content.decode('utf-8', errors='ignore') if isinstance(content, bytes) else content
+    lines = text.split('\n')
+    header = next((i for i, line in enumerate(lines) if 'USER NAME' in line.upper()), None)
+    if header is None:
+        raise ValueError("No USER NAME header row found")
+    rows = list(csv.reader(lines[header:]))
+    columns = [col.strip().upper() for col in rows[0]]
+    name_col = columns.index('USER NAME')
+    id_col = columns.index('ID') if 'ID' in columns else None
+
+    out = io.StringIO()
+    out.write('\n'.join(lines[:header]) + ('\n' if header else ''))
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerow(rows[0])
+    agents = {}
+    for row in rows[1:]:
+        if len(row) > name_col and row[name_col].strip().upper() not in ('', 'TOTAL', 'TOTALS'):
+            number = agents.setdefault(row[name_col], len(agents) + 1)
+            row[name_col] = f"Agent {number}"
+            if id_col is not None and len(row) > id_col and row[id_col].strip():
+                row[id_col] = str(100000 + number)
+        writer.writerow(row)
+    return out.getvalue().encode('utf-8')
+
+
+def earlier_export(content, every=10):
+    """The same export with every tenth agent line left out, as an earlier refresh of it would be"""
+    text = content.decode('utf-8', errors='ignore') if isinstance(content, bytes) else content
+    lines = text.split('\n')
+    header = next((i for i, line in enumerate(lines) if 'USER NAME' in line.upper()), None)
+    if header is None:
+        return content
+    # The last line (the totals row, or the last agent) is always kept
+    last = max(i for i, line in enumerate(lines) if line.strip())
+    kept = [line for i, line in enumerate(lines)
+            if i <= header or i >= last or (i - header) % every]
+    return '\n'.join(kept).encode('utf-8')
+
+
+def run_pipeline(content, trace=False):
+    """Outputs of the current pipeline and (seconds, peak traced bytes or None) per stage"""
+    stages = {}
+
+    def stage(name, fn, *args):
+        if trace:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        result = fn(*args)
+        seconds = time.perf_counter() - start
+        stages[name] = (seconds, tracemalloc.get_traced_memory()[1] - base if trace else None)
+        return result
+
+    raw, metadata_rows = stage('load_and_clean_data', report_pipeline.load_and_clean_data, content)
+    df = stage('process_time_columns', report_pipeline.process_time_columns, raw)
+    df = stage('reorder_and_sort', report_pipeline.reorder_and_sort, df)
+    xlsx = stage('save_to_excel', report_pipeline.save_to_excel, df, metadata_rows)
+    tags = stage('row_tags', table_view.row_tags, df)
+    return PipelineRun(df, metadata_rows, xlsx.getvalue(), list(tags), stages)
+
+
+def peak_memory(content):
+    """Peak traced memory per stage (a second run: tracing slows the timed one down)"""
+    tracemalloc.start()
+    try:
+        return {name: peak for name, (_, peak) in run_pipeline(content, trace=True).stages.items()}
+    finally:
+        tracemalloc.stop()
+
+
+# A duration as the dialer writes it; checked here, not with the pipeline's parser
+_DURATION_TEXT = r'\d+:[0-5]\d:[0-5]\d'
+
+
+def legacy_duration_text(values):
+    """Legacy duration text as the pipeline writes it: hours padded to two digits, invalid values blank"""
+    text = values.astype(object).where(values.notna(), '').astype(str).str.strip()
+    return text.str.zfill(8).where(text.str.fullmatch(_DURATION_TEXT), '')
+
+
+def canonical_frame(df, legacy=False):
+    """Values as both pipelines write them: durations as HH:MM:SS text, counts as numbers, text as text
+
+    The pipeline's durations are formatted by its display_frame; the legacy
+    frame keeps the dialer's text, compared by legacy_duration_text.
+    """
+    text = df if legacy else report_pipeline.display_frame(df)
+    out = pd.DataFrame(index=range(len(df)))
+    for col in df.columns:
+        values = text[col].reset_index(drop=True)
+        if col in report_pipeline.DURATION_COLUMNS:
+            out[col] = legacy_duration_text(values) if legacy else values.astype(object).fillna('').astype(str)
+        elif col in report_pipeline.COUNT_COLUMNS:
+            out[col] = pd.to_numeric(values, errors='coerce').astype('float64')
+        else:
+            out[col] = values.astype(object).fillna('').astype(str)
+    return out
+
+
+_DURATION = re.compile(r'(\d+):(\d{2}):(\d{2})$')
+
+
+def _cell_value(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _DURATION.match(str(value))
+    if match:
+        hours, minutes, seconds = (int(part) for part in match.groups())
+        return float(hours * 3600 + minutes * 60 + seconds)
+    return str(value)
+
+
+def _rgb(color):
+    # Theme and indexed colours have no rgb text
+    return color.rgb if color is not None and isinstance(color.rgb, str) else None
+
+
+def canonical_cells(xlsx):
+    """(value, fill colour, bold, font colour) per cell of the report sheet, trailing blanks dropped"""
+    ws = load_workbook(io.BytesIO(xlsx), read_only=True).worksheets[0]
+    rows = []
+    for row in ws.iter_rows():
+        cells = [(_cell_value(cell.value),
+                  _rgb(cell.fill.fgColor) if cell.fill is not None and cell.fill.fill_type else None,
+                  bool(cell.font.b) if cell.font is not None else False,
+                  _rgb(cell.font.color) if cell.font is not None else None)
+                 for cell in row if hasattr(cell, 'fill')]
+        while cells and cells[-1][0] is None and cells[-1][1] is None:
+            cells.pop()
+        rows.append(cells)
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+
+def summary_values(df):
+    """The legacy summary numbers from ReportSummary"""
+    return summary_fields(ReportSummary.from_frame(df))
+
+
+def summary_fields(summary):
+    """The legacy summary numbers of a ReportSummary"""
+    values = {
+        'total_agents': summary.total_agents,
+        'total_inbound': summary.total_inbound,
+        'avg_inbound': round(summary.avg_inbound, 2),
+        'hd_count': summary.hd_count,
+        'top_performer': None if summary.top_performer is None else str(summary.top_performer),
+        'top_inbound': summary.top_inbound,
+    }
+    values.update(summary.band_counts)
+    return values
+
+
+def _first_difference(legacy, current):
+    for i, (a, b) in enumerate(zip(legacy, current)):
+        if a != b:
+            return f"first at {i}: legacy {a!r}, now {b!r}"
+    return f"legacy has {len(legacy)}, now {len(current)}"
+
+
+class NotComparable(Exception):
+    """The legacy code gives no reference for an export (a difference made on purpose)"""
+
+
+def check_outputs(content, run):
+    """Names of the checks that differ from the legacy code, with the first difference"""
+    try:
+        legacy_df, legacy_metadata = legacy_pipeline.process_report(content)
+    except Exception as e:
+        # e.g. semicolon exports or missing columns, which the pipeline now reads
+        raise NotComparable(f"the legacy code cannot read it ({type(e).__name__}: {e})") from e
+    if len(run.df) == len(legacy_df) + 1:
+        raise NotComparable("no totals row: the legacy code drops the last agent, the pipeline keeps it")
+    failures = []
+
+    if legacy_metadata != run.metadata_rows:
+        failures.append(f"metadata rows: {_first_difference(legacy_metadata, run.metadata_rows)}")
+    legacy_frame = canonical_frame(legacy_df, legacy=True)
+    frame = canonical_frame(run.df)
+    if list(legacy_frame.columns) != list(frame.columns) or list(legacy_df.index) != list(run.df.index):
+        failures.append(f"processed frame layout: legacy {list(legacy_df.columns)} x {len(legacy_df)}, "
+                        f"now {list(run.df.columns)} x {len(run.df)}")
+    else:
+        for col in frame.columns:
+            if not legacy_frame[col].equals(frame[col]):
+                failures.append(f"processed frame {col}: "
+                                f"{_first_difference(legacy_frame[col].tolist(), frame[col].tolist())}")
+
+    if 'REMARKS' in legacy_df.columns:
+        legacy_hd = (legacy_df['REMARKS'] == 'HD').tolist()
+        hd = (run.df['REMARKS'] == 'HD').tolist()
+        if legacy_hd != hd:
+            failures.append(f"HD flags: {_first_difference(legacy_hd, hd)}")
+
+    legacy_tags = legacy_pipeline.row_tags(legacy_df)
+    if 'TOTAL INBOUND CALLS' in legacy_df.columns:
+        # On purpose: a missing inbound count fell through to 'below_avg' (NaN fails every
+        # threshold); it now has no band, as in the Excel report
+        missing = legacy_df['TOTAL INBOUND CALLS'].isna().to_numpy()
+        legacy_tags = ['' if gap and tag == 'below_avg' else tag for tag, gap in zip(legacy_tags, missing)]
+    if legacy_tags != run.tags:
+        failures.append(f"bands / row colours: {_first_difference(legacy_tags, run.tags)}")
+
+    legacy_summary = legacy_pipeline.summary_values(legacy_df)
+    summary = summary_values(run.df)
+    for name, value in legacy_summary.items():
+        if summary.get(name) != value:
+            failures.append(f"summary {name}: legacy {value!r}, now {summary.get(name)!r}")
+
+    legacy_cells = canonical_cells(legacy_pipeline.save_to_excel(legacy_df, legacy_metadata).getvalue())
+    cells = canonical_cells(run.xlsx)
+    if legacy_cells != cells:
+        row = next((i for i, (a, b) in enumerate(zip(legacy_cells, cells)) if a != b), None)
+        if row is None:
+            failures.append(f"XLSX rows: legacy has {len(legacy_cells)}, now {len(cells)}")
+        else:
+            failures.append(f"XLSX row {row + 1}: cells {_first_difference(legacy_cells[row], cells[row])}")
+    return failures
+
+
+def _frame_differences(label, expected, df):
+    frame = canonical_frame(df)
+    if list(expected.columns) != list(frame.columns) or len(expected) != len(frame):
+        return [f"{label} layout: {list(expected.columns)} x {len(expected)}, "
+                f"now {list(frame.columns)} x {len(frame)}"]
+    return [f"{label} {col}: {_first_difference(expected[col].tolist(), frame[col].tolist())}"
+            for col in frame.columns if not expected[col].equals(frame[col])]
+
+
+def check_incremental(content, run):
+    """Differences between IncrementalProcessor (what both apps use) and the stage-by-stage run
+
+    The export is processed from scratch, and as a refresh patched onto an
+    earlier version of it; both must match the run and give the same CSV.
+    """
+    expected = canonical_frame(run.df)
+    expected_summary = summary_values(run.df)
+    failures = []
+    full = IncrementalProcessor()
+    refreshed = IncrementalProcessor()
+    refreshed.process(earlier_export(content))
+    for label, processor in [('incremental', full), ('refreshed', refreshed)]:
+        result = processor.process(content)
+        failures += _frame_differences(f"{label} frame ({result.mode})", expected, result.df)
+        tags = list(table_view.row_tags(result.df))
+        if tags != run.tags:
+            failures.append(f"{label} bands / row colours: {_first_difference(run.tags, tags)}")
+        # The summary the apps show: patched, not recomputed, after a refresh
+        summary = summary_fields(result.summary)
+        for name, value in expected_summary.items():
+            if summary.get(name) != value:
+                failures.append(f"{label} summary {name}: expected {value!r}, now {summary.get(name)!r}")
+    if not failures and full.csv_text() != refreshed.csv_text():
+        lines = (full.csv_text().split('\n'), refreshed.csv_text().split('\n'))
+        failures.append(f"refreshed CSV: {_first_difference(*lines)}")
+    return failures
+
+
+def check_budgets(rows, stages, memory, time_scale=1.0):
+    """Stages over their time or memory budget for a file of rows agents"""
+    failures = []
+    for name, (seconds_per_1000, bytes_per_row) in STAGE_BUDGETS.items():
+        seconds = stages[name][0]
+        budget = seconds_per_1000 * rows / 1000 * time_scale
+        if seconds > budget:
+            failures.append(f"{name} took {seconds:.3f}s, budget {budget:.3f}s")
+        if memory[name] > bytes_per_row * rows:
+            failures.append(f"{name} peaked at {memory[name] / 1e6:.1f} MB, "
+                            f"budget {bytes_per_row * rows / 1e6:.1f} MB")
+    return failures
+
+
+def run_harness(corpus, time_scale=1.0, budgets=True, out=sys.stdout):
+    """Check every corpus file; returns the number of files with a failure"""
+    failed = 0
+    for item in corpus:
+        try:
+            run = run_pipeline(item.content)
+        except Exception as e:
+            out.write(f"FAIL {item.name}\n       - the pipeline failed: {type(e).__name__}: {e}\n")
+            failed += 1
+            continue
+        rows = len(run.df)
+        try:
+            failures = check_outputs(item.content, run)
+            skipped = None
+        except NotComparable as e:
+            failures = []
+            skipped = str(e)
+        try:
+            failures += check_incremental(item.content, run)
+        except Exception as e:
+            failures.append(f"the incremental processor failed: {type(e).__name__}: {e}")
+        timed = budgets and rows >= BUDGET_MIN_ROWS
+        if timed:
+            memory = peak_memory(item.content)
+            failures += check_budgets(rows, run.stages, memory, time_scale)
+
+        out.write(f"{'FAIL' if failures else 'ok  '} {item.name} ({rows} agents)\n")
+        if timed:
+            for name, (seconds, _) in run.stages.items():
+                out.write(f"       {name:22s} {seconds:7.3f}s {memory[name] / 1e6:8.1f} MB\n")
+        if skipped:
+            out.write(f"       outputs not compared: {skipped}\n")
+        for failure in failures:
+            out.write(f"       - {failure}\n")
+        out.flush()
+        failed += bool(failures)
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the pipeline against the legacy code and its budgets")
+    parser.add_argument('--corpus', action='append', default=[],
+                        help="Folder of exports (e.g. anonymised real ones) to check as well; repeatable")
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS, help="Agents in the timed synthetic export")
+    parser.add_argument('--no-synthetic', action='store_true', help="Only check the --corpus folders")
+    parser.add_argument('--time-scale', type=float, default=1.0, help="Multiply the time budgets (slow machines)")
+    parser.add_argument('--no-budgets', action='store_true', help="Only compare outputs")
+    parser.add_argument('--anonymize', nargs=2, metavar=('EXPORT', 'TARGET'),
+                        help="Write an anonymised copy of an export for the corpus and exit")
+    args = parser.parse_args(argv)
+
+    if args.anonymize:
+        source, target = args.anonymize
+        with open(source, 'rb') as f:
+            content = anonymize_export(f.read())
+        with open(target, 'wb') as f:
+            f.write(content)
+        return 0
+
+    corpus = [] if args.no_synthetic else synthetic_corpus(args.rows)
+    for directory in args.corpus:
+        corpus += load_corpus(directory)
+    if not corpus:
+        parser.error("Nothing to check")
+    failed = run_harness(corpus, args.time_scale, not args.no_budgets)
+    checked = len(corpus)
+    if not args.no_synthetic:
+        failed += check_edge_exports()
+        failed += check_service_xlsx(synthetic_export(300, 7))
+        checked += len(EDGE_EXPORTS) + 1
+    print(f"{checked - failed} of {checked} files passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,812 @@
+"""
+Agent Performance Data Processor - Core Pipeline
+UI-free loading, cleaning and processing shared by the web app and the desktop GUI
+"""
+
+import io
+import os
+import re
+import mmap
+import zlib
+import time
+import shutil
+import zipfile
+import hashlib
+import tempfile
+import functools
+import threading
+import warnings
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+import layout_profiles
+import vendor_mappings
+import xlsx_input
+import metrics
+
+# Columns to remove
+COLUMNS_TO_DELETE = [
+    'CURRENT USER GROUP', 'MOST RECENT USER GROUP', 'PAUSAVG', 'WAITAVG',
+    'TALKAVG', 'DISPAVG', 'DEADAVG', 'CUSTAVG', 'ANS', 'SSMS', 'REDIAL',
+    'test', 'testne', 'TestIT', 'TESTNC', 'TESTCB', 'Test22', 'DUPLICATE CALLS'
+]
+
+# Output column order with ID first
+DESIRED_COLUMNS = [
+    'ID', 'USER NAME', 'CALLS', 'TIME', 'PAUSE', 'WAIT', 'TALK',
+    'DISPO', 'DEAD', 'TOTAL PAUSE', 'CUSTOMER',
+    'TOTAL INBOUND CALLS', 'TOTAL OUTBOUND CALLS'
+]
+
+# Team of each agent, kept alongside the processed rows for grouped exports
+GROUP_COLUMN = 'CURRENT USER GROUP'
+
+# Columns read from the export (the other deleted and per-status columns are never loaded)
+INPUT_COLUMNS = frozenset(DESIRED_COLUMNS + [GROUP_COLUMN])
+# Columns every export must have (TOTAL PAUSE is computed, the group is optional)
+REQUIRED_COLUMNS = [col for col in DESIRED_COLUMNS if col != 'TOTAL PAUSE']
+PARSE_CHUNK_ROWS = 50000
+# Extra parser column that catches lines with more fields than the header
+OVERFLOW_COLUMN = '\x00overflow'
+# Name of the trailing totals row (TOTALS)
+TOTALS_LABEL = 'TOTAL'
+
+# Exports are streamed in pieces this size so no whole document is built in memory
+CSV_CHUNK_ROWS = 10000
+STREAM_CHUNK_BYTES = 64 * 1024
+# Workbooks for zip bundles are staged in memory up to this size, then on disk
+SPOOL_MAX_BYTES = 16 * 1024 * 1024
+
+# Columns held as int32 seconds in the processed frame
+DURATION_COLUMNS = ['TIME', 'PAUSE', 'WAIT', 'TALK', 'DISPO', 'DEAD', 'TOTAL PAUSE', 'CUSTOMER']
+
+# Columns held as small integers in the processed frame
+COUNT_COLUMNS = ['ID', 'CALLS', 'TOTAL INBOUND CALLS', 'TOTAL OUTBOUND CALLS']
+
+REMARKS_CATEGORIES = ['', 'HD']
+
+# Login time below this is a half day (HD)
+HD_THRESHOLD = pd.Timedelta(hours=7)
+HD_THRESHOLD_SECONDS = 7 * 3600
+# Login time below this (but not HD) is flagged red
+TIME_RED_THRESHOLD_SECONDS = 8 * 3600 + 45 * 60
+# PAUSE / TOTAL PAUSE above this is flagged dark red
+PAUSE_THRESHOLD_SECONDS = 2 * 3600
+
+# Dialer durations: H:MM:SS or HH:MM:SS, hours may go past 24
+DURATION_PATTERN = r'^\s*(\d{1,5}):([0-5]\d):([0-5]\d)\s*$'
+
+# TOTAL INBOUND CALLS bands (lower bound, band name), best first
+INBOUND_BANDS = [
+    (70, 'excellent'),
+    (60, 'good'),
+    (50, 'average'),
+]
+BELOW_AVERAGE_BAND = 'below_avg'
+BAND_NAMES = [name for _, name in INBOUND_BANDS] + [BELOW_AVERAGE_BAND]
+
+
+def _noop_log(message):
+    pass
+
+
+def read_source_text(source):
+    """Read a path, bytes or binary file-like object into text"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        raw = bytes(source)
+    elif isinstance(source, str) or hasattr(source, '__fspath__'):
+        with open(source, 'rb') as f:
+            raw = f.read()
+    else:
+        raw = source.read()
+    if isinstance(raw, str):
+        content = raw
+    else:
+        # UTF-8 unless the start of the file is not (then the Windows code page dialers use)
+        encoding = layout_profiles.detect_encoding(raw[:layout_profiles.ENCODING_SAMPLE_BYTES])
+        content = raw.decode(encoding, errors='ignore')
+    # Normalise line endings the way text-mode open() does
+    return content.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def _layout_cache():
+    return layout_profiles.default_cache(INPUT_COLUMNS, REQUIRED_COLUMNS)
+
+
+def split_preamble(content, log=None):
+    """Split file text into metadata rows and the data section starting at the header"""
+    metadata_rows, data_content, _ = split_layout(content, log=log)
+    return metadata_rows, data_content
+
+
+def split_layout(content, log=None, layouts=None):
+    """Metadata rows, data section and layout profile (None for an unrecognised layout) of file text"""
+    lines = content.split('\n')
+
+    # Find the row that contains 'USER NAME' (the actual header), straight away for known layouts
+    layouts = layouts or _layout_cache()
+    profile, header_row = layouts.for_lines(lines, log or _noop_log)
+
+    # Store ALL rows before the header as metadata
+    metadata_rows = [line + '\n' for line in lines[:header_row] if line.strip()]
+    data_content = '\n'.join(lines[header_row:])
+    return metadata_rows, data_content, profile
+
+
+def is_path(source):
+    """True for a file path (as opposed to bytes or an open file)"""
+    return isinstance(source, str) or hasattr(source, '__fspath__')
+
+
+class MappedReport:
+    """Memory-mapped export file: preamble decoded, data section left on disk
+
+    Only the preamble is scanned to find the header offset; the data section is
+    hashed in place and parsed straight from the mapping, so peak memory follows
+    the columns we keep rather than the raw file size.
+    """
+
+    def __init__(self, path, log=None, layouts=None):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = None
+        self.offset = 0
+        self.metadata_rows = []
+        self.profile = None
+        if os.fstat(self._file.fileno()).st_size > 0:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._find_header(log or _noop_log, layouts or _layout_cache())
+
+    def _find_header(self, log, layouts):
+        """Metadata rows and byte offset of the 'USER NAME' header row (no search for known layouts)"""
+        self.profile, self.offset = layouts.for_bytes(self._map, log)
+        encoding = self.profile.encoding if self.profile is not None else 'utf-8'
+        rows = layout_profiles.preamble_lines(self._map, self.offset, encoding)
+        self.metadata_rows = [row + '\n' for row in rows if row.strip()]
+
+    def data_hash(self):
+        """Digest of the data section, computed without copying it"""
+        if self._map is None:
+            return hashlib.blake2b(b'', digest_size=16).digest()
+        view = memoryview(self._map)[self.offset:]
+        try:
+            return hashlib.blake2b(view, digest_size=16).digest()
+        finally:
+            view.release()
+
+    def parse(self, log=None, quality=None):
+        """Parse the data section from the mapping"""
+        if self._map is None:
+            return parse_data_section('', log=log, quality=quality)
+        if self.profile is not None and self.profile.encoding != 'utf-8':
+            # The parser only decodes UTF-8 from a mapping; other code pages are read from the file
+            self._file.seek(self.offset)
+            return parse_data_section(self._file, log=log, layout=self.profile, quality=quality)
+        self._map.seek(self.offset)
+        return parse_data_section(self._map, log=log, layout=self.profile, quality=quality)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_and_clean_data(source, log=None, quality=None):
+    """Load CSV (or an XLSX workbook) and perform initial cleaning"""
+    if xlsx_input.is_xlsx(source):
+        # Workbooks are streamed to a CSV copy on disk and read like any export file
+        with xlsx_input.csv_copy(source, _layout_cache().is_header) as path:
+            return load_and_clean_data(path, log=log, quality=quality)
+    if is_path(source):
+        with MappedReport(source, log=log) as report:
+            return report.parse(log=log, quality=quality), report.metadata_rows
+    metadata_rows, data_content, profile = split_layout(read_source_text(source), log=log)
+    return parse_data_section(data_content, log=log, layout=profile, quality=quality), metadata_rows
+
+
+# Parsing with warnings recorded (the warnings filters are process-wide)
+_parser_warnings_lock = threading.Lock()
+
+
+def is_totals_row(row):
+    """True for the dialer's trailing totals row: a TOTALS name or no numeric agent ID"""
+    name = row.get('USER NAME')
+    if isinstance(name, str) and name.strip().upper().startswith(TOTALS_LABEL):
+        return True
+    return pd.isna(pd.to_numeric(row.get('ID'), errors='coerce'))
+
+
+def _read_header(data, encoding):
+    """Header row text of a data section, leaving data positioned at the first data line"""
+    header = data.readline()
+    # An unrecognised layout may start with blank lines, as the parser skipped before
+    while header and not header.strip():
+        header = data.readline()
+    if isinstance(header, bytes):
+        header = header.decode(encoding, errors='ignore')
+    return header.rstrip('\r\n')
+
+
+@metrics.timed('parse')
+def parse_data_section(data, log=None, layout=None, quality=None):
+    """Parse the data section (text or a binary file positioned at the header) and drop the totals row
+
+    layout is the report's layout profile: its delimiter, encoding, pipeline
+    names and kept columns are used as they are (by default ',' / UTF-8 and the
+    names come from the header row). Skipped lines and a trailing row that is
+    not a totals row are recorded in quality (a data_quality.QualityReport).
+    """
+    log = log or _noop_log
+    if isinstance(data, str):
+        data = io.StringIO(data)
+    delimiter = layout.delimiter if layout is not None else ','
+    encoding = layout.encoding if layout is not None else 'utf-8'
+
+    header = _read_header(data, encoding)
+    if not header:
+        raise pd.errors.EmptyDataError("No columns to parse from file")
+    if layout is not None:
+        names = list(layout.names)
+        keep = list(layout.keep)
+    else:
+        columns = layout_profiles.split_header(header, delimiter)
+        columns[0] = columns[0].lstrip('\ufeff')
+        names = vendor_mappings.unique_names(columns)
+        keep = [col for col in names if col in INPUT_COLUMNS]
+
+    # Parse in chunks and keep only the output columns of each, so the per-status
+    # columns of wide exports never all sit in memory at once. Everything is read
+    # as text: kept columns are converted explicitly later, and chunked type
+    # inference would otherwise mix ints and strs (e.g. around the TOTALS row).
+    # The parser stops skipping long lines after some chunk boundaries (and with
+    # usecols), so one more column than the header takes them in and they are
+    # dropped here; lines longer still are skipped by the parser with a warning.
+    chunks = []
+    with _parser_warnings_lock, warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always', pd.errors.ParserWarning)
+        with pd.read_csv(data, sep=delimiter, header=None, names=names + [OVERFLOW_COLUMN], on_bad_lines='warn',
+                         engine='c', dtype=str, chunksize=PARSE_CHUNK_ROWS, encoding=encoding,
+                         encoding_errors='ignore') as reader:
+            for chunk in reader:
+                chunks.append(chunk[keep + [OVERFLOW_COLUMN]])
+    df = pd.concat(chunks) if len(chunks) > 1 else chunks[0]
+
+    skipped = [int(line) for warning in caught if issubclass(warning.category, pd.errors.ParserWarning)
+               for line in re.findall(r'Skipping line (\d+)', str(warning.message))]
+    overflow = df[OVERFLOW_COLUMN].notna().to_numpy()
+    df = df[keep]
+    examples = [f"data line {line}" for line in skipped]
+    if overflow.any():
+        if 'USER NAME' in df.columns:
+            examples += df['USER NAME'][overflow].dropna().astype(str).tolist()[:3]
+        df = df[~overflow].reset_index(drop=True)
+    skipped_count = len(skipped) + int(overflow.sum())
+    if skipped_count:
+        log(f"Skipped {skipped_count} lines with more fields than the header")
+    log(f"Loaded {len(df)} rows of data")
+
+    # Remove the last row when it is the totals/summary row
+    kept_last = len(df) > 0 and not is_totals_row(df.iloc[-1])
+    if kept_last:
+        last = df.iloc[-1]
+        log(f"Last row kept: it is not a totals row (ID {last.get('ID')}, {last.get('USER NAME')})")
+    elif len(df) > 0:
+        df = df.iloc[:-1]
+    if quality is not None:
+        quality.record_parse(skipped_count, examples, str(df.iloc[-1].get('USER NAME')) if kept_last else None)
+
+    metrics.record_file(len(df))
+    return df
+
+
+def parse_durations(values):
+    """Parse H:MM:SS durations to nullable int32 seconds, one parse per distinct value
+
+    Returns (seconds, malformed): malformed holds the non-blank values that did
+    not parse, by row. Blank and missing values are <NA> without being reported.
+    """
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values)
+    text = pd.Series(uniques, dtype=object).astype(str)
+
+    # Split the fixed format on the distinct values only
+    parts = text.str.extract(DURATION_PATTERN)
+    parsed = parts[0].notna().to_numpy()
+    numbers = parts.fillna('0').astype('int64').to_numpy()
+    unique_seconds = numbers[:, 0] * 3600 + numbers[:, 1] * 60 + numbers[:, 2]
+    unique_bad = ~parsed & (text.str.strip() != '').to_numpy()
+
+    # Map back to rows; code -1 (missing) takes the extra slot at the end
+    unique_seconds = np.append(unique_seconds, 0).astype('int32')
+    unique_missing = np.append(~parsed, True)
+    unique_bad = np.append(unique_bad, False)
+    seconds = pd.Series(
+        pd.arrays.IntegerArray(unique_seconds[codes], unique_missing[codes]),
+        index=values.index, name=values.name
+    )
+    return seconds, values[unique_bad[codes]]
+
+
+def duration_seconds(values):
+    """Durations as nullable int32 seconds (unparseable values become <NA>)"""
+    if pd.api.types.is_integer_dtype(values):
+        return values.astype('Int32')
+    return parse_durations(values)[0]
+
+
+@functools.lru_cache(maxsize=65536)
+def _parse_duration_text(text):
+    parts = text.strip().split(':')
+    if len(parts) != 3 or not all(part.isdigit() for part in parts):
+        return None
+    hours, minutes, secs = (int(part) for part in parts)
+    if len(parts[1]) != 2 or len(parts[2]) != 2 or minutes > 59 or secs > 59:
+        return None
+    return hours * 3600 + minutes * 60 + secs
+
+
+def parse_duration(value):
+    """Seconds for one duration cell (int seconds or H:MM:SS text), None if missing or malformed"""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if not isinstance(value, str):
+        return None
+    return _parse_duration_text(value)
+
+
+def format_seconds(seconds):
+    """Format int seconds as HH:MM:SS strings (<NA> becomes an empty string)"""
+    values = seconds.to_numpy(dtype='float64', na_value=np.nan)
+    missing = np.isnan(values)
+    whole = np.where(missing, 0, values).astype('int64')
+    hours = pd.Series(whole // 3600, index=seconds.index).astype(str).str.zfill(2)
+    minutes = pd.Series((whole % 3600) // 60, index=seconds.index).astype(str).str.zfill(2)
+    secs = pd.Series(whole % 60, index=seconds.index).astype(str).str.zfill(2)
+    text = hours + ':' + minutes + ':' + secs
+    text[missing] = ''
+    return text
+
+
+def format_duration(seconds):
+    """Format one duration in seconds as HH:MM:SS"""
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+@metrics.timed('process_time_columns')
+def process_time_columns(df, log=None):
+    """Convert durations to int32 seconds and add TOTAL PAUSE (PAUSE + DEAD + DISPO)"""
+    log = log or _noop_log
+    for col in DURATION_COLUMNS:
+        if col in df.columns and col != 'TOTAL PAUSE':
+            if pd.api.types.is_integer_dtype(df[col]):
+                df[col] = df[col].astype('Int32')
+                continue
+            df[col], malformed = parse_durations(df[col])
+            if len(malformed):
+                examples = ', '.join(repr(value) for value in malformed.astype(str).unique()[:3])
+                log(f"Malformed durations in {col}: {len(malformed)} rows left blank (e.g. {examples})")
+
+    # Missing parts count as zero, as before
+    df['TOTAL PAUSE'] = (
+        df['PAUSE'].fillna(0) + df['DEAD'].fillna(0) + df['DISPO'].fillna(0)
+    ).astype('Int32')
+    return df
+
+
+def _smallest_int(values):
+    """Downcast a count/ID column to the smallest integer type that holds it"""
+    numeric = pd.to_numeric(values, errors='coerce')
+    if numeric.isna().any():
+        low, high = numeric.min(), numeric.max()
+        if pd.isna(low) or (np.iinfo(np.int16).min <= low and high <= np.iinfo(np.int16).max):
+            return numeric.astype('Int16')
+        return numeric.astype('Int32') if high <= np.iinfo(np.int32).max else numeric.astype('Int64')
+    return pd.to_numeric(numeric.astype('int64'), downcast='integer')
+
+
+def compact_frame(df):
+    """Apply the compact dtype layout to a processed frame (idempotent)
+
+    Counts and ID use the smallest integer type, durations int32 seconds,
+    USER NAME a categorical and REMARKS a two-value categorical ('' / 'HD').
+    """
+    for col in DURATION_COLUMNS:
+        if col in df.columns:
+            df[col] = duration_seconds(df[col])
+    for col in COUNT_COLUMNS:
+        if col in df.columns:
+            df[col] = _smallest_int(df[col])
+    if 'USER NAME' in df.columns:
+        df['USER NAME'] = df['USER NAME'].astype('category')
+    if 'REMARKS' in df.columns:
+        df['REMARKS'] = pd.Categorical(df['REMARKS'].astype(object).fillna(''), categories=REMARKS_CATEGORIES)
+    return df
+
+
+def select_columns(df):
+    """Convert ID, keep the output columns in order and add REMARKS (row-local)"""
+    df = df.copy()
+
+    # Convert ID to integer
+    df['ID'] = pd.to_numeric(df['ID'], errors='coerce').fillna(0).astype(int)
+
+    # Only include columns that exist
+    existing_cols = [col for col in DESIRED_COLUMNS if col in df.columns]
+    df = df[existing_cols].copy()
+
+    # Add 'HD' in REMARKS if login hour (TIME) is less than 7 hours
+    remarks = np.full(len(df), '', dtype=object)
+    if 'TIME' in df.columns:
+        login_seconds = duration_seconds(df['TIME'])
+        remarks[(login_seconds < HD_THRESHOLD_SECONDS).fillna(False).to_numpy(dtype=bool)] = 'HD'
+
+    # Add Remarks column as the last column
+    df['REMARKS'] = remarks
+    return compact_frame(df)
+
+
+def display_frame(df):
+    """Copy of a processed frame with durations as HH:MM:SS text for CSV, Excel and on-screen tables"""
+    df = df.copy()
+    for col in DURATION_COLUMNS:
+        if col in df.columns and pd.api.types.is_integer_dtype(df[col]):
+            df[col] = format_seconds(df[col])
+    return df
+
+
+def memory_footprint(df):
+    """Per-column memory of the processed frame next to the old text layout"""
+    # Old layout: durations and names as Python strings, counts as 64-bit numbers
+    text = display_frame(df)
+    for col in text.columns:
+        if col in COUNT_COLUMNS:
+            text[col] = text[col].astype('float64' if text[col].isna().any() else 'int64')
+        else:
+            text[col] = text[col].astype(object)
+
+    compact = df.memory_usage(index=False, deep=True)
+    previous = text.memory_usage(index=False, deep=True)
+    report = pd.DataFrame({
+        'dtype': df.dtypes.astype(str),
+        'bytes': compact,
+        'text_layout_bytes': previous,
+    })
+    report.loc['TOTAL'] = ['', int(compact.sum()), int(previous.sum())]
+    baseline = report['text_layout_bytes'].where(report['text_layout_bytes'] > 0)
+    report['saved_pct'] = (100 * (1 - report['bytes'] / baseline)).round(1)
+    return report
+
+
+@metrics.timed('sort')
+def sort_by_inbound(df):
+    """Sort by total inbound calls (descending) and number rows from 1"""
+    if 'TOTAL INBOUND CALLS' in df.columns:
+        # Sort on a 64-bit key so tied agents keep the order the text layout gave them
+        calls = df['TOTAL INBOUND CALLS']
+        key = calls.astype('float64' if calls.isna().any() else 'int64').reset_index(drop=True)
+        df = df.iloc[key.sort_values(ascending=False).index]
+
+    # Reset index starting from 1
+    df = df.reset_index(drop=True)
+    df.index = df.index + 1
+    return df
+
+
+def reorder_and_sort(df):
+    """Reorder columns and sort by total inbound calls"""
+    return sort_by_inbound(select_columns(df))
+
+
+def inbound_band_codes(values):
+    """Index into BAND_NAMES per value of TOTAL INBOUND CALLS (-1 where not numeric)"""
+    values = np.asarray(pd.to_numeric(values, errors='coerce'), dtype=float)
+    conditions = [values >= lower for lower, _ in INBOUND_BANDS] + [values < INBOUND_BANDS[-1][0]]
+    return np.select(conditions, range(len(BAND_NAMES)), default=-1)
+
+
+def inbound_band(calls):
+    """Band name per row from TOTAL INBOUND CALLS (None where not numeric)"""
+    codes = inbound_band_codes(calls)
+    bands = np.array(BAND_NAMES + [None], dtype=object)[codes]
+    return pd.Series(bands, index=calls.index, dtype=object)
+
+
+def process_report(source, log=None):
+    """Run the full pipeline on one source and return (processed_df, metadata_rows)"""
+    df, metadata_rows = load_and_clean_data(source, log=log)
+    df = process_time_columns(df, log=log)
+    df = reorder_and_sort(df)
+    return df, metadata_rows
+
+
+def iter_csv(df, metadata_rows, chunk_rows=CSV_CHUNK_ROWS):
+    """CSV text of the metadata rows, header and data, rendered chunk_rows rows at a time"""
+    if metadata_rows:
+        yield ''.join(metadata_rows)
+    yield pd.DataFrame(columns=df.columns).to_csv(index=False, lineterminator='\n')
+    for start in range(0, len(df), chunk_rows):
+        part = display_frame(df.iloc[start:start + chunk_rows])
+        yield part.to_csv(index=False, header=False, lineterminator='\n')
+
+
+def iter_encoded(chunks, encoding='utf-8'):
+    """Encode a stream of text chunks"""
+    for chunk in chunks:
+        yield chunk.encode(encoding)
+
+
+def iter_gzip(chunks):
+    """Gzip a stream of byte chunks on the fly (a complete .gz stream)"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def write_chunks(chunks, target):
+    """Write byte chunks to a path or binary file object"""
+    if is_path(target):
+        with open(target, 'wb') as f:
+            write_chunks(chunks, f)
+        return target
+    for chunk in chunks:
+        target.write(chunk)
+    return target
+
+
+@metrics.timed('write_csv')
+def write_csv(df, metadata_rows, target, compress=None, csv_chunks=None):
+    """Stream metadata rows followed by the processed data to a path or file object
+
+    Paths ending in .gz (or compress=True) are gzipped. csv_chunks replaces
+    the rendering from df (e.g. the incremental processor's patched lines).
+    """
+    chunks = csv_chunks if csv_chunks is not None else iter_csv(df, metadata_rows)
+    if isinstance(target, io.TextIOBase):
+        for chunk in chunks:
+            target.write(chunk)
+        return target
+    if compress is None:
+        compress = str(target).lower().endswith('.gz') if is_path(target) else False
+    chunks = iter_encoded(chunks)
+    if compress:
+        chunks = iter_gzip(chunks)
+    return metrics.record_export('csv.gz' if compress else 'csv', write_chunks(chunks, target))
+
+
+@metrics.timed('write_bundle')
+def write_bundle(df, metadata_rows, target, name='agent_performance', csv_chunks=None, excel_file=None,
+                 **excel_options):
+    """Zip of the processed CSV and the styled workbook, each streamed into the archive
+
+    excel_file (bytes or a binary file) reuses a workbook that was already
+    built; otherwise it is written here with save_to_excel(**excel_options).
+    """
+    chunks = csv_chunks if csv_chunks is not None else iter_csv(df, metadata_rows)
+    with zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(f"{name}.csv", 'w') as entry:
+            write_chunks(iter_encoded(chunks), entry)
+
+        # The workbook is already compressed; store it as is
+        info = zipfile.ZipInfo(f"{name}.xlsx", date_time=time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        with archive.open(info, 'w') as entry:
+            if isinstance(excel_file, (bytes, bytearray)):
+                entry.write(excel_file)
+            elif excel_file is not None:
+                excel_file.seek(0)
+                shutil.copyfileobj(excel_file, entry, STREAM_CHUNK_BYTES)
+            else:
+                with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as spool:
+                    save_to_excel(df, metadata_rows, spool, **excel_options)
+                    shutil.copyfileobj(spool, entry, STREAM_CHUNK_BYTES)
+    if hasattr(target, 'seek'):
+        target.seek(0)
+    return metrics.record_export('zip', target)
+
+
+# Excel cell styles, by style code (0 = data cell without highlight)
+STYLE_NONE, STYLE_GREEN, STYLE_ORANGE, STYLE_YELLOW, STYLE_RED, STYLE_DARK_RED = range(6)
+STYLE_COLORS = {
+    STYLE_GREEN: '90EE90',
+    STYLE_ORANGE: 'FFA500',
+    STYLE_YELLOW: 'FFFF00',
+    STYLE_RED: 'FF6B6B',
+    STYLE_DARK_RED: 'DC143C',
+}
+# Style code per inbound band (BAND_NAMES order)
+BAND_STYLES = [STYLE_GREEN, STYLE_ORANGE, STYLE_YELLOW, STYLE_RED]
+
+DEFAULT_SHEET_NAME = 'Agent Performance'
+QUALITY_SHEET_NAME = 'Data Quality'
+
+
+def excel_style_codes(df):
+    """Style code per cell (rows x columns, int8) for the conditional formatting"""
+    codes = np.zeros((len(df), len(df.columns)), dtype=np.int8)
+    for i, col in enumerate(df.columns):
+        if col == 'TOTAL INBOUND CALLS':
+            band = inbound_band_codes(df[col])
+            codes[:, i] = np.where(band >= 0, np.array(BAND_STYLES, dtype=np.int8)[band], STYLE_NONE)
+        elif col == 'TIME':
+            seconds = duration_seconds(df[col]).to_numpy(dtype='float64', na_value=np.nan)
+            codes[:, i] = np.select(
+                [seconds < HD_THRESHOLD_SECONDS, seconds < TIME_RED_THRESHOLD_SECONDS],
+                [STYLE_YELLOW, STYLE_RED], default=STYLE_NONE
+            )
+        elif col in ('PAUSE', 'TOTAL PAUSE'):
+            seconds = duration_seconds(df[col]).to_numpy(dtype='float64', na_value=np.nan)
+            codes[:, i] = np.where(seconds > PAUSE_THRESHOLD_SECONDS, STYLE_DARK_RED, STYLE_NONE)
+        elif col == 'REMARKS':
+            hd = df[col].astype(str).str.strip().str.upper() == 'HD'
+            codes[:, i] = np.where(hd.to_numpy(), STYLE_YELLOW, STYLE_NONE)
+    return codes
+
+
+def excel_rows(df):
+    """Display values per row as plain Python objects (missing and empty values as None)"""
+    display = display_frame(df).astype(object)
+    return list(display.where(display.notna() & (display != ''), None).itertuples(index=False, name=None))
+
+
+def sheet_payload(df):
+    """Everything needed to write one report sheet: header, rows and style codes"""
+    return list(df.columns), excel_rows(df), excel_style_codes(df)
+
+
+def register_formats(cells):
+    """Add the formats of template cells to their workbook's style table; returns their style ids"""
+    # Reading style_id is what adds a cell's format to the workbook
+    return [cell.style_id for cell in cells]
+
+
+class _SheetStyles:
+    """Styled template cells for one write-only worksheet"""
+
+    def __init__(self, ws, columns):
+        self.ws = ws
+        center = Alignment(horizontal='center', vertical='center')
+        black_font = Font(bold=True, color='000000')
+
+        self.metadata = WriteOnlyCell(ws)
+        self.metadata.font = Font(bold=True, size=11)
+        self.metadata.fill = PatternFill(start_color='E8F4F8', end_color='E8F4F8', fill_type='solid')
+
+        self.header = []
+        for _ in columns:
+            cell = WriteOnlyCell(ws)
+            cell.fill = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
+            cell.font = black_font
+            cell.alignment = center
+            self.header.append(cell)
+
+        # One template per (column, style code); each row sets the value and appends
+        self.data = []
+        for _ in columns:
+            by_code = {}
+            for code in range(len(STYLE_COLORS) + 1):
+                cell = WriteOnlyCell(ws)
+                cell.alignment = center
+                if code != STYLE_NONE:
+                    color = STYLE_COLORS[code]
+                    cell.fill = PatternFill(start_color=color, end_color=color, fill_type='solid')
+                    cell.font = black_font
+                by_code[code] = cell
+            self.data.append(by_code)
+
+        self.summary = []
+        for _ in range(2):
+            cell = WriteOnlyCell(ws)
+            cell.font = Font(bold=True, size=12, color='FFFFFF')
+            cell.fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
+            cell.alignment = center
+            cell.border = Border(
+                left=Side(style='thin'),
+                right=Side(style='thin'),
+                top=Side(style='thin'),
+                bottom=Side(style='thin')
+            )
+            self.summary.append(cell)
+
+        # Register every cell format now, in a fixed order: openpyxl numbers them
+        # on first write, and sheets written in separate workbooks (the grouped
+        # export) must end up with the same numbering
+        data_cells = [cell for by_code in self.data for cell in by_code.values()]
+        register_formats([self.metadata] + self.header + data_cells + self.summary)
+
+
+def _with_value(cell, value):
+    cell.value = value
+    return cell
+
+
+def write_report_sheet(wb, title, payload, metadata_rows, summary,
+                       summary_offset=1, average_as_text=False):
+    """Append one styled report sheet (metadata, table, summary rows) to a write-only workbook"""
+    columns, rows, codes = payload
+    ws = wb.create_sheet(title)
+    styles = _SheetStyles(ws, columns)
+
+    # Metadata rows
+    for row in metadata_rows:
+        clean_row = row.strip().replace('\n', '')
+        if clean_row:
+            ws.append([_with_value(styles.metadata, clean_row)])
+
+    # Header and data rows with conditional formatting
+    ws.append([_with_value(cell, name) for cell, name in zip(styles.header, columns)])
+    templates = styles.data
+    for values, row_codes in zip(rows, codes.tolist()):
+        ws.append([_with_value(templates[i][code], value)
+                   for i, (value, code) in enumerate(zip(values, row_codes))])
+
+    # Summary rows below the table (sheets without totals pass no summary)
+    if summary is None:
+        return ws
+    for _ in range(summary_offset):
+        ws.append([])
+    avg_inbound = float(summary.avg_inbound) if summary.inbound_agents else float('nan')
+    summary_values = [
+        ('TOTAL INBOUND CALLS', summary.total_inbound),
+        ('AVERAGE INBOUND CALLS', f"{avg_inbound:.2f}" if average_as_text else round(avg_inbound, 2)),
+    ]
+    for label, value in summary_values:
+        ws.append([_with_value(styles.summary[0], label), _with_value(styles.summary[1], value)])
+    return ws
+
+
+def write_quality_sheet(wb, quality):
+    """Append the data quality report (check, rows, examples) as a plain sheet
+
+    Cells are left unstyled so the sheet adds nothing to the workbook styles
+    (the grouped export checks its worker sheets against them).
+    """
+    ws = wb.create_sheet(QUALITY_SHEET_NAME)
+    ws.append(['CHECK', 'ROWS', 'EXAMPLES'])
+    for row in quality.rows():
+        ws.append(list(row))
+    return ws
+
+
+def save_workbook(wb, target=None):
+    """Save to the target path/file or a fresh BytesIO"""
+    if target is None:
+        target = io.BytesIO()
+    wb.save(target)
+    if hasattr(target, 'seek'):
+        target.seek(0)
+    return target
+
+
+@metrics.timed('save_to_excel')
+def save_to_excel(df, metadata_rows, target=None, summary_offset=1, average_as_text=False, summary=None,
+                  quality=None):
+    """Save data to Excel with metadata and styling
+
+    The web app puts the summary one row below the table with a numeric
+    average; the desktop app leaves an extra empty row and writes the
+    average as text (summary_offset=2, average_as_text=True). A data quality
+    report, when given, gets its own sheet after the report.
+    """
+    # Totals come from the report summary (computed here only if the caller has none)
+    if summary is None:
+        from report_summary import ReportSummary
+        summary = ReportSummary.from_frame(df)
+
+    wb = Workbook(write_only=True)
+    write_report_sheet(wb, DEFAULT_SHEET_NAME, sheet_payload(df), metadata_rows, summary,
+                       summary_offset=summary_offset, average_as_text=average_as_text)
+    if quality is not None:
+        write_quality_sheet(wb, quality)
+    return metrics.record_export('xlsx', save_workbook(wb, target))
@@ -0,0 +1,155 @@
+"""
+Agent Performance Data Processor - Report Summary
+All report statistics computed in one vectorized pass, mergeable across chunks and refreshes
+"""
+
+import numpy as np
+import pandas as pd
+import report_pipeline
+
+# Inbound call percentiles reported alongside the totals
+INBOUND_PERCENTILES = (25, 50, 75, 90)
+
+
+def _histogram(values):
+    """Value -> count for the non-missing integers of a column"""
+    values = pd.to_numeric(values, errors='coerce').dropna()
+    return values.astype('int64').value_counts().sort_index()
+
+
+def _percentile(histogram, q):
+    """q-th percentile of a value histogram (numpy's linear interpolation)"""
+    total = int(histogram.sum()) if len(histogram) else 0
+    if total == 0:
+        return None
+    values = histogram.index.to_numpy()
+    cumulative = histogram.to_numpy().cumsum()
+    position = (total - 1) * q / 100
+    lower = values[np.searchsorted(cumulative, int(np.floor(position)), side='right')]
+    upper = values[np.searchsorted(cumulative, int(np.ceil(position)), side='right')]
+    return float(lower + (upper - lower) * (position - np.floor(position)))
+
+
+def _combine(left, right, sign):
+    combined = left.add(sign * right, fill_value=0)
+    return combined[combined > 0].astype('int64')
+
+
+class ReportSummary:
+    """Totals, band distribution, HD count and distribution stats of a processed report
+
+    Counts and sums are additive and the inbound / talk time distributions are
+    kept as value histograms, so summaries of chunks (or of the rows leaving and
+    entering an incremental refresh) combine exactly with + and -.
+    """
+
+    def __init__(self):
+        self.total_agents = 0
+        self.inbound_agents = 0        # agents with a numeric TOTAL INBOUND CALLS
+        self.total_inbound = 0
+        self.total_outbound = 0
+        self.hd_count = 0
+        self.band_counts = {band: 0 for band in report_pipeline.BAND_NAMES}
+        self.band_inbound = {band: 0 for band in report_pipeline.BAND_NAMES}
+        self.inbound_histogram = pd.Series(dtype='int64')
+        self.talk_histogram = pd.Series(dtype='int64')
+        # Set from the sorted frame (first row), not combined
+        self.top_performer = None
+        self.top_inbound = None
+
+    @classmethod
+    def from_frame(cls, df):
+        """Summarise a processed frame; the top performer is its first row when sorted"""
+        summary = cls()
+        summary.total_agents = len(df)
+
+        if 'TOTAL INBOUND CALLS' in df.columns:
+            inbound = pd.to_numeric(df['TOTAL INBOUND CALLS'], errors='coerce').to_numpy(dtype=float)
+            known = ~np.isnan(inbound)
+            summary.inbound_agents = int(known.sum())
+            summary.total_inbound = int(inbound[known].sum())
+
+            # Band counts and per-band sums in one bincount each
+            codes = report_pipeline.inbound_band_codes(inbound)[known]
+            weights = inbound[known]
+            counts = np.bincount(codes, minlength=len(report_pipeline.BAND_NAMES))
+            sums = np.bincount(codes, weights=weights, minlength=len(report_pipeline.BAND_NAMES))
+            for i, band in enumerate(report_pipeline.BAND_NAMES):
+                summary.band_counts[band] = int(counts[i])
+                summary.band_inbound[band] = int(sums[i])
+            summary.inbound_histogram = _histogram(df['TOTAL INBOUND CALLS'])
+
+        if 'TOTAL OUTBOUND CALLS' in df.columns:
+            summary.total_outbound = int(pd.to_numeric(df['TOTAL OUTBOUND CALLS'], errors='coerce').fillna(0).sum())
+        if 'REMARKS' in df.columns:
+            summary.hd_count = int((df['REMARKS'] == 'HD').sum())
+        if 'TALK' in df.columns:
+            summary.talk_histogram = _histogram(report_pipeline.duration_seconds(df['TALK']))
+
+        summary.set_top_performer(df)
+        return summary
+
+    def set_top_performer(self, df):
+        """Take the top performer from the first row of a sorted frame"""
+        self.top_performer = None
+        self.top_inbound = None
+        if len(df) > 0 and 'USER NAME' in df.columns and 'TOTAL INBOUND CALLS' in df.columns:
+            first = df.iloc[0]
+            self.top_performer = first['USER NAME']
+            if pd.notna(first['TOTAL INBOUND CALLS']):
+                self.top_inbound = int(first['TOTAL INBOUND CALLS'])
+        return self
+
+    def _combined(self, other, sign):
+        summary = ReportSummary()
+        for name in ('total_agents', 'inbound_agents', 'total_inbound', 'total_outbound', 'hd_count'):
+            setattr(summary, name, getattr(self, name) + sign * getattr(other, name))
+        for band in report_pipeline.BAND_NAMES:
+            summary.band_counts[band] = self.band_counts[band] + sign * other.band_counts[band]
+            summary.band_inbound[band] = self.band_inbound[band] + sign * other.band_inbound[band]
+        summary.inbound_histogram = _combine(self.inbound_histogram, other.inbound_histogram, sign)
+        summary.talk_histogram = _combine(self.talk_histogram, other.talk_histogram, sign)
+        return summary
+
+    def __add__(self, other):
+        """Summary of two disjoint sets of rows (e.g. chunks)"""
+        return self._combined(other, 1)
+
+    def __sub__(self, other):
+        """Summary with a subset of rows taken out"""
+        return self._combined(other, -1)
+
+    @property
+    def avg_inbound(self):
+        return self.total_inbound / self.inbound_agents if self.inbound_agents else 0.0
+
+    def band_average(self, band):
+        """Average inbound calls of the agents in one band"""
+        count = self.band_counts[band]
+        return self.band_inbound[band] / count if count else 0.0
+
+    def inbound_percentile(self, q):
+        return _percentile(self.inbound_histogram, q)
+
+    @property
+    def median_talk_seconds(self):
+        return _percentile(self.talk_histogram, 50)
+
+    def as_dict(self):
+        """Plain values for JSON and logging"""
+        values = {
+            'total_agents': self.total_agents,
+            'total_inbound': self.total_inbound,
+            'total_outbound': self.total_outbound,
+            'avg_inbound': round(self.avg_inbound, 2),
+            'hd_count': self.hd_count,
+            'top_performer': None if self.top_performer is None else str(self.top_performer),
+            'top_inbound': self.top_inbound,
+            'median_talk_seconds': self.median_talk_seconds,
+        }
+        for band in report_pipeline.BAND_NAMES:
+            values[band] = self.band_counts[band]
+            values[f'{band}_avg_inbound'] = round(self.band_average(band), 2)
+        for q in INBOUND_PERCENTILES:
+            values[f'inbound_p{q}'] = self.inbound_percentile(q)
+        return values
@@ -6,12 +6,33 @@ Processes agent performance CSV files with styling and exports to Excel
 import streamlit as st
 import pandas as pd
 import io
+import os
+import uuid
+import hashlib
 import warnings
-from openpyxl import load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+import report_pipeline
+import grouped_export
+import columnar_export
+import campaign_merge
+import period_comparison
+import processing_service
+import html_report
+import metrics
+from datetime import timedelta
+from job_pool import JobPool, estimate_rows
+from incremental_refresh import IncrementalProcessor, RefreshResult
+from report_summary import ReportSummary
+from performance_store import PerformanceStore, extract_report_date
+from agent_search import AgentSearchIndex
 
 warnings.filterwarnings('ignore')
 
+# Matching agents listed by the agent search (the full table is below it)
+SEARCH_RESULT_ROWS = 200
+
+# Dialer exports accepted by the uploaders (workbooks are read like CSVs)
+UPLOAD_TYPES = ['csv', 'xlsx']
+
 # Page config
 st.set_page_config(
     page_title="Agent Performance Processor",
@@ -68,386 +89,315 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-def load_and_clean_data(file):
-    """Load CSV and perform initial cleaning"""
-    try:
-        # Read file content
-        content = file.read().decode('utf-8', errors='ignore')
-        lines = content.split('\n')
-        
-        # Find the row that contains 'USER NAME' (the actual header)
-        header_row = 0
-        for i, line in enumerate(lines):
-            if 'USER NAME' in line.upper():
-                header_row = i
-                break
-        
-        # Store ALL rows before the header as metadata
-        metadata_rows = [line + '\n' for line in lines[:header_row] if line.strip()]
-        
-        # Create StringIO for pandas to read
-        data_content = '\n'.join(lines[header_row:])
-        df = pd.read_csv(io.StringIO(data_content), on_bad_lines='skip', engine='python')
-        
-        # Columns to remove
-        columns_to_delete = [
-            'CURRENT USER GROUP', 'MOST RECENT USER GROUP', 'PAUSAVG', 'WAITAVG',
-            'TALKAVG', 'DISPAVG', 'DEADAVG', 'CUSTAVG', 'ANS', 'SSMS', 'REDIAL',
-            'test', 'testne', 'TestIT', 'TESTNC', 'TESTCB', 'Test22', 'DUPLICATE CALLS'
-        ]
-        
-        # Drop columns (ignore if they don't exist)
-        df = df.drop(columns=[col for col in columns_to_delete if col in df.columns], errors='ignore')
-        
-        # Remove last row (typically totals/summary)
-        if len(df) > 0:
-            df = df.iloc[:-1]
-        
-        return df, metadata_rows
-    except Exception as e:
-        st.error(f"Error loading file: {str(e)}")
-        return None, None
+@st.cache_resource
+def get_job_pool():
+    """Process-wide bounded pool shared by all sessions"""
+    return JobPool()
 
-def process_time_columns(df):
-    """Calculate total pause time from PAUSE, DEAD, and DISPO columns"""
-    try:
-        # Convert time columns to timedelta
-        df['TOTAL PAUSE'] = (
-            pd.to_timedelta(df['PAUSE'], errors='coerce').fillna(pd.Timedelta(0)) +
-            pd.to_timedelta(df['DEAD'], errors='coerce').fillna(pd.Timedelta(0)) +
-            pd.to_timedelta(df['DISPO'], errors='coerce').fillna(pd.Timedelta(0))
-        )
-        
-        # Format as HH:MM:SS
-        df['TOTAL PAUSE'] = df['TOTAL PAUSE'].apply(
-            lambda x: f"{int(x.total_seconds() // 3600):02d}:"
-                      f"{int((x.total_seconds() % 3600) // 60):02d}:"
-                      f"{int(x.total_seconds() % 60):02d}"
-            if pd.notna(x) else "00:00:00"
-        )
-        
-        return df
-    except Exception as e:
-        st.warning(f"Warning processing time columns: {str(e)}")
-        return df
+def get_session_id():
+    """Stable id of this browser session for fair scheduling"""
+    if 'session_id' not in st.session_state:
+        st.session_state['session_id'] = uuid.uuid4().hex
+    return st.session_state['session_id']
 
-def reorder_and_sort(df):
-    """Reorder columns and sort by total inbound calls"""
+def run_in_job_pool(label, fn, *args, estimated_rows=0, **kwargs):
+    """Run a pipeline step on the shared pool, showing the queue position while waiting"""
+    ticket = get_job_pool().submit(get_session_id(), fn, *args, estimated_rows=estimated_rows, **kwargs)
+    status_box = st.empty()
     try:
-        # Convert ID to integer
-        df['ID'] = pd.to_numeric(df['ID'], errors='coerce').fillna(0).astype(int)
-        
-        # Sort by total inbound calls (descending)
-        if 'TOTAL INBOUND CALLS' in df.columns:
-            df = df.sort_values(by='TOTAL INBOUND CALLS', ascending=False)
-        
-        # Reset index starting from 1
-        df = df.reset_index(drop=True)
-        df.index = df.index + 1
-        
-        # Reorder columns with ID first
-        desired_columns = [
-            'ID', 'USER NAME', 'CALLS', 'TIME', 'PAUSE', 'WAIT', 'TALK',
-            'DISPO', 'DEAD', 'TOTAL PAUSE', 'CUSTOMER',
-            'TOTAL INBOUND CALLS', 'TOTAL OUTBOUND CALLS'
-        ]
-        
-        # Only include columns that exist
-        existing_cols = [col for col in desired_columns if col in df.columns]
-        df = df[existing_cols]
-        
-        # Add Remarks column as the last column
-        df['REMARKS'] = ''
-        
-        # Add 'HD' in REMARKS if login hour (TIME) is less than 7 hours
-        if 'TIME' in df.columns:
-            for idx in df.index:
-                try:
-                    time_val = pd.to_timedelta(df.loc[idx, 'TIME'])
-                    if time_val < pd.to_timedelta('7:00:00'):
-                        df.loc[idx, 'REMARKS'] = 'HD'
-                except:
-                    pass
-        
-        return df
-    except Exception as e:
-        st.warning(f"Warning reordering columns: {str(e)}")
-        return df
+        while not ticket.wait(0.25):
+            position = ticket.position()
+            if position:
+                status_box.info(f"{label}: queued, position {position}")
+            else:
+                status_box.info(f"{label}: running...")
+        return ticket.result()
+    finally:
+        # A rerun stops this script; don't leave its job waiting in the queue
+        ticket.cancel()
+        status_box.empty()
 
-def apply_styling_to_dataframe(df):
-    """Apply conditional formatting for display"""
-    try:
-        def color_row(row):
-            styles = [''] * len(row)
-            
-            # Get column names
-            cols = row.index.tolist()
-            
-            # Color TOTAL INBOUND CALLS
-            if 'TOTAL INBOUND CALLS' in cols:
-                idx = cols.index('TOTAL INBOUND CALLS')
-                try:
-                    val = float(row['TOTAL INBOUND CALLS'])
-                    if val >= 70:
-                        styles[idx] = 'background-color: #90EE90; color: black; font-weight: bold'
-                    elif val >= 60:
-                        styles[idx] = 'background-color: #FFA500; color: black; font-weight: bold'
-                    elif val >= 50:
-                        styles[idx] = 'background-color: #FFFF00; color: black; font-weight: bold'
-                    else:
-                        styles[idx] = 'background-color: #FF6B6B; color: black; font-weight: bold'
-                except:
-                    pass
-            
-            # Color TIME
-            if 'TIME' in cols:
-                idx = cols.index('TIME')
-                try:
-                    td_val = pd.to_timedelta(row['TIME'])
-                    threshold_red = pd.to_timedelta('8:45:00')
-                    threshold_hd = pd.to_timedelta('7:00:00')
-                    
-                    if td_val < threshold_hd:
-                        styles[idx] = 'background-color: #FFFF00; color: black; font-weight: bold'
-                    elif td_val < threshold_red:
-                        styles[idx] = 'background-color: #FF6B6B; color: black; font-weight: bold'
-                except:
-                    pass
-            
-            # Color PAUSE - Dark red background with black text
-            if 'PAUSE' in cols:
-                idx = cols.index('PAUSE')
-                try:
-                    td_val = pd.to_timedelta(row['PAUSE'])
-                    threshold = pd.to_timedelta('2:00:00')
-                    if td_val > threshold:
-                        styles[idx] = 'background-color: #DC143C; color: black; font-weight: bold'
-                except:
-                    pass
-            
-            # Color TOTAL PAUSE - Dark red background with black text
-            if 'TOTAL PAUSE' in cols:
-                idx = cols.index('TOTAL PAUSE')
-                try:
-                    td_val = pd.to_timedelta(row['TOTAL PAUSE'])
-                    threshold = pd.to_timedelta('2:00:00')
-                    if td_val > threshold:
-                        styles[idx] = 'background-color: #DC143C; color: black; font-weight: bold'
-                except:
-                    pass
-            
-            # Color REMARKS - Yellow if HD
-            if 'REMARKS' in cols:
-                idx = cols.index('REMARKS')
-                if str(row['REMARKS']).strip().upper() == 'HD':
-                    styles[idx] = 'background-color: #FFFF00; color: black; font-weight: bold'
-            
-            return styles
-        
-        styled_df = df.style.apply(color_row, axis=1).set_properties(**{'text-align': 'center'})
-        return styled_df
-    except Exception as e:
-        st.warning(f"Warning applying styles: {str(e)}")
-        return df
+def get_incremental_processor():
+    """Per-session processor that patches re-uploaded refreshes of the same report"""
+    if 'incremental_processor' not in st.session_state:
+        st.session_state['incremental_processor'] = IncrementalProcessor(max_reports=2)
+    return st.session_state['incremental_processor']
+
+def show_agent_search(df, processor):
+    """Find agents by part of the name or the start of the ID (index built once per report version)"""
+    query = st.text_input("🔍 Find agent", placeholder="Part of a name or the start of an ID", key='agent_search')
+    if not query.strip():
+        return
+    index = processor.cached_output('search_index', lambda: AgentSearchIndex.from_frame(df))
+    rows = index.search(query)
+    st.caption(f"{len(rows):,} of {len(df):,} agents match"
+               + (f" (first {SEARCH_RESULT_ROWS} shown)" if len(rows) > SEARCH_RESULT_ROWS else ""))
+    if len(rows):
+        matches = html_report.html_text(df.iloc[rows[:SEARCH_RESULT_ROWS]], full_page=False)
+        st.markdown(matches, unsafe_allow_html=True)
 
-def save_to_excel(df, metadata_rows):
+def save_to_excel(df, metadata_rows, summary=None, quality=None):
     """Save data to Excel with metadata and styling"""
     try:
-        output = io.BytesIO()
-        
-        # Create initial Excel file
-        num_metadata_rows = len(metadata_rows)
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, startrow=num_metadata_rows, sheet_name='Agent Performance')
-        
-        # Load and modify workbook
-        output.seek(0)
-        wb = load_workbook(output)
-        ws = wb.active
-        
-        # Get the current header row
-        header_row_num = num_metadata_rows + 1
-        
-        # Collect all data rows
-        data_rows = []
-        for row in ws.iter_rows(min_row=header_row_num, values_only=False):
-            data_rows.append(row)
-        
-        # Delete all rows from header onwards
-        if ws.max_row >= header_row_num:
-            ws.delete_rows(header_row_num, ws.max_row - header_row_num + 1)
-        
-        # Add metadata rows
-        metadata_style = Font(bold=True, size=11)
-        metadata_fill = PatternFill(start_color='E8F4F8', end_color='E8F4F8', fill_type='solid')
-        
-        current_row = 1
-        for row in metadata_rows:
-            clean_row = row.strip().replace('\n', '')
-            if clean_row:
-                ws.cell(row=current_row, column=1, value=clean_row)
-                ws.cell(row=current_row, column=1).font = metadata_style
-                ws.cell(row=current_row, column=1).fill = metadata_fill
-                current_row += 1
-        
-        # Add data table with styling
-        header_fill = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
-        header_font = Font(bold=True, color='000000')
-        
-        # Color definitions for conditional formatting
-        green_fill = PatternFill(start_color='90EE90', end_color='90EE90', fill_type='solid')
-        orange_fill = PatternFill(start_color='FFA500', end_color='FFA500', fill_type='solid')
-        yellow_fill = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
-        red_fill = PatternFill(start_color='FF6B6B', end_color='FF6B6B', fill_type='solid')
-        dark_red_fill = PatternFill(start_color='DC143C', end_color='DC143C', fill_type='solid')
-        black_font = Font(bold=True, color='000000')
-        
-        header_row_idx = None
-        for idx, row_data in enumerate(data_rows):
-            is_header_row = (idx == 0)
-            if is_header_row:
-                header_row_idx = current_row
-            
-            for col_idx, cell in enumerate(row_data, start=1):
-                new_cell = ws.cell(row=current_row, column=col_idx)
-                if cell.value is not None:
-                    new_cell.value = cell.value
-                
-                if is_header_row:
-                    new_cell.fill = header_fill
-                    new_cell.font = header_font
-                else:
-                    # Get column name from header
-                    col_name = ws.cell(row=header_row_idx, column=col_idx).value
-                    
-                    # Apply conditional formatting
-                    if col_name == 'TOTAL INBOUND CALLS':
-                        try:
-                            val = float(new_cell.value)
-                            if val >= 70:
-                                new_cell.fill = green_fill
-                                new_cell.font = black_font
-                            elif val >= 60:
-                                new_cell.fill = orange_fill
-                                new_cell.font = black_font
-                            elif val >= 50:
-                                new_cell.fill = yellow_fill
-                                new_cell.font = black_font
-                            else:
-                                new_cell.fill = red_fill
-                                new_cell.font = black_font
-                        except:
-                            pass
-                    
-                    elif col_name == 'TIME':
-                        try:
-                            td_val = pd.to_timedelta(new_cell.value)
-                            threshold_red = pd.to_timedelta('8:45:00')
-                            threshold_hd = pd.to_timedelta('7:00:00')
-                            
-                            if td_val < threshold_hd:
-                                new_cell.fill = yellow_fill
-                                new_cell.font = black_font
-                            elif td_val < threshold_red:
-                                new_cell.fill = red_fill
-                                new_cell.font = black_font
-                        except:
-                            pass
-                    
-                    elif col_name in ['PAUSE', 'TOTAL PAUSE']:
-                        try:
-                            td_val = pd.to_timedelta(new_cell.value)
-                            threshold = pd.to_timedelta('2:00:00')
-                            if td_val > threshold:
-                                new_cell.fill = dark_red_fill
-                                new_cell.font = black_font
-                        except:
-                            pass
-                    
-                    elif col_name == 'REMARKS':
-                        if str(new_cell.value).strip().upper() == 'HD':
-                            new_cell.fill = yellow_fill
-                            new_cell.font = black_font
-                
-                new_cell.alignment = Alignment(horizontal='center', vertical='center')
-            current_row += 1
-        
-        # Add summary row below the table
-        summary_row = current_row + 1
-        
-        # Calculate totals
-        total_inbound = int(df['TOTAL INBOUND CALLS'].sum())
-        avg_inbound = float(df['TOTAL INBOUND CALLS'].mean())
-        
-        # Style for summary
-        summary_font = Font(bold=True, size=12, color='FFFFFF')
-        summary_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # Add summary labels and values
-        ws.cell(row=summary_row, column=1, value='TOTAL INBOUND CALLS')
-        ws.cell(row=summary_row, column=1).font = summary_font
-        ws.cell(row=summary_row, column=1).fill = summary_fill
-        ws.cell(row=summary_row, column=1).alignment = Alignment(horizontal='center', vertical='center')
-        ws.cell(row=summary_row, column=1).border = border
-        
-        ws.cell(row=summary_row, column=2, value=total_inbound)
-        ws.cell(row=summary_row, column=2).font = summary_font
-        ws.cell(row=summary_row, column=2).fill = summary_fill
-        ws.cell(row=summary_row, column=2).alignment = Alignment(horizontal='center', vertical='center')
-        ws.cell(row=summary_row, column=2).border = border
-        
-        ws.cell(row=summary_row + 1, column=1, value='AVERAGE INBOUND CALLS')
-        ws.cell(row=summary_row + 1, column=1).font = summary_font
-        ws.cell(row=summary_row + 1, column=1).fill = summary_fill
-        ws.cell(row=summary_row + 1, column=1).alignment = Alignment(horizontal='center', vertical='center')
-        ws.cell(row=summary_row + 1, column=1).border = border
-        
-        ws.cell(row=summary_row + 1, column=2, value=round(avg_inbound, 2))
-        ws.cell(row=summary_row + 1, column=2).font = summary_font
-        ws.cell(row=summary_row + 1, column=2).fill = summary_fill
-        ws.cell(row=summary_row + 1, column=2).alignment = Alignment(horizontal='center', vertical='center')
-        ws.cell(row=summary_row + 1, column=2).border = border
-        
-        # Save to BytesIO
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-        
-        return output
+        return report_pipeline.save_to_excel(df, metadata_rows, summary=summary, quality=quality)
     except Exception as e:
         st.error(f"Error creating Excel file: {str(e)}")
         return None
 
+@st.cache_resource
+def start_metrics():
+    """Metrics endpoint and/or file (AGENT_PERF_METRICS_PORT / AGENT_PERF_METRICS_FILE), once per server"""
+    return metrics.start_from_env()
+
+@st.cache_resource
+def get_history_store():
+    """Shared historical store for all sessions"""
+    return PerformanceStore()
+
+def show_history_section(df=None, metadata_rows=None, source_name=None, summary=None, groups=None):
+    """Save processed reports to history and query agent trends"""
+    st.markdown("---")
+    st.subheader("🗄️ Performance History")
+    
+    store = get_history_store()
+    
+    # Save the current report
+    if df is not None:
+        report_date = st.date_input(
+            "Report date",
+            value=extract_report_date(metadata_rows),
+            help="Detected from the file header rows when available"
+        )
+        if st.button("Save report to history"):
+            store.ingest_report(df, metadata_rows, report_date=report_date, source_name=source_name, summary=summary,
+                                groups=groups)
+            st.success(f"Saved {len(df)} agents for {report_date} to history")
+    
+    # Query stored history
+    with st.expander("Agent trend and team totals", expanded=False):
+        col1, col2 = st.columns(2)
+        with col1:
+            agent_id = st.number_input("Agent ID", min_value=0, step=1, value=0)
+        with col2:
+            days = st.number_input("Days", min_value=1, max_value=366, value=30)
+        
+        if agent_id:
+            history = store.agent_history(agent_id, days=days)
+            if len(history) > 0:
+                st.line_chart(history.set_index('report_date')[['inbound', 'outbound']])
+                st.dataframe(history, use_container_width=True)
+            else:
+                st.info(f"No history for agent {agent_id} in the last {days} days")
+        
+        totals = store.team_daily_totals()
+        if len(totals) > 0:
+            st.markdown("**Team inbound totals per day**")
+            by_team = totals.pivot_table(index='report_date', columns='team', values='total_inbound', aggfunc='sum')
+            st.bar_chart(by_team)
+
+def process_previous(uploaded_files):
+    """Processed earlier report to compare with: one export as is, several added up per agent"""
+    digest = hashlib.sha1(b''.join(hashlib.sha1(f.getvalue()).digest() for f in uploaded_files)).hexdigest()
+    cached = st.session_state.get('previous_report')
+    if cached and cached[0] == digest:
+        return cached[1]
+    
+    estimated_rows = sum(estimate_rows(f.getvalue()) for f in uploaded_files)
+    if len(uploaded_files) == 1:
+        previous = run_in_job_pool("Processing earlier export", report_pipeline.process_report,
+                                   uploaded_files[0].getvalue(), estimated_rows=estimated_rows)[0]
+    else:
+        previous = run_in_job_pool("Merging earlier exports", campaign_merge.merge_reports, uploaded_files,
+                                   estimated_rows=estimated_rows).df
+    st.session_state['previous_report'] = (digest, previous)
+    return previous
+
+def show_comparison_section(df=None, source_name=None):
+    """Compare the processed report with earlier exports, or two periods from history"""
+    st.markdown("---")
+    st.subheader("📈 Period Comparison")
+    
+    store = get_history_store()
+    upload_choice = "This report against earlier exports"
+    choices = ([upload_choice] if df is not None else []) + ["Two periods from history"]
+    choice = st.radio("Compare", choices, horizontal=True)
+    
+    comparison = None
+    if choice == upload_choice:
+        previous_files = st.file_uploader(
+            "Upload the earlier export(s)",
+            type=UPLOAD_TYPES,
+            accept_multiple_files=True,
+            key='previous_files',
+            help="Several files (e.g. every day of last week) are added up per agent"
+        )
+        if previous_files:
+            previous = process_previous(previous_files)
+            previous_name = ', '.join(f.name for f in previous_files) if len(previous_files) <= 3 \
+                else f"{len(previous_files)} exports"
+            comparison = period_comparison.compare_reports(df, previous, source_name or "this report", previous_name)
+    else:
+        dates = store.report_dates()
+        if not dates:
+            st.info("Save reports to history to compare stored days, weeks or months")
+            return
+        
+        # Default: the last stored week against the week before
+        last = pd.Timestamp(dates[-1]).date()
+        col1, col2 = st.columns(2)
+        with col1:
+            current_period = st.date_input("Period", value=(last - timedelta(days=6), last), key='current_period')
+        with col2:
+            previous_period = st.date_input("Compared with", value=(last - timedelta(days=13), last - timedelta(days=7)),
+                                            key='previous_period')
+        if len(current_period) == 2 and len(previous_period) == 2:
+            comparison = period_comparison.compare_reports(
+                store.period_report(*current_period), store.period_report(*previous_period),
+                f"{current_period[0]} to {current_period[1]}", f"{previous_period[0]} to {previous_period[1]}"
+            )
+    
+    if comparison is None:
+        return
+    st.markdown('\n'.join(f"- {line}" for line in comparison.lines()))
+    st.dataframe(comparison.display_frame(), use_container_width=True)
+    st.download_button(
+        label="Download Comparison Excel",
+        data=lambda: comparison.save_excel().getvalue(),
+        file_name="agent_performance_comparison.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+
+class RemoteReport:
+    """Outputs of a processing-service job, used like IncrementalProcessor"""
+    
+    def __init__(self, csv_data, excel_data):
+        self.csv_data = csv_data
+        self.excel_data = excel_data
+        self.outputs = {}
+    
+    def iter_csv(self):
+        yield self.csv_data
+    
+    def group_labels(self):
+        # The service returns the processed report without teams
+        return None
+    
+    def cached_output(self, name, builder):
+        if name == 'xlsx':
+            return self.excel_data
+        if name not in self.outputs:
+            self.outputs[name] = builder()
+        return self.outputs[name]
+
+def process_via_service(uploaded_file, service_url):
+    """Submit the upload to the local processing service and wait for its results"""
+    data = uploaded_file.getvalue()
+    digest = hashlib.sha1(data).hexdigest()
+    cached = st.session_state.get('remote_report')
+    if cached and cached[0] == digest:
+        return cached[1], cached[2]
+    
+    status_box = st.empty()
+    def show_status(status):
+        if status['status'] == 'queued':
+            status_box.info(f"Queued, position {status['position']}")
+        elif status['status'] == 'running':
+            status_box.info("Processing on the server...")
+    
+    job = processing_service.submit_file(service_url, data, filename=uploaded_file.name)
+    status = processing_service.wait_for_job(service_url, job['job_id'], on_status=show_status)
+    status_box.empty()
+    if status['status'] != 'done':
+        raise RuntimeError(status.get('error', 'processing failed'))
+    
+    csv_data = processing_service.fetch_result(service_url, job['job_id'], 'csv').decode('utf-8')
+    excel_data = processing_service.fetch_result(service_url, job['job_id'], 'xlsx')
+    
+    # Rebuild the processed frame for display from the returned CSV
+    metadata_rows, data_content = report_pipeline.split_preamble(csv_data)
+    df = report_pipeline.compact_frame(pd.read_csv(io.StringIO(data_content)))
+    df.index = df.index + 1
+    
+    summary = ReportSummary.from_frame(df)
+    result = RefreshResult(df, metadata_rows, summary, 'remote', len(df))
+    report = RemoteReport(csv_data, excel_data)
+    st.session_state['remote_report'] = (digest, report, result)
+    return report, result
+
+def process_merge(uploaded_files, log):
+    """Merge several campaign exports into one report (kept across reruns until the files change)"""
+    digest = hashlib.sha1(b''.join(hashlib.sha1(f.getvalue()).digest() for f in uploaded_files)).hexdigest()
+    cached = st.session_state.get('merged_report')
+    if cached and cached[0] == digest:
+        return cached[1]
+    
+    estimated_rows = sum(estimate_rows(f.getvalue()) for f in uploaded_files)
+    report = run_in_job_pool("Merging exports", campaign_merge.merge_reports, uploaded_files,
+                             estimated_rows=estimated_rows, log=log)
+    st.session_state['merged_report'] = (digest, report)
+    return report
+
 # Main Streamlit App
 def main():
+    start_metrics()
+    
     # Main content header
     st.markdown('<h2 class="main-header">Upload and Process Your Agent Performance Data</h2>', unsafe_allow_html=True)
     
-    # File uploader
-    uploaded_file = st.file_uploader(
-        "Upload your Agent Performance CSV file",
-        type=['csv'],
-        help="Select the CSV file containing agent performance data"
+    # File uploader (several files when merging the campaigns of one day)
+    merge_mode = st.checkbox(
+        "Merge several campaign exports for the same day",
+        help="Agents in more than one export get one row with their calls and times added up"
     )
+    if merge_mode:
+        uploaded_files = st.file_uploader(
+            "Upload the campaign exports (CSV or XLSX)",
+            type=UPLOAD_TYPES,
+            accept_multiple_files=True,
+            help="Select the exports of every campaign for the day"
+        )
+        uploaded_file = uploaded_files[0] if uploaded_files else None
+    else:
+        uploaded_file = st.file_uploader(
+            "Upload your Agent Performance file",
+            type=UPLOAD_TYPES,
+            help="Select the CSV or XLSX export containing agent performance data"
+        )
     
     if uploaded_file is not None:
+        source_name = ', '.join(f.name for f in uploaded_files) if merge_mode else uploaded_file.name
         try:
             with st.spinner('Processing data...'):
-                # Load and process data
-                df, metadata_rows = load_and_clean_data(uploaded_file)
-                
-                if df is None:
-                    st.error("Failed to load data. Please check your CSV file format.")
+                # Load and process data (only changed agents on a refreshed export),
+                # or hand it to the local processing service when one is configured
+                service_url = os.environ.get('AGENT_PERF_SERVICE_URL')
+                pipeline_log = []
+                try:
+                    if merge_mode:
+                        processor = process_merge(uploaded_files, pipeline_log.append)
+                        result = processor.result
+                    elif service_url:
+                        processor, result = process_via_service(uploaded_file, service_url)
+                    else:
+                        processor = get_incremental_processor()
+                        data = uploaded_file.getvalue()
+                        estimated_rows = estimate_rows(data)
+                        result = run_in_job_pool("Processing", processor.process, data,
+                                                 estimated_rows=estimated_rows, log=pipeline_log.append)
+                except Exception as e:
+                    st.error(f"Error loading file: {str(e)}")
+                    st.error("Failed to load data. Please check your file format.")
                     return
                 
-                df = process_time_columns(df)
-                df = reorder_and_sort(df)
+                df, metadata_rows, summary = result.df, result.metadata_rows, result.summary
+                estimated_rows = len(df)
+                if result.mode == 'incremental':
+                    st.caption(f"Refreshed export detected: recomputed {result.changed} changed agents")
+                elif result.mode == 'merged':
+                    st.caption(f"Merged {len(processor.names)} exports into {result.changed} agents")
+                for message in pipeline_log:
+                    if message.startswith('Malformed'):
+                        st.warning(message)
                 
                 # Display metadata
                 st.subheader("📋 File Information")
@@ -464,15 +414,15 @@ def main():
                 # Display summary
                 col1, col2, col3 = st.columns(3)
                 with col1:
-                    st.metric("Total Agents", len(df))
+                    st.metric("Total Agents", summary.total_agents)
                 with col2:
-                    st.metric("Total Inbound Calls", f"{int(df['TOTAL INBOUND CALLS'].sum()):,}")
+                    st.metric("Total Inbound Calls", f"{summary.total_inbound:,}")
                 with col3:
-                    st.metric("Avg Inbound Calls", f"{df['TOTAL INBOUND CALLS'].mean():.2f}")
+                    st.metric("Avg Inbound Calls", f"{summary.avg_inbound:.2f}")
                 
                 # Display top performer
-                if len(df) > 0:
-                    st.success(f"Top Performer: **{df.iloc[0]['USER NAME']}** with **{int(df.iloc[0]['TOTAL INBOUND CALLS'])}** calls")
+                if summary.top_performer is not None:
+                    st.success(f"Top Performer: **{summary.top_performer}** with **{summary.top_inbound}** calls")
                 
                 st.markdown("---")
                 
@@ -488,40 +438,74 @@ def main():
 """
                 st.markdown(color_legend)
                 
-                # Apply styling and display
-                styled_df = apply_styling_to_dataframe(df)
+                show_agent_search(df, processor)
                 
-                # Use HTML rendering for better color support
-                html = styled_df.to_html(escape=False)
+                # Apply styling and display (built once per report version): highlights are CSS
+                # classes defined once rather than inline styles per cell
+                def build_html():
+                    return html_report.html_text(df, full_page=False)
+                
+                html = processor.cached_output(
+                    'html', lambda: run_in_job_pool("Styling table", build_html, estimated_rows=estimated_rows)
+                )
                 st.markdown(html, unsafe_allow_html=True)
                 
+                # What cleaning skipped, blanked or zeroed (checked column-wise during processing)
+                quality = result.quality
+                if quality is not None:
+                    issues = quality.issues()
+                    label = f"🔎 Data quality: {quality.issue_count} rows flagged" if issues else "🔎 Data quality: no issues"
+                    with st.expander(label, expanded=False):
+                        st.dataframe(quality.frame(), use_container_width=True, hide_index=True)
+                
+                with st.expander("🧮 Memory footprint"):
+                    st.dataframe(report_pipeline.memory_footprint(df), use_container_width=True)
+                
                 # Generate Excel file
-                excel_file = save_to_excel(df, metadata_rows)
+                def build_excel():
+                    excel_file = save_to_excel(df, metadata_rows, summary, quality)
+                    return excel_file.getvalue() if excel_file else None
+                
+                excel_file = processor.cached_output(
+                    'xlsx', lambda: run_in_job_pool("Building Excel file", build_excel, estimated_rows=estimated_rows)
+                )
                 
                 if excel_file:
                     # Download buttons
                     st.markdown("---")
                     st.subheader("📥 Download Processed Files")
                     
-                    col1, col2 = st.columns(2)
+                    # Files are built when a button is clicked, CSV rows streamed in chunks
+                    def build_csv_gzip():
+                        data = b''.join(report_pipeline.iter_gzip(report_pipeline.iter_encoded(processor.iter_csv())))
+                        return metrics.record_export('csv.gz', data)
+                    
+                    def build_bundle():
+                        return report_pipeline.write_bundle(
+                            df, metadata_rows, io.BytesIO(), name="agent_performance",
+                            csv_chunks=processor.iter_csv(), excel_file=excel_file
+                        )
+                    
+                    col1, col2, col3, col4, col5 = st.columns(5)
                     
                     with col1:
-                        # CSV Download
-                        csv_buffer = io.StringIO()
-                        if metadata_rows:
-                            for row in metadata_rows:
-                                csv_buffer.write(row)
-                        df.to_csv(csv_buffer, index=False)
-                        csv_data = csv_buffer.getvalue()
-                        
+                        # CSV Download (rows re-rendered only for changed agents)
                         st.download_button(
                             label="Download CSV",
-                            data=csv_data,
+                            data=lambda: metrics.record_text('csv', ''.join(processor.iter_csv())),
                             file_name="cleaned_agent_performance.csv",
                             mime="text/csv"
                         )
                     
                     with col2:
+                        st.download_button(
+                            label="Download CSV (gzip)",
+                            data=build_csv_gzip,
+                            file_name="cleaned_agent_performance.csv.gz",
+                            mime="application/gzip"
+                        )
+                    
+                    with col3:
                         # Excel Download
                         st.download_button(
                             label="Download Styled Excel",
@@ -530,22 +514,82 @@ def main():
                             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                         )
                     
+                    with col4:
+                        st.download_button(
+                            label="Download CSV + Excel (zip)",
+                            data=build_bundle,
+                            file_name="agent_performance.zip",
+                            mime="application/zip"
+                        )
+                    
+                    with col5:
+                        # Static page with the header rows and summary, small enough to email
+                        st.download_button(
+                            label="Download HTML Report",
+                            data=lambda: metrics.record_text('html', html_report.html_text(df, metadata_rows, summary)),
+                            file_name="agent_performance.html",
+                            mime="text/html"
+                        )
+                    
+                    # One sheet per team plus the overall sheet (built on request)
+                    groups = processor.group_labels()
+                    if groups is not None and st.checkbox("Build a workbook with one sheet per team"):
+                        def build_grouped_excel():
+                            return grouped_export.save_grouped_excel(df, groups, metadata_rows, summary=summary,
+                                                                     quality=quality).getvalue()
+                        
+                        grouped_file = processor.cached_output(
+                            'xlsx_grouped',
+                            lambda: run_in_job_pool("Building team workbook", build_grouped_excel, estimated_rows=2 * estimated_rows)
+                        )
+                        st.download_button(
+                            label="Download Excel by Team",
+                            data=grouped_file,
+                            file_name="styled_agent_performance_by_team.xlsx",
+                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                        )
+                    
+                    # Typed columnar files for BI tools (durations, bands and header rows kept as metadata)
+                    with st.expander("📦 Parquet / Arrow for analytics"):
+                        def build_columnar(fmt):
+                            return columnar_export.write_columnar(df, metadata_rows, io.BytesIO(), fmt).getvalue()
+                        
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            st.download_button(
+                                label="Download Parquet",
+                                data=lambda: build_columnar('parquet'),
+                                file_name="agent_performance.parquet",
+                                mime="application/vnd.apache.parquet"
+                            )
+                        with col2:
+                            st.download_button(
+                                label="Download Arrow",
+                                data=lambda: build_columnar('arrow'),
+                                file_name="agent_performance.arrow",
+                                mime="application/vnd.apache.arrow.file"
+                            )
+                    
                     st.success("Processing complete! Download your files above.")
                 
+                show_comparison_section(df, source_name=source_name)
+                show_history_section(df, metadata_rows, source_name=source_name, summary=summary,
+                                     groups=processor.group_labels())
+                
         except Exception as e:
             st.error(f"Error processing file: {str(e)}")
             with st.expander("Show error details"):
                 st.exception(e)
     
     else:
-        st.info("Please upload a CSV file to get started")
+        st.info("Please upload a CSV or XLSX export to get started")
         
         # Instructions
         st.markdown("---")
         st.subheader("Instructions")
         
         instructions_text = """
-1. Upload your agent performance CSV file
+1. Upload your agent performance CSV or XLSX file
 2. The app will automatically process and format the data
 3. Review the processed data with color-coded formatting
 4. Download the cleaned CSV or styled Excel file
@@ -558,8 +602,14 @@ def main():
 - Adds summary statistics
 - Includes REMARKS column with 'HD' marker
 - ID column as first column
+- Saves reports to a local history for agent trends
+- Compares a report or stored period with an earlier one per agent
+- Finds agents by name or ID as you search
 """
         st.markdown(instructions_text)
+        
+        show_comparison_section()
+        show_history_section()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""
+Agent Performance Data Processor - Table View
+Sorted and filtered rows of a processed report, read one window at a time by the desktop data view
+"""
+
+import numpy as np
+import pandas as pd
+import report_pipeline
+from agent_search import AgentSearchIndex
+
+# Row highlight per style rule, weakest first (later rules win, as in the data view)
+TIME_HD_TAG = 'time_hd'
+TIME_RED_TAG = 'time_red'
+PAUSE_HIGH_TAG = 'pause_high'
+REMARKS_HD_TAG = 'remarks_hd'
+
+
+def band_labels():
+    """Readable label per inbound band (BAND_NAMES order), thresholds from INBOUND_BANDS"""
+    labels = {}
+    upper = None
+    for lower, name in report_pipeline.INBOUND_BANDS:
+        limits = f"{lower}+" if upper is None else f"{lower}-{upper - 1}"
+        labels[name] = f"{name.capitalize()} ({limits})"
+        upper = lower
+    labels[report_pipeline.BELOW_AVERAGE_BAND] = f"Below average (<{upper})"
+    return labels
+
+
+def row_tags(df):
+    """Treeview tag per row: the inbound band, overridden by TIME, pause and HD highlights"""
+    conditions = []
+    tags = []
+    if 'REMARKS' in df.columns:
+        conditions.append(remarks_hd(df))
+        tags.append(REMARKS_HD_TAG)
+    for col in ['TOTAL PAUSE', 'PAUSE']:
+        if col in df.columns:
+            conditions.append(_seconds(df[col]) > report_pipeline.PAUSE_THRESHOLD_SECONDS)
+            tags.append(PAUSE_HIGH_TAG)
+    if 'TIME' in df.columns:
+        seconds = _seconds(df['TIME'])
+        conditions += [seconds < report_pipeline.HD_THRESHOLD_SECONDS,
+                       seconds < report_pipeline.TIME_RED_THRESHOLD_SECONDS]
+        tags += [TIME_HD_TAG, TIME_RED_TAG]
+
+    band_tags = np.array(report_pipeline.BAND_NAMES + [''], dtype=object)
+    if 'TOTAL INBOUND CALLS' in df.columns:
+        default = band_tags[report_pipeline.inbound_band_codes(df['TOTAL INBOUND CALLS'])]
+    else:
+        default = np.full(len(df), '', dtype=object)
+    return np.select(conditions, tags, default=default) if conditions else default
+
+
+def remarks_hd(df):
+    return (df['REMARKS'].astype(str).str.strip().str.upper() == 'HD').to_numpy()
+
+
+def _seconds(values):
+    return report_pipeline.duration_seconds(values).to_numpy(dtype='float64', na_value=np.nan)
+
+
+def _sort_key(values):
+    """Values that sort like the column: numbers as they are, names by text (categories ranked once)"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = pd.Series(values.cat.categories.astype(str))
+        rank = np.empty(len(categories), dtype='float64')
+        rank[categories.sort_values(kind='stable').index.to_numpy()] = np.arange(len(categories))
+        codes = values.cat.codes.to_numpy()
+        return pd.Series(np.where(codes >= 0, rank[codes], np.nan))
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        return pd.Series(values.to_numpy(dtype='float64', na_value=np.nan))
+    return pd.Series(values.astype(object).to_numpy())
+
+
+class ReportView:
+    """Rows of a processed report in view order, narrowed by the active filters
+
+    Sort orders are computed once per column and direction and kept; filters
+    are boolean masks over the whole frame. Changing either only rebuilds
+    the position array, and window() formats just the rows asked for.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.columns = list(df.columns)
+        self.tags = row_tags(df)
+        self._orders = {}           # (column, descending) -> row positions
+        self._search = None         # name/ID index, built on the first search
+
+        # Filter inputs, computed once
+        self.bands = (report_pipeline.inbound_band_codes(df['TOTAL INBOUND CALLS'])
+                      if 'TOTAL INBOUND CALLS' in df.columns else np.full(len(df), -1))
+        self.hd = remarks_hd(df) if 'REMARKS' in df.columns else np.zeros(len(df), dtype=bool)
+
+        self.sort_column = None
+        self.descending = False
+        self.name_filter = ''
+        self.hd_only = False
+        self.band = None            # band name or None for all
+        self.positions = np.arange(len(df))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def sort_order(self, column, descending=False):
+        """Row positions sorted by a column (missing values last either way), cached"""
+        key = (column, descending)
+        if key not in self._orders:
+            values = _sort_key(self.df[column])
+            order = values.sort_values(ascending=not descending, kind='stable', na_position='last').index
+            self._orders[key] = order.to_numpy()
+        return self._orders[key]
+
+    def search_index(self):
+        if self._search is None:
+            self._search = AgentSearchIndex.from_frame(self.df)
+        return self._search
+
+    def mask(self):
+        """Rows passing the active filters (None when nothing is filtered)"""
+        mask = None
+        if self.name_filter:
+            mask = self.search_index().mask(self.name_filter)
+        if self.hd_only:
+            mask = self.hd if mask is None else mask & self.hd
+        if self.band is not None:
+            in_band = self.bands == report_pipeline.BAND_NAMES.index(self.band)
+            mask = in_band if mask is None else mask & in_band
+        return mask
+
+    def refresh(self):
+        if self.sort_column is None:
+            order = np.arange(len(self.df))
+        else:
+            order = self.sort_order(self.sort_column, self.descending)
+        mask = self.mask()
+        self.positions = order if mask is None else order[mask[order]]
+
+    def sort(self, column):
+        """Sort by column; the same column again flips the direction"""
+        if column == self.sort_column:
+            self.descending = not self.descending
+        else:
+            self.sort_column = column
+            self.descending = False
+        self.refresh()
+
+    def set_filters(self, name='', hd_only=False, band=None):
+        """name matches part of USER NAME or the start of ID"""
+        self.name_filter = name
+        self.hd_only = hd_only
+        self.band = band
+        self.refresh()
+
+    def window(self, start, count):
+        """(display values, tag) for count rows from start in view order"""
+        positions = self.positions[start:start + count]
+        display = report_pipeline.display_frame(self.df.iloc[positions])
+        values = display.astype(str).itertuples(index=False, name=None)
+        return list(zip(values, self.tags[positions]))
@@ -0,0 +1,114 @@
+"""
+Agent Performance Data Processor - Vendor Column Mappings
+Declarative per-vendor column names, resolved once per report layout to the names the pipeline uses
+"""
+
+import os
+import json
+import hashlib
+import threading
+
+# Vendor column name -> pipeline column name (our first dialer's names need no mapping).
+# More vendors can be added in vendor_mappings.json in the data folder, same shape.
+VENDOR_MAPPINGS = {
+    'standard': {},
+    'vendor_b': {
+        'AGENT': 'USER NAME',
+        'AGENT ID': 'ID',
+        'TEAM': 'CURRENT USER GROUP',
+        'TOTAL CALLS': 'CALLS',
+        'LOGIN TIME': 'TIME',
+        'PAUSE TIME': 'PAUSE',
+        'WAIT TIME': 'WAIT',
+        'TALK TIME': 'TALK',
+        'WRAP TIME': 'DISPO',
+        'DEAD TIME': 'DEAD',
+        'CUSTOMER TIME': 'CUSTOMER',
+        'IB CALLS': 'TOTAL INBOUND CALLS',
+        'OB CALLS': 'TOTAL OUTBOUND CALLS',
+    },
+}
+
+MAPPINGS_FILE_NAME = 'vendor_mappings.json'
+
+# Pipeline column whose vendor names mark the header row
+NAME_COLUMN = 'USER NAME'
+
+
+def _key(name):
+    return ' '.join(str(name).split()).upper()
+
+
+def load_mappings(path=None):
+    """Built-in mappings plus the vendors defined in a JSON file (the file wins for the same vendor)"""
+    mappings = {vendor: dict(mapping) for vendor, mapping in VENDOR_MAPPINGS.items()}
+    if path and os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                extra = json.load(f)
+        except (OSError, ValueError):
+            extra = {}
+        for vendor, mapping in (extra.items() if isinstance(extra, dict) else []):
+            if isinstance(mapping, dict):
+                mappings[str(vendor)] = {str(name): str(target) for name, target in mapping.items()}
+    return mappings
+
+
+def mapping_version(mappings):
+    """Short digest of a mapping set, so profiles resolved with older mappings are redone"""
+    text = json.dumps(mappings, sort_keys=True)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def header_names(mappings):
+    """Every vendor's name for the USER NAME column (upper case)"""
+    names = {NAME_COLUMN}
+    for mapping in mappings.values():
+        names.update(_key(name) for name, target in mapping.items() if target == NAME_COLUMN)
+    return names
+
+
+def unique_names(names):
+    """Repeated names numbered like the CSV parser does (X, X.1, X.2)"""
+    seen = {}
+    result = []
+    for name in names:
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        result.append(name)
+    return result
+
+
+def resolve(columns, mappings, required_columns=()):
+    """(vendor, pipeline name per column) for a header row
+
+    The vendor whose mapping yields the most required columns wins; ties go to
+    the first vendor listed, so our standard layout is never renamed.
+    """
+    best = None
+    for vendor, mapping in mappings.items():
+        lookup = {_key(name): target for name, target in mapping.items()}
+        names = [lookup.get(_key(column), column) for column in columns]
+        covered = len(set(required_columns) & set(names))
+        if best is None or covered > best[0]:
+            best = (covered, vendor, names)
+    if best is None:
+        return None, list(columns)
+    return best[1], unique_names(best[2])
+
+
+_default_mappings = None
+_default_lock = threading.Lock()
+
+
+def default_mappings():
+    """Mappings of this installation (built-ins plus vendor_mappings.json in AGENT_PERF_HOME)"""
+    global _default_mappings
+    with _default_lock:
+        if _default_mappings is None:
+            from performance_store import APP_DATA_DIR
+            _default_mappings = load_mappings(os.path.join(APP_DATA_DIR, MAPPINGS_FILE_NAME))
+        return _default_mappings
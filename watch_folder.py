@@ -0,0 +1,273 @@
+"""
+Agent Performance Data Processor - Watch Folder
+Long-running mode that processes dialer exports (CSV or XLSX) as soon as they land in a drop folder
+
+Usage:
+    python watch_folder.py DROP_FOLDER [--output-dir DIR] [--workers 2] [--formats xlsx,csv,csv.gz,zip,parquet,arrow]
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import report_pipeline
+import columnar_export
+import metrics
+
+logger = logging.getLogger('watch_folder')
+
+# Suffix of the files we write, so they are never picked up as new input
+OUTPUT_SUFFIX = '_processed'
+OUTPUT_FORMATS = ('xlsx', 'csv', 'csv.gz', 'zip', 'parquet', 'arrow')   # zip = CSV + XLSX bundle
+DEFAULT_FORMATS = ('xlsx', 'csv')
+
+# Dialer exports picked up from the drop folder (workbooks are read with xlsx_input)
+INPUT_EXTENSIONS = ('.csv', '.xlsx', '.xlsm')
+
+
+def output_paths(input_path, output_dir=None, formats=DEFAULT_FORMATS):
+    """Output file paths for an input export (next to it unless output_dir is set)
+
+    Workbooks keep their extension in the name (a.xlsx -> a_xlsx_processed.xlsx)
+    so they never share outputs with a CSV export of the same name.
+    """
+    folder = output_dir or os.path.dirname(os.path.abspath(input_path))
+    stem, ext = os.path.splitext(os.path.basename(input_path))
+    if ext.lower() != '.csv':
+        stem = f"{stem}_{ext[1:].lower()}"
+    return {fmt: os.path.join(folder, f"{stem}{OUTPUT_SUFFIX}.{fmt}") for fmt in formats}
+
+
+def process_file(input_path, output_dir=None, formats=DEFAULT_FORMATS):
+    """Process one export through the pipeline and write its outputs atomically
+
+    Run in a worker process, the metrics it recorded travel back with the
+    result (or on the exception) for the parent to merge.
+    """
+    try:
+        return _process_file(input_path, output_dir, formats)
+    except Exception as e:
+        e.metrics = metrics.worker_state()
+        raise
+
+
+def _process_file(input_path, output_dir, formats):
+    started = time.perf_counter()
+    df, metadata_rows = report_pipeline.process_report(input_path)
+
+    paths = output_paths(input_path, output_dir, formats)
+    written = []
+    for fmt, path in paths.items():
+        # Write next to the final name, then swap in so readers never see half a file
+        temp_path = f"{path}.tmp"
+        if fmt == 'xlsx':
+            report_pipeline.save_to_excel(df, metadata_rows, temp_path)
+        elif fmt == 'zip':
+            name = os.path.basename(path)[:-len('.zip')]
+            if paths.get('xlsx') in written:
+                # Copy the workbook just written instead of building it again
+                with open(paths['xlsx'], 'rb') as excel_file:
+                    report_pipeline.write_bundle(df, metadata_rows, temp_path, name=name, excel_file=excel_file)
+            else:
+                report_pipeline.write_bundle(df, metadata_rows, temp_path, name=name)
+        elif fmt in columnar_export.COLUMNAR_FORMATS:
+            columnar_export.write_columnar(df, metadata_rows, temp_path, fmt)
+        else:
+            report_pipeline.write_csv(df, metadata_rows, temp_path, compress=(fmt == 'csv.gz'))
+        os.replace(temp_path, path)
+        written.append(path)
+
+    return {
+        'input': input_path,
+        'outputs': written,
+        'rows': len(df),
+        'seconds': time.perf_counter() - started,
+        'metrics': metrics.worker_state(),
+    }
+
+
+class FolderWatcher:
+    """Polls a drop folder, debounces files still being written and feeds a bounded pool"""
+
+    def __init__(self, folder, output_dir=None, workers=2, formats=DEFAULT_FORMATS,
+                 settle_seconds=2.0, max_pending=None, executor=None):
+        self.folder = folder
+        self.output_dir = output_dir
+        self.formats = tuple(formats)
+        self.settle_seconds = settle_seconds
+        self.workers = workers
+        # Backpressure: never hold more than this many submitted jobs
+        self.max_pending = max_pending or workers * 2
+        self.executor = executor or ProcessPoolExecutor(max_workers=workers)
+        self._seen = {}        # path -> (size, mtime, first time this signature was seen)
+        self._done = {}        # path -> (size, mtime) last processed
+        self._running = {}     # future -> (path, signature)
+        self._owners = {}      # output path -> input path that writes it
+        self._present = set()  # candidate files in the folder at the last scan
+        self.processed = 0
+        self.failed = 0
+
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        metrics.REGISTRY.register_gauge('queue_depth', 'Jobs waiting for a worker', self.queue_depth,
+                                        [('queue', 'watch_folder')])
+
+    def _is_candidate(self, name):
+        """Dialer exports (CSV or XLSX) only, never our own outputs or temp files"""
+        stem, ext = os.path.splitext(name)
+        return ext.lower() in INPUT_EXTENSIONS and not stem.endswith(OUTPUT_SUFFIX) and not name.startswith('~$')
+
+    def _ready_files(self, now):
+        """Files whose size and mtime have not changed for settle_seconds"""
+        ready = []
+        present = set()
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not entry.is_file() or not self._is_candidate(entry.name):
+                    continue
+                stat = entry.stat()
+                signature = (stat.st_size, stat.st_mtime_ns)
+                present.add(entry.path)
+
+                if self._done.get(entry.path) == signature:
+                    continue
+                previous = self._seen.get(entry.path)
+                if previous is None or previous[:2] != signature:
+                    # New or still growing: restart the settle timer
+                    self._seen[entry.path] = signature + (now,)
+                    continue
+                if stat.st_size > 0 and now - previous[2] >= self.settle_seconds and self._can_open(entry.path):
+                    ready.append((previous[2], entry.path, signature))
+
+        # Forget files that were removed from the folder
+        for path in list(self._seen):
+            if path not in present:
+                del self._seen[path]
+        self._present = present
+        ready.sort()
+        return [(path, signature) for _, path, signature in ready]
+
+    def _can_open(self, path):
+        """A writer on Windows still holds the file exclusively while exporting"""
+        try:
+            with open(path, 'rb'):
+                return True
+        except OSError:
+            return False
+
+    def _output_clash(self, path):
+        """Another export in the folder that writes the same outputs (e.g. a_xlsx.csv and a.xlsx), or None"""
+        paths = output_paths(path, self.output_dir, self.formats).values()
+        for output in paths:
+            owner = self._owners.get(output)
+            if owner is not None and owner != path and owner in self._present:
+                return owner
+        for output in paths:
+            self._owners[output] = path
+        return None
+
+    def _collect(self, block=False):
+        """Record finished jobs"""
+        for future in list(self._running):
+            if not block and not future.done():
+                continue
+            path, signature = self._running.pop(future)
+            try:
+                result = future.result()
+                metrics.merge(result.get('metrics'))
+                self.processed += 1
+                logger.info("Processed %s (%d rows, %.2fs) -> %s",
+                            path, result['rows'], result['seconds'], ', '.join(result['outputs']))
+            except Exception as e:
+                metrics.merge(getattr(e, 'metrics', None))
+                self.failed += 1
+                logger.error("Failed to process %s: %s", path, e)
+            # Do not retry the same version of a file; a new export will be picked up
+            self._done[path] = signature
+            self._seen.pop(path, None)
+
+    def queue_depth(self):
+        """Number of submitted jobs not yet finished"""
+        return len(self._running)
+
+    def scan_once(self, now=None):
+        """One polling pass: collect finished jobs and submit ready files up to the backpressure limit"""
+        self._collect()
+        now = time.monotonic() if now is None else now
+        busy = {path for path, _ in self._running.values()}
+        submitted = 0
+        for path, signature in self._ready_files(now):
+            if path in busy:
+                continue
+            if len(self._running) >= self.max_pending:
+                logger.debug("Backpressure: %d jobs pending, deferring %s", len(self._running), path)
+                break
+            owner = self._output_clash(path)
+            if owner is not None:
+                logger.warning("Skipped %s: its outputs would overwrite those of %s", path, owner)
+                self._done[path] = signature
+                self._seen.pop(path, None)
+                continue
+            future = self.executor.submit(process_file, path, self.output_dir, self.formats)
+            self._running[future] = (path, signature)
+            submitted += 1
+        return submitted
+
+    def run_forever(self, poll_seconds=1.0):
+        """Poll until interrupted"""
+        logger.info("Watching %s with %d workers", self.folder, self.workers)
+        try:
+            while True:
+                self.scan_once()
+                time.sleep(poll_seconds)
+        except KeyboardInterrupt:
+            logger.info("Stopping, waiting for %d running jobs", len(self._running))
+        finally:
+            self.close()
+
+    def close(self):
+        """Wait for running jobs and shut the pool down"""
+        self._collect(block=True)
+        self.executor.shutdown(wait=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process dialer CSV exports dropped into a folder")
+    parser.add_argument('folder', help="Drop folder to watch")
+    parser.add_argument('--output-dir', help="Write outputs here instead of next to the input")
+    parser.add_argument('--workers', type=int, default=2, help="Parallel processing workers")
+    parser.add_argument('--formats', default=','.join(DEFAULT_FORMATS),
+                        help="Comma-separated outputs: xlsx, csv, csv.gz, zip (CSV + XLSX bundle), parquet, arrow")
+    parser.add_argument('--settle', type=float, default=2.0, help="Seconds a file must stay unchanged before processing")
+    parser.add_argument('--poll', type=float, default=1.0, help="Seconds between folder scans")
+    parser.add_argument('--max-pending', type=int, help="Maximum queued jobs (default: 2 x workers)")
+    parser.add_argument('--metrics-port', type=int, help="Serve Prometheus metrics on 127.0.0.1:PORT/metrics")
+    parser.add_argument('--metrics-file', help="Rewrite Prometheus metrics to this file (textfile collector)")
+    args = parser.parse_args(argv)
+
+    formats = [fmt.strip().lower() for fmt in args.formats.split(',') if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in OUTPUT_FORMATS]
+    if unknown:
+        parser.error(f"unknown format(s): {', '.join(unknown)}")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    if args.metrics_port is not None:
+        metrics.start_server(args.metrics_port)
+    if args.metrics_file:
+        metrics.start_file_writer(args.metrics_file)
+    watcher = FolderWatcher(
+        args.folder,
+        output_dir=args.output_dir,
+        workers=args.workers,
+        formats=formats,
+        settle_seconds=args.settle,
+        max_pending=args.max_pending,
+    )
+    watcher.run_forever(poll_seconds=args.poll)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Agent Performance Data Processor - XLSX Input
+Streams a dialer report saved as an Excel workbook into a CSV copy the pipeline reads like any export
+"""
+
+import io
+import os
+import csv
+import datetime
+import zipfile
+import tempfile
+import contextlib
+from openpyxl import load_workbook
+import layout_profiles
+import metrics
+
+# Workbooks are zip archives; a CSV export never starts like this
+ZIP_MAGIC = b'PK\x03\x04'
+
+# Rows converted per text chunk written to the CSV copy (small: the chunk is held three times over)
+XLSX_CHUNK_ROWS = 2000
+
+# Sheet XML per row, for sizing workbooks that do not declare their dimensions
+XML_BYTES_PER_ROW = 800
+
+# Day 0 of Excel's calendar: durations of a day or more come back as datetimes from it
+_EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+
+
+def _is_path(source):
+    return isinstance(source, str) or hasattr(source, '__fspath__')
+
+
+def is_xlsx(source):
+    """True when a path, bytes or binary file object holds a workbook (by content, not name)"""
+    if _is_path(source):
+        try:
+            with open(source, 'rb') as f:
+                return f.read(len(ZIP_MAGIC)) == ZIP_MAGIC
+        except OSError:
+            return False
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source[:len(ZIP_MAGIC)]) == ZIP_MAGIC
+    if hasattr(source, 'read') and hasattr(source, 'seek'):
+        position = source.tell()
+        try:
+            return source.read(len(ZIP_MAGIC)) == ZIP_MAGIC
+        finally:
+            source.seek(position)
+    return False
+
+
+def _as_file(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(bytes(source))
+    return source
+
+
+@contextlib.contextmanager
+def _open_workbook(source):
+    """Workbook of a path, bytes or binary file, closed (with any file opened here) on exit"""
+    # Paths are opened here: load_workbook judges a path by its extension, and uploads
+    # are spooled under any name (the processing service's upload.csv)
+    with contextlib.ExitStack() as stack:
+        if _is_path(source):
+            source = stack.enter_context(open(source, 'rb'))
+        # read_only streams the sheet XML row by row instead of building every cell
+        wb = load_workbook(_as_file(source), read_only=True, data_only=True)
+        stack.callback(wb.close)
+        yield wb
+
+
+def _duration(seconds):
+    seconds = int(round(seconds))
+    return f"{seconds // 3600}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+
+def _float_text(value):
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _time_text(value):
+    return _duration(value.hour * 3600 + value.minute * 60 + value.second + value.microsecond / 1e6)
+
+
+def _datetime_text(value):
+    if value.year < 1900:
+        # A time-formatted cell of a day or more
+        return _duration((value - _EXCEL_EPOCH).total_seconds())
+    return value.isoformat(sep=' ')
+
+
+# Text per cell value type, looked up once per cell (millions of them in a large sheet)
+_CELL_TEXT = {
+    str: str,
+    int: str,
+    float: _float_text,
+    bool: lambda value: 'TRUE' if value else 'FALSE',
+    type(None): lambda value: '',
+    datetime.timedelta: lambda value: _duration(value.total_seconds()),
+    datetime.time: _time_text,
+    datetime.datetime: _datetime_text,
+    datetime.date: lambda value: value.isoformat(),
+}
+
+
+def cell_text(value):
+    """Cell value as the dialer writes it in a CSV export (durations as H:MM:SS)"""
+    return _CELL_TEXT.get(type(value), str)(value)
+
+
+def _has_header_marker(line):
+    return layout_profiles.HEADER_MARKER in line.upper()
+
+
+def iter_csv_text(source, is_header=None, chunk_rows=XLSX_CHUNK_ROWS):
+    """CSV text of the active worksheet, chunk_rows rows at a time
+
+    Rows before the header row are written as plain text (their cells joined
+    by commas), the way they appear in a CSV export, so they become the same
+    metadata rows; the header and data rows are written as CSV.
+    """
+    is_header = is_header or _has_header_marker
+    with _open_workbook(source) as wb:
+        ws = wb.active
+        # The stored sheet size is often wrong in generated files; read every row there is
+        ws.reset_dimensions()
+        out = io.StringIO()
+        writer = csv.writer(out, lineterminator='\n')
+        in_data = False
+        for number, row in enumerate(ws.iter_rows(values_only=True), start=1):
+            texts = [_CELL_TEXT.get(type(value), str)(value) for value in row]
+            while texts and not texts[-1]:
+                texts.pop()
+            if not in_data:
+                line = ','.join(' '.join(text.splitlines()) for text in texts)
+                in_data = is_header(line)
+                if not in_data:
+                    out.write(line + '\n')
+                    continue
+            writer.writerow(texts)
+            if number % chunk_rows == 0:
+                yield out.getvalue()
+                out.seek(0)
+                out.truncate()
+        yield out.getvalue()
+
+
+@contextlib.contextmanager
+def csv_copy(source, is_header=None):
+    """Path of a temporary UTF-8 CSV copy of a workbook, removed on exit
+
+    The copy is written chunk by chunk and then read (memory-mapped) like an
+    export file, so neither the workbook nor the CSV text is held in memory.
+    """
+    fd, path = tempfile.mkstemp(prefix='agent_report_', suffix='.csv')
+    try:
+        with os.fdopen(fd, 'wb') as f, metrics.stage_timer('xlsx_convert'):
+            for chunk in iter_csv_text(source, is_header):
+                f.write(chunk.encode('utf-8'))
+        yield path
+    finally:
+        os.remove(path)
+
+
+def estimate_rows(source):
+    """Row count the workbook declares for its sheet, else a guess from the sheet XML size"""
+    with _open_workbook(source) as wb:
+        declared = wb.active.max_row
+    if declared:
+        return declared
+    with zipfile.ZipFile(_as_file(source)) as archive:
+        sizes = [info.file_size for info in archive.infolist() if info.filename.startswith('xl/worksheets/')]
+    return max(sizes, default=0) // XML_BYTES_PER_ROW